@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+発音診断用の CER / アライメント計算
+
+落語の長い台詞を文字単位で比較すると、素朴な O(n・m) の動的計画法が評価時間の大半を占める。
+ここでは
+  - 編集距離: Myers / Hyyrö のビット並列アルゴリズム (Python の多倍長整数をビット列として使用)
+  - 誤り箇所: 編集距離から決まる帯の中だけを埋める帯状 DP (行ごとに NumPy で計算) の後ろ向き探索
+で計算し、どちらも仮名に正規化した文字列を対象にする。
+"""
+import re
+import sys
+import time
+import argparse
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import pykakasi
+    _KAKASI = pykakasi.kakasi()
+except ImportError:
+    # pykakasi が無ければ漢字はそのまま比較する (カタカナ→ひらがな変換のみ)
+    _KAKASI = None
+
+# CER の計算から除外する文字 (句読点・記号・空白)
+_IGNORED = re.compile(r"[\s、。，．,.!！?？「」『』（）()・…〜~\-―\"'“”]")
+# カタカナ (ァ〜ヶ) → ひらがな
+_KATA_TO_HIRA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+
+@lru_cache(maxsize=4096)
+def normalize_kana(text):
+    """比較用の文字列: NFKC、記号・空白の除去、漢字は読み (pykakasi があれば)、カタカナはひらがなに揃える
+
+    ASR が同音の別表記 (吾輩/我輩, 無い/ない) を出しても発音としては誤りにしない。
+    """
+    text = _IGNORED.sub("", unicodedata.normalize("NFKC", text))
+    if _KAKASI is not None:
+        text = "".join(item["hira"] for item in _KAKASI.convert(text))
+    return text.translate(_KATA_TO_HIRA)
+
+
+def levenshtein_dp(a, b):
+    """素朴な O(n・m) の動的計画法 (ベンチマークと検証用)"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def levenshtein(a, b):
+    """Myers / Hyyrö のビット並列編集距離。a の各文字を1ビットとし、b の1文字ごとに列全体を更新する"""
+    if not a or not b:
+        return len(a) + len(b)
+    m = len(a)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+
+    pv, mv, score = mask, 0, m
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+    return score
+
+
+def banded_alignment(ref, hyp, distance=None):
+    """編集距離 distance の最適経路だけが通る対角帯を DP で埋め、参照側の誤り箇所を返す
+
+    最適経路上のセル (i, j) は |j - i| + |(m - n) - (j - i)| <= distance を満たすため、
+    対角線 j - i がこの範囲にある帯だけを計算すれば十分 (全表の DP と同じ結果になる)。
+    """
+    n, m = len(ref), len(hyp)
+    if distance is None:
+        distance = levenshtein(ref, hyp)
+    slack = (distance - abs(m - n)) // 2
+    lo = min(0, m - n) - slack
+    width = max(0, m - n) + slack - lo + 1
+    inf = np.iinfo(np.int32).max // 2
+
+    ref_codes = np.frombuffer(ref.encode("utf-32-le"), dtype=np.uint32)
+    # 範囲外の参照を避けるため前後に番兵を置く (j は -width..m+width の範囲を取りうる)
+    pad = width + 1
+    hyp_codes = np.full(m + 2 * pad, 0xFFFFFFFF, dtype=np.uint32)
+    hyp_codes[pad:pad + m] = np.frombuffer(hyp.encode("utf-32-le"), dtype=np.uint32)
+    offsets = np.arange(width)
+
+    # band[i, c] = D[i, i + lo + c]。置換コストと範囲外のマスクは行ループの前に一括で求める
+    js = np.arange(n + 1)[:, None] + lo + offsets
+    invalid = (js < 0) | (js > m)
+    cost = (hyp_codes[js[1:] - 1 + pad] != ref_codes[:, None]).astype(np.int32)
+    cost[js[1:] < 1] = inf
+    band = np.full((n + 1, width + 1), inf, dtype=np.int32)
+    band[0, :width] = np.where(invalid[0], inf, js[0])
+    for i in range(1, n + 1):
+        previous = band[i - 1]
+        # 上 (削除) は1つ右の列、斜め (一致・置換) は同じ列
+        candidate = np.minimum(previous[1:] + 1, previous[:-1] + cost[i - 1])
+        candidate[invalid[i]] = inf
+        # 左隣からの挿入: D[c] = min_k<=c (candidate[k] + c - k)
+        row = np.minimum.accumulate(candidate - offsets) + offsets
+        row[invalid[i]] = inf
+        band[i, :width] = row
+
+    def at(i, j):
+        c = j - i - lo
+        return band[i, c] if 0 <= c < width and 0 <= j <= m else inf
+
+    spans = []
+    span = None
+    i, j = n, m
+    while i > 0 or j > 0:
+        current = at(i, j)
+        if i > 0 and j > 0 and ref[i - 1] == hyp[j - 1] and at(i - 1, j - 1) == current:
+            i, j = i - 1, j - 1
+            if span:
+                spans.append(span)
+                span = None
+            continue
+        if span is None:
+            span = {"ref_end": i, "hyp_end": j}
+        if i > 0 and j > 0 and at(i - 1, j - 1) + 1 == current:
+            i, j = i - 1, j - 1
+        elif i > 0 and at(i - 1, j) + 1 == current:
+            i -= 1
+        else:
+            j -= 1
+        span["ref_start"], span["hyp_start"] = i, j
+    if span:
+        spans.append(span)
+
+    return [{
+        "ref_start": s["ref_start"],
+        "ref_end": s["ref_end"],
+        "expected": ref[s["ref_start"]:s["ref_end"]],
+        "recognized": hyp[s["hyp_start"]:s["hyp_end"]],
+    } for s in reversed(spans)]
+
+
+def character_error_rate(reference, hypothesis, spans=True):
+    """仮名に正規化した文字列での CER。spans=True なら誤り箇所 (正規化後の位置) も返す"""
+    ref, hyp = normalize_kana(reference), normalize_kana(hypothesis)
+    distance = levenshtein(ref, hyp)
+    result = {
+        "cer": distance / max(len(ref), 1),
+        "distance": distance,
+        "reference": ref,
+        "hypothesis": hyp,
+    }
+    if spans:
+        result["mismatches"] = banded_alignment(ref, hyp, distance) if distance else []
+    return result
+
+
+def character_error_rates(pairs, spans=True):
+    """(reference, hypothesis) の組をまとめて処理する。同じ組は1回だけ計算する"""
+    computed = {}
+    for pair in pairs:
+        if pair not in computed:
+            computed[pair] = character_error_rate(*pair, spans=spans)
+    return [computed[pair] for pair in pairs]
+
+
+def _synthetic_pair(rng, length, error_rate):
+    alphabet = [chr(c) for c in range(ord("ぁ"), ord("ん") + 1)]
+    ref = [alphabet[k] for k in rng.integers(0, len(alphabet), length)]
+    hyp = []
+    for c in ref:
+        r = rng.random()
+        if r < error_rate / 3:
+            continue
+        if r < 2 * error_rate / 3:
+            hyp.append(alphabet[rng.integers(len(alphabet))])
+        elif r < error_rate:
+            hyp.extend([c, alphabet[rng.integers(len(alphabet))]])
+        else:
+            hyp.append(c)
+    return "".join(ref), "".join(hyp)
+
+
+def benchmark(lengths=(50, 500, 2000), pairs=20, error_rate=0.05, seed=0):
+    """素朴な DP とビット並列 (+ 帯状アライメント) の処理時間と結果の一致を比べる"""
+    rng = np.random.default_rng(seed)
+    print("| 文字数 | 組数 | DP (ms/組) | ビット並列 (ms/組) | +帯状アライメント (ms/組) | 高速化 | 一致 |")
+    print("| :---: | :---: | :---: | :---: | :---: | :---: | :---: |")
+    ok = True
+    for length in lengths:
+        data = [_synthetic_pair(rng, length, error_rate) for _ in range(pairs)]
+        start = time.perf_counter()
+        expected = [levenshtein_dp(ref, hyp) for ref, hyp in data]
+        dp = (time.perf_counter() - start) / pairs
+        start = time.perf_counter()
+        actual = [levenshtein(ref, hyp) for ref, hyp in data]
+        bit = (time.perf_counter() - start) / pairs
+        start = time.perf_counter()
+        for (ref, hyp), distance in zip(data, actual):
+            banded_alignment(ref, hyp, distance)
+        band = (time.perf_counter() - start) / pairs
+        match = expected == actual
+        ok &= match
+        print(f"| {length} | {pairs} | {dp * 1000:.2f} | {bit * 1000:.3f} | {(bit + band) * 1000:.2f} | "
+              f"{dp / (bit + band):.0f}x | {'✅' if match else '❌'} |")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CER と誤り箇所を表示する (--benchmark で素朴な DP と比較)")
+    parser.add_argument("reference", nargs="?", help="参照テキスト")
+    parser.add_argument("hypothesis", nargs="?", help="認識結果")
+    parser.add_argument("--benchmark", action="store_true", help="合成データで素朴な DP と速度・結果を比較する")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 500, 2000], help="ベンチマークの文字数")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        sys.exit(0 if benchmark(args.lengths) else 1)
+    if args.reference is None or args.hypothesis is None:
+        parser.error("reference と hypothesis を指定してください")
+    result = character_error_rate(args.reference, args.hypothesis)
+    print(f"CER: {result['cer']:.2%} ({result['distance']} / {len(result['reference'])})")
+    for span in result["mismatches"]:
+        print(f"  [{span['ref_start']}:{span['ref_end']}] '{span['expected']}' -> '{span['recognized']}'")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+評価結果のオンディスクキャッシュ (SQLite)
+
+キー = 音声ファイルの内容ハッシュ + 解析パラメータ (サンプルレート, F0手法, コードバージョン等)
+ファイル名や更新日時ではなく内容で判定するため、未変更のファイルは再解析されない。
+合計サイズが上限を超えると最終参照が古いものから削除する (LRU)。
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import contextlib
+import sqlite3
+import argparse
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "inspector.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """ファイル内容の SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_version(path):
+    """スクリプト自体のハッシュ (コード変更で自動的にキャッシュを無効化する)"""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+class ResultCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 並列ワーカーから同時に開かれるため、ロック待ちを許容する。
+        # 先読みスレッド (decode-common-audio.py の prefetch) からも引けるよう、接続はロックで共有する
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+        """)
+        self.conn.commit()
+        # (パス, サイズ, 更新時刻) -> 内容ハッシュ。同じ実行中に同じファイルを何度も読まない
+        self._hashes = {}
+
+    def make_key(self, audio_path, params):
+        stat = os.stat(audio_path)
+        memo_key = (os.path.abspath(audio_path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._hashes:
+            self._hashes[memo_key] = file_hash(audio_path)
+        return self._hashes[memo_key] + ":" + json.dumps(params, sort_keys=True)
+
+    def contains(self, key):
+        """ヒット/ミスの集計や LRU の更新をせずに、キーがあるかだけを調べる"""
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone() is not None
+
+    def _count(self, name, n=1):
+        self.conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (n, name))
+
+    def get(self, key):
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            self.conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._count("hits")
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()))
+            self._evict()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._count("evictions", evicted)
+
+    def get_or_compute(self, audio_path, params, compute):
+        """キャッシュにあればそれを返し、無ければ compute() の結果を保存して返す"""
+        key = self.make_key(audio_path, params)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {**counters, "entries": entries, "bytes": size}
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM results")
+            self.conn.execute("UPDATE counters SET value = 0")
+
+
+class CachedInspector:
+    """Inspector と同じ analyze() を持つキャッシュ付きラッパー"""
+
+    def __init__(self, inspector, cache):
+        self.inspector = inspector
+        self.cache = cache
+        self.sr = inspector.sr
+
+    def is_cached(self, audio_path):
+        return self.cache.contains(self.cache.make_key(audio_path, self.inspector.cache_params()))
+
+    def analyze(self, audio_path, timer=None, audio=None):
+        stage = timer.stage if timer else (lambda name: contextlib.nullcontext())
+        with stage("cache_lookup"):
+            key = self.cache.make_key(audio_path, self.inspector.cache_params())
+            value = self.cache.get(key)
+        if value is None:
+            value = self.inspector.analyze(audio_path, timer=timer, audio=audio)
+            with stage("cache_store"):
+                self.cache.put(key, value)
+        return value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="評価結果キャッシュの統計表示・削除")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help="キャッシュファイル")
+    parser.add_argument("--clear", action="store_true", help="キャッシュを全削除する")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"キャッシュを削除しました: {args.path}")
+        sys.exit(0)
+    print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+XTTS の話者条件 (声のプロファイル) キャッシュ
+
+XTTS は合成のたびに参照音声から gpt_cond_latent と speaker_embedding を計算し直すが、
+参照音声 (SOURCE/001.wav 等) は毎回同じなので、(参照音声の集合, チェックポイント, 条件付けの
+設定) ごとに一度だけ計算してテンソルとして .cache/voices に保存し、以降は読み込むだけにする。
+
+複数の参照音声 (SOURCE/*.wav やディレクトリ) を渡すと、XTTS と同じ方法で1つのプロファイルに
+まとめる (speaker_embedding はクリップごとの平均, gpt_cond_latent は連結した音声から計算)。
+"""
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+from pathlib import Path
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.cache import file_hash
+
+DEFAULT_VOICE_DIR = ".cache/voices"
+# チェックポイントのディレクトリのうち、指紋に含めるファイル
+CHECKPOINT_FILES = ("*.pth", "*.json", "*.pt")
+
+
+def reference_paths(specs):
+    """ファイル・ディレクトリ・glob パターンを参照音声のリスト (重複なし, ソート済み) に展開する"""
+    paths = set()
+    for spec in [specs] if isinstance(specs, str) else specs:
+        if os.path.isdir(spec):
+            paths.update(glob.glob(os.path.join(spec, "*.wav")))
+        elif any(c in spec for c in "*?["):
+            paths.update(glob.glob(spec))
+        else:
+            paths.add(spec)
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing:
+        raise FileNotFoundError(f"Reference audio not found: {', '.join(sorted(missing))}")
+    if not paths:
+        raise FileNotFoundError(f"No reference audio matched: {specs}")
+    return sorted(paths)
+
+
+def checkpoint_fingerprint(checkpoint):
+    """チェックポイントの識別子。ディレクトリはファイル名・サイズ・更新時刻から (数GBの重みは読まない)、
+    Hub のモデル名 (tts_models/...) は名前と TTS のバージョンから作る"""
+    h = hashlib.sha256()
+    if os.path.isdir(checkpoint):
+        for pattern in CHECKPOINT_FILES:
+            for path in sorted(glob.glob(os.path.join(checkpoint, pattern))):
+                st = os.stat(path)
+                h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    elif os.path.isfile(checkpoint):
+        st = os.stat(checkpoint)
+        h.update(f"{os.path.abspath(checkpoint)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    else:
+        try:
+            import TTS
+            version = TTS.__version__
+        except (ImportError, AttributeError):
+            version = "unknown"
+        h.update(f"{checkpoint}:{version}".encode())
+    return h.hexdigest()[:16]
+
+
+def conditioning_kwargs(config):
+    """XttsConfig の条件付け設定 (tts_to_file と同じ値で計算する場合に渡す)"""
+    return {
+        "gpt_cond_len": config.gpt_cond_len,
+        "gpt_cond_chunk_len": config.gpt_cond_chunk_len,
+        "max_ref_length": config.max_ref_len,
+        "sound_norm_refs": config.sound_norm_refs,
+    }
+
+
+class VoiceProfileCache:
+    def __init__(self, cache_dir=DEFAULT_VOICE_DIR):
+        self.cache_dir = cache_dir
+        self._memory = {}
+        self._speakers = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, ref_paths, checkpoint, cond_kwargs):
+        payload = {
+            "refs": [file_hash(p) for p in ref_paths],
+            "checkpoint": checkpoint_fingerprint(checkpoint),
+            "conditioning": cond_kwargs,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"xtts-{key}.pt")
+
+    def latents(self, model, speaker_wavs, checkpoint, **cond_kwargs):
+        """(gpt_cond_latent, speaker_embedding)。キャッシュに無ければ model で計算して保存する
+
+        model: Xtts (TTS.api.TTS なら tts.synthesizer.tts_model)
+        speaker_wavs: 参照音声のファイル・ディレクトリ・glob (複数可)
+        cond_kwargs: get_conditioning_latents() に渡す設定 (キーの一部になる)
+        """
+        return self._load_or_compute(model, reference_paths(speaker_wavs), checkpoint, cond_kwargs)[1]
+
+    def _load_or_compute(self, model, ref_paths, checkpoint, cond_kwargs):
+        import torch
+
+        key = self.key(ref_paths, checkpoint, cond_kwargs)
+        if key in self._memory:
+            self.hits += 1
+            return key, self._memory[key]
+
+        path = self.path(key)
+        if os.path.exists(path):
+            profile = torch.load(path, map_location=model.device)
+            self.hits += 1
+        else:
+            print(f"話者条件を計算中: {len(ref_paths)} ファイル")
+            start = time.perf_counter()
+            gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(audio_path=ref_paths, **cond_kwargs)
+            profile = {
+                "gpt_cond_latent": gpt_cond_latent.cpu(),
+                "speaker_embedding": speaker_embedding.cpu(),
+                "refs": [os.path.basename(p) for p in ref_paths],
+                "checkpoint": str(checkpoint),
+                "conditioning": cond_kwargs,
+                "seconds": time.perf_counter() - start,
+            }
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save(profile, tmp_path)
+            os.replace(tmp_path, path)
+            profile["gpt_cond_latent"] = gpt_cond_latent
+            profile["speaker_embedding"] = speaker_embedding
+            self.misses += 1
+        latents = (profile["gpt_cond_latent"].to(model.device), profile["speaker_embedding"].to(model.device))
+        self._memory[key] = latents
+        return key, latents
+
+    def register_speaker(self, tts, speaker_wavs, checkpoint):
+        """TTS.api.TTS (XTTS) に話者プロファイルを名前付き話者として登録し、その名前を返す
+
+        tts.tts_to_file(speaker=name) は参照音声を読み直さず、登録した条件で合成する。
+        話者一覧を持たないチェックポイントでは None (speaker_wav で合成する)
+        """
+        model = tts.synthesizer.tts_model
+        if getattr(model, "speaker_manager", None) is None:
+            return None
+        # 同じモデル・参照音声なら2回目以降は参照音声のハッシュも取り直さない
+        registered = (id(model), tuple([speaker_wavs] if isinstance(speaker_wavs, str) else speaker_wavs), checkpoint)
+        name = self._speakers.get(registered)
+        if name in model.speaker_manager.speakers:
+            return name
+        key, (gpt_cond_latent, speaker_embedding) = self._load_or_compute(
+            model, reference_paths(speaker_wavs), checkpoint, conditioning_kwargs(model.config))
+        name = f"snsw-{key}"
+        # Xtts.synthesize() は speakers[name].values() を (gpt_cond_latent, speaker_embedding) の順で受け取る
+        model.speaker_manager.speakers[name] = {
+            "gpt_cond_latent": gpt_cond_latent,
+            "speaker_embedding": speaker_embedding,
+        }
+        self._speakers[registered] = name
+        return name
+
+    def list_profiles(self):
+        import torch
+
+        rows = []
+        for path in sorted(glob.glob(os.path.join(self.cache_dir, "xtts-*.pt"))):
+            profile = torch.load(path, map_location="cpu")
+            rows.append({
+                "file": os.path.basename(path),
+                "refs": len(profile["refs"]),
+                "checkpoint": profile["checkpoint"],
+                "conditioning": profile["conditioning"],
+                "compute_seconds": round(profile["seconds"], 2),
+            })
+        return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XTTS の話者プロファイル (条件付け) を計算してキャッシュする")
+    parser.add_argument("speaker_wavs", nargs="*", default=["SOURCE/001.wav"],
+                        help="参照音声 (ファイル・ディレクトリ・glob。複数をまとめて1つのプロファイルにする)")
+    parser.add_argument("--model-dir", default=None,
+                        help="XTTS のチェックポイントディレクトリ (省略時は Hub の xtts_v2)")
+    parser.add_argument("--cache-dir", default=DEFAULT_VOICE_DIR, help="プロファイルの保存先")
+    parser.add_argument("--list", action="store_true", help="保存済みのプロファイルを一覧表示する")
+    args = parser.parse_args()
+
+    cache = VoiceProfileCache(args.cache_dir)
+    if args.list:
+        for row in cache.list_profiles():
+            print(json.dumps(row, ensure_ascii=False))
+        sys.exit(0)
+
+    if args.model_dir:
+        from tools import load_script
+        model = load_script("inference-common-base.py").load_model(args.model_dir)
+        checkpoint = args.model_dir
+        cond_kwargs = {}
+    else:
+        from TTS.api import TTS
+        checkpoint = "tts_models/multilingual/multi-dataset/xtts_v2"
+        model = TTS(checkpoint).synthesizer.tts_model
+        cond_kwargs = conditioning_kwargs(model.config)
+
+    for attempt in ("1回目", "2回目"):
+        start = time.perf_counter()
+        cache.latents(model, args.speaker_wavs, checkpoint, **cond_kwargs)
+        print(f"{attempt}: {(time.perf_counter() - start) * 1000:.1f} ms")
+        cache._memory.clear()
+    print(f"保存先: {cache.path(cache.key(reference_paths(args.speaker_wavs), checkpoint, cond_kwargs))}")
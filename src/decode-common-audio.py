@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+音声の一括デコード
+
+評価の各段階 (物理統計: ネイティブ, Inspector: 24kHz, MOS・話者埋め込み: 16kHz) が
+それぞれ librosa.load でファイルを読み直さないよう、1ファイルを一度だけデコードして
+モノラル化し、必要なサンプルレートへの変換結果をレートごとに使い回す。
+
+librosa.load(path, sr=...) と同じ手順 (soundfile で float32 読み込み → チャンネル平均 →
+soxr HQ でリサンプル → 長さを ceil(n * sr / native_sr) に揃える) のため、各段階の結果は
+個別に読み込んだ場合と一致する。soxr の出力長はこの長さと数サンプル違うことがあり、
+librosa.resample と同じく末尾をゼロ埋めまたは切り詰める。
+
+prefetch() は読み込みスレッドで次のファイルを先にデコード・リサンプルしておき、解析側が
+現在のファイルを処理している間に I/O (Docker Desktop のバインドマウント等) を済ませる。
+libsndfile と soxr は処理中に GIL を解放するため、単一プロセスでもスレッドで重ねられる。
+"""
+import os
+import json
+import time
+import argparse
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+
+# 先読みの既定値: 先読みするファイル数, 先読み済み波形の合計上限 (バイト), 読み込みスレッド数
+DEFAULT_PREFETCH = {"depth": 4, "max_bytes": 512 * 1024 * 1024, "readers": 2}
+
+
+class DecodedAudio:
+    """1ファイル分のデコード結果。最初に波形が必要になった時点で読み込む"""
+
+    def __init__(self, path, y=None, sr=None):
+        self.path = path
+        self._native = (y, sr) if y is not None else None
+        self._resampled = {}
+        self.decode_count = 0
+
+    @property
+    def native(self):
+        """(モノラル波形, ネイティブのサンプルレート)"""
+        if self._native is None:
+            y, sr = sf.read(self.path, dtype="float32", always_2d=True)
+            self._native = (y.mean(axis=1), sr)
+            self.decode_count += 1
+        return self._native
+
+    def at(self, sr):
+        """sr に変換したモノラル波形 (レートごとに1回だけ変換する)"""
+        y, native_sr = self.native
+        if sr is None or sr == native_sr:
+            return y
+        if sr not in self._resampled:
+            resampled = soxr.resample(y, native_sr, sr, quality="HQ")
+            # librosa.resample と同じ長さ (librosa.util.fix_length)
+            length = int(np.ceil(len(y) * float(sr) / native_sr))
+            if len(resampled) < length:
+                resampled = np.pad(resampled, (0, length - len(resampled)))
+            self._resampled[sr] = resampled[:length]
+        return self._resampled[sr]
+
+    @property
+    def duration(self):
+        y, sr = self.native
+        return len(y) / sr
+
+    @property
+    def nbytes(self):
+        """保持している波形の合計バイト数 (未デコードなら 0)"""
+        if self._native is None:
+            return 0
+        return self._native[0].nbytes + sum(y.nbytes for y in self._resampled.values())
+
+
+def decode_audio(path, rates=()):
+    """デコードし、rates に挙げたサンプルレートへの変換も済ませておく"""
+    audio = DecodedAudio(path)
+    for sr in rates:
+        audio.at(sr)
+    return audio
+
+
+def _decode_quietly(path, rates):
+    # 読み込めないファイルは未デコードのまま返し、例外は解析側で波形を取り出した時点で発生させる
+    try:
+        return decode_audio(path, rates)
+    except Exception:
+        return DecodedAudio(path)
+
+
+def _prefetch_one(path, rates, should_decode):
+    # 読み込みスレッドで実行する。should_decode (キャッシュ済みかの判定。内容ハッシュのために
+    # ファイルを全部読む) も解析側のスレッドではなくここで呼ぶ
+    if should_decode is not None:
+        try:
+            if not should_decode(path):
+                return DecodedAudio(path)
+        except Exception:
+            return DecodedAudio(path)
+    return _decode_quietly(path, rates)
+
+
+def prefetch(paths, rates=(), depth=DEFAULT_PREFETCH["depth"], max_bytes=DEFAULT_PREFETCH["max_bytes"],
+             readers=DEFAULT_PREFETCH["readers"], should_decode=None):
+    """
+    paths の順に DecodedAudio を返すジェネレーター。最大 depth 件 (かつ合計 max_bytes まで) を
+    読み込みスレッドで先にデコードしておく。should_decode(path) が False のファイル (キャッシュ済み等)
+    はデコードせず、未デコードの DecodedAudio を返す。should_decode も読み込みスレッドで呼ぶ。
+
+    先読み済みの量は、読み込みが終わった分はその波形のバイト数、読み込み中の分はこれまでに
+    デコードしたファイルの平均で見積もる (解析側のスレッドではファイルに触れない)。
+    まだ1件もデコードしていない間は readers 件までしか先読みしない
+    """
+    queue = collections.deque()
+    remaining = iter(paths)
+    decoded = {"files": 0, "bytes": 0}
+    readers = max(1, readers)
+    with ThreadPoolExecutor(max_workers=readers, thread_name_prefix="prefetch") as pool:
+        def full():
+            done = [future.result().nbytes for future in queue if future.done()]
+            pending = len(queue) - len(done)
+            files = decoded["files"] + sum(1 for size in done if size)
+            if not files:
+                return pending >= readers
+            average = (decoded["bytes"] + sum(done)) / files
+            return sum(done) + pending * average >= max_bytes
+
+        def fill():
+            while len(queue) < depth:
+                # 1件は必ず先読みできるようにする (上限より大きいファイルでも止まらない)
+                if queue and full():
+                    return
+                path = next(remaining, None)
+                if path is None:
+                    return
+                queue.append(pool.submit(_prefetch_one, path, rates, should_decode))
+
+        fill()
+        while queue:
+            audio = queue.popleft().result()
+            if audio.nbytes:
+                decoded["files"] += 1
+                decoded["bytes"] += audio.nbytes
+            fill()
+            yield audio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="音声を一度だけデコードし、各サンプルレートへの変換時間を表示する")
+    parser.add_argument("audio_paths", nargs="+", help="音声ファイル")
+    parser.add_argument("--rates", type=int, nargs="+", default=[24000, 16000], help="変換するサンプルレート")
+    args = parser.parse_args()
+
+    for path in args.audio_paths:
+        start = time.perf_counter()
+        audio = DecodedAudio(path)
+        _, native_sr = audio.native
+        decoded = time.perf_counter()
+        timings = {}
+        for sr in args.rates:
+            t = time.perf_counter()
+            audio.at(sr)
+            timings[sr] = round(time.perf_counter() - t, 4)
+        print(json.dumps({
+            "file": os.path.basename(path),
+            "native_sr": native_sr,
+            "duration": round(audio.duration, 3),
+            "decode_seconds": round(decoded - start, 4),
+            "resample_seconds": timings,
+            "megabytes": round(audio.nbytes / 1e6, 2),
+        }, ensure_ascii=False))
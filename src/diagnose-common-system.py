@@ -1,5 +1,57 @@
+import os
 import json
 import sys
+import argparse
+import numpy as np
+
+# diagnose_many() が受け取る列 (結果ストアの列名と同じ)。cer は無ければ 0.0 とみなす
+FEATURE_COLUMNS = ["clipping_rate", "spectral_flatness", "cer", "f0_range", "f0_jump_max", "max_silence"]
+
+# 判定規則 (バケット, 列, 条件, 減点, 指摘, 提案)。diagnose() と diagnose_many() が共有する
+BATCH_RULES = [
+    ("quality", "clipping_rate", lambda x: x > 0.01, 30,
+     "Clipping detected (Audio level too high)",
+     "Reduce output gain or check vocoder scaling"),
+    ("quality", "spectral_flatness", lambda x: x > 0.1, 20,
+     "High spectral flatness (Metallic or noisy sound)",
+     "Check vocoder compatibility or increase diffusion steps"),
+    ("pronunciation", "cer", lambda x: x > 0.05, 40,
+     "High Character Error Rate ({value:.2%})",
+     "Check G2P/Accent dictionary or training data quality"),
+    ("prosody", "f0_range", lambda x: x < 50, 20,
+     "Flat intonation (Narrow F0 range)",
+     "Increase F0 scale or check emotion embedding"),
+    ("prosody", "f0_jump_max", lambda x: x > 150, 25,
+     "Unnatural pitch jump detected",
+     "Decrease temperature or check for alignment instability"),
+    ("prosody", "max_silence", lambda x: x > 1.0, 15,
+     "Long silence detected ({value:.2f}s)",
+     "Adjust end-of-sentence silence parameters or trim padding"),
+]
+
+
+def feature_table(inspector_results, linguist_results=None):
+    """Inspector の結果 (dict) のリストを diagnose_many() 用の列に変換する"""
+    linguist_results = linguist_results or [None] * len(inspector_results)
+    return {
+        "clipping_rate": np.array([r["quality"]["clipping_rate"] for r in inspector_results], dtype=float),
+        "spectral_flatness": np.array([r["quality"]["spectral_flatness"] for r in inspector_results], dtype=float),
+        "cer": np.array([l["cer"] if l else 0.0 for l in linguist_results], dtype=float),
+        "f0_range": np.array([r["prosody"]["f0"]["range"] for r in inspector_results], dtype=float),
+        "f0_jump_max": np.array([r["prosody"]["f0"]["jump_max"] for r in inspector_results], dtype=float),
+        "max_silence": np.array([max(r["prosody"]["silence_durations"]) if r["prosody"]["silence_durations"] else 0
+                                 for r in inspector_results], dtype=float),
+    }
+
+
+def _column(table, name):
+    if hasattr(table, "column_names"):
+        # pyarrow.Table
+        if name not in table.column_names:
+            return None
+        return table.column(name).to_numpy()
+    return table.get(name)
+
 
 class Diagnostician:
     def diagnose(self, inspector_data, linguist_data=None):
@@ -9,6 +61,14 @@ class Diagnostician:
 
         q = inspector_data["quality"]
         p = inspector_data["prosody"]
+        values = {
+            "clipping_rate": q["clipping_rate"],
+            "spectral_flatness": q["spectral_flatness"],
+            "cer": linguist_data["cer"],
+            "f0_range": p["f0"]["range"],
+            "f0_jump_max": p["f0"]["jump_max"],
+            "max_silence": max(p["silence_durations"]) if p["silence_durations"] else 0,
+        }
         
         scores = {
             "quality": 100,
@@ -19,39 +79,12 @@ class Diagnostician:
         highlights = []
         suggestions = []
 
-        # --- Quality Diagnosis ---
-        if q["clipping_rate"] > 0.01:
-            scores["quality"] -= 30
-            highlights.append("Clipping detected (Audio level too high)")
-            suggestions.append("Reduce output gain or check vocoder scaling")
-        
-        if q["spectral_flatness"] > 0.1:
-            scores["quality"] -= 20
-            highlights.append("High spectral flatness (Metallic or noisy sound)")
-            suggestions.append("Check vocoder compatibility or increase diffusion steps")
-
-        # --- Pronunciation Diagnosis ---
-        if linguist_data["cer"] > 0.05:
-            scores["pronunciation"] -= 40
-            highlights.append(f"High Character Error Rate ({linguist_data['cer']:.2%})")
-            suggestions.append("Check G2P/Accent dictionary or training data quality")
-
-        # --- Prosody Diagnosis ---
-        if p["f0"]["range"] < 50:
-            scores["prosody"] -= 20
-            highlights.append("Flat intonation (Narrow F0 range)")
-            suggestions.append("Increase F0 scale or check emotion embedding")
-        
-        if p["f0"]["jump_max"] > 150:
-            scores["prosody"] -= 25
-            highlights.append("Unnatural pitch jump detected")
-            suggestions.append("Decrease temperature or check for alignment instability")
-
-        max_silence = max(p["silence_durations"]) if p["silence_durations"] else 0
-        if max_silence > 1.0:
-            scores["prosody"] -= 15
-            highlights.append(f"Long silence detected ({max_silence:.2f}s)")
-            suggestions.append("Adjust end-of-sentence silence parameters or trim padding")
+        # quality → pronunciation → prosody の順に BATCH_RULES を当てはめる
+        for bucket, name, condition, penalty, highlight, suggestion in BATCH_RULES:
+            if condition(values[name]):
+                scores[bucket] -= penalty
+                highlights.append(highlight.format(value=values[name]))
+                suggestions.append(suggestion)
 
         overall = sum(scores.values()) / 3
         
@@ -63,7 +96,104 @@ class Diagnostician:
             "lora_recommended": overall < 60 and scores["quality"] < 70
         }
 
+    def diagnose_many(self, table):
+        """diagnose() の列指向版。列 (NumPy 配列の dict または pyarrow.Table) をまとめて判定する
+
+        戻り値は行ごとの配列: overall_score, buckets, lora_recommended, 判定が当たった規則の
+        マスク flags (行数 x len(BATCH_RULES))。行ごとの dict が必要なら reports() で展開する。
+        """
+        n = len(table) if hasattr(table, "column_names") else len(next(iter(table.values())))
+        values = {}
+        for name in FEATURE_COLUMNS:
+            column = _column(table, name)
+            if column is None:
+                if name != "cer":
+                    raise KeyError(f"Missing feature column: {name}")
+                column = np.zeros(n)
+            values[name] = np.asarray(column, dtype=float)
+
+        buckets = {name: np.full(n, 100, dtype=np.int64) for name in ("quality", "pronunciation", "prosody")}
+        flags = np.zeros((n, len(BATCH_RULES)), dtype=bool)
+        for i, (bucket, name, condition, penalty, _, _) in enumerate(BATCH_RULES):
+            flags[:, i] = condition(values[name])
+            buckets[bucket] -= penalty * flags[:, i]
+
+        overall = (buckets["quality"] + buckets["pronunciation"] + buckets["prosody"]) / 3
+        return {
+            "overall_score": np.round(overall, 1),
+            "buckets": buckets,
+            "lora_recommended": (overall < 60) & (buckets["quality"] < 70),
+            "flags": flags,
+            "values": values,
+        }
+
+    def reports(self, batch):
+        """diagnose_many() の結果を diagnose() と同じ形の dict のリストに展開する"""
+        reports = []
+        for row in range(len(batch["overall_score"])):
+            highlights = []
+            suggestions = []
+            for i in np.flatnonzero(batch["flags"][row]):
+                _, name, _, _, highlight, suggestion = BATCH_RULES[i]
+                highlights.append(highlight.format(value=float(batch["values"][name][row])))
+                suggestions.append(suggestion)
+            reports.append({
+                "overall_score": float(batch["overall_score"][row]),
+                "buckets": {bucket: int(scores[row]) for bucket, scores in batch["buckets"].items()},
+                "highlights": highlights,
+                "suggestions": suggestions,
+                "lora_recommended": bool(batch["lora_recommended"][row]),
+            })
+        return reports
+
+
+def diagnose_ndjson(lines, out=None):
+    """NDJSON の Inspector 結果を1行ずつ診断し、レポートを1行ずつ書き出す (行ごとに flush)
+
+    入力行はそのまま保持しないため、件数によらずメモリ使用量は一定。"file" はレポートに引き継ぎ、
+    "linguist" ({"cer": ...}) があれば発音の判定に使う。"error" の行や解釈できない行は
+    エラーの行として出力し、入力と出力の行が1対1に対応するようにする。
+    """
+    out = out or sys.stdout
+    diag = Diagnostician()
+    count = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = None
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise TypeError(f"expected a JSON object, got {type(record).__name__}")
+            if "error" in record:
+                report = {"file": record.get("file"), "error": record["error"]}
+            else:
+                report = {"file": record.get("file"), **diag.diagnose(record, record.get("linguist"))}
+        except Exception as e:
+            # 1行の不備でパイプライン全体を止めない。ファイル名が分かればエラーの行に残す
+            file = record.get("file") if isinstance(record, dict) else None
+            report = {"file": file, "error": f"{type(e).__name__}: {e}"}
+        out.write(json.dumps(report, ensure_ascii=False) + "\n")
+        out.flush()
+        count += 1
+    return count
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diagnose Inspector results (JSON on stdin)")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Read one Inspector record per line (inspect-common-audio.py --ndjson) "
+                             "and write one report per line as each arrives")
+    args = parser.parse_args()
+    if args.ndjson:
+        try:
+            diagnose_ndjson(sys.stdin)
+        except BrokenPipeError:
+            # 後段が先に終了した (| head 等)
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(0)
+
     # Example usage with stdin
     input_data = json.load(sys.stdin)
     diag = Diagnostician()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+"""
+複数ノードでの分散評価 (共有ディレクトリ上のリース方式ワークキュー)
+
+Kaggle セッション・Docker ホスト・予備の Linux 機など、同じ出力フォルダを見ている複数のノードで
+worker を起動すると、各 worker は評価待ちの WAV をリースファイルで1件ずつ確保して評価し、
+ファイルごとの結果を書き出す。全件そろったら reducer が1回だけレポートを作成する。
+
+  <target_dir>/.eval_queue/leases/<wav>.lease   確保中 (所有者・期限。評価中は heartbeat で延長)
+  <target_dir>/.eval_queue/results/<wav>.json   評価結果 (作成は1回だけ。既にあれば上書きしない)
+  <target_dir>/.eval_queue/workers/<id>.json    worker ごとの処理件数・時間
+
+リースの作成は O_CREAT|O_EXCL、期限切れリースの引き継ぎは rename、結果の作成は link で行い、
+いずれも既存ファイルがあれば失敗するため、同じファイルの結果が2回書かれることはない。
+期限はノードの時計で判定するため、--lease-seconds はノード間の時計のずれより十分長くする。
+Dropbox 等の非同期の同期フォルダではこれらの操作が原子的にならないため、NFS/SMB や
+バインドマウントのように全ノードが同じファイルシステムを直接見ている場合に使う。
+ハードリンクを作れないファイルシステムでは worker は起動時にエラーで終了する。
+
+  python src/distribute-common-eval.py worker tts_outputs      # 各ノードで (何プロセスでも可)
+  python src/distribute-common-eval.py reduce tts_outputs --wait
+"""
+import os
+import sys
+import json
+import glob
+import time
+import uuid
+import zlib
+import shutil
+import socket
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.cache import DEFAULT_CACHE_PATH
+from tools.store import ResultStore, DEFAULT_STORE_PATH
+
+QUEUE_NAME = ".eval_queue"
+DEFAULT_LEASE_SECONDS = 120
+
+
+def queue_dirs(target_dir, queue_dir=None):
+    root = queue_dir or os.path.join(target_dir, QUEUE_NAME)
+    dirs = {name: os.path.join(root, name) for name in ("leases", "results", "workers")}
+    for path in dirs.values():
+        os.makedirs(path, exist_ok=True)
+    return dirs
+
+
+def _read_json(path):
+    """読めなければ None (書き込み途中・削除直後など)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def check_hard_links(directory):
+    """directory でハードリンクを作れるか確かめる (結果の作成とリースの引き継ぎに使う)"""
+    probe = os.path.join(directory, f".link-check.{uuid.uuid4().hex}")
+    with open(probe, "w"):
+        pass
+    try:
+        os.link(probe, probe + ".link")
+        os.remove(probe + ".link")
+    except OSError as e:
+        raise RuntimeError(
+            f"{directory} ではハードリンクを作成できないため、結果を1回だけ書く保証ができません "
+            f"({type(e).__name__}: {e})。NFS/SMB やローカルのファイルシステムを --queue-dir に"
+            f"指定してください") from e
+    finally:
+        os.remove(probe)
+
+
+def _write_exclusive(path, payload):
+    """path が無い場合だけ作成する (一時ファイルに書いてから link するため、中途半端な内容は見えない)"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    try:
+        os.link(tmp_path, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp_path)
+
+
+class Lease:
+    """1ファイル分の確保。期限 (expires) を heartbeat で延長し、期限切れなら他の worker が引き継げる"""
+
+    def __init__(self, path, owner, seconds=DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.owner = owner
+        self.seconds = seconds
+        self.token = uuid.uuid4().hex
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _payload(self):
+        return {"owner": self.owner, "token": self.token, "expires": time.time() + self.seconds}
+
+    def _create(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._payload(), f)
+        return True
+
+    def _expires(self):
+        """(期限, リースの内容)。中身が読めないリースは更新時刻から期限を決める
+
+        作成直後で書き込み前のリースのほか、作成と書き込みの間に worker が落ちた空のリースも
+        期限が来れば引き継げるようにする (そうしないとそのファイルは誰にも評価されない)
+        """
+        current = _read_json(self.path)
+        if current is not None:
+            return current.get("expires", 0), current
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None, None
+        return stat.st_mtime + self.seconds, {"mtime_ns": stat.st_mtime_ns}
+
+    def acquire(self):
+        if self._create():
+            return True
+        expires, current = self._expires()
+        if expires is None or expires > time.time():
+            return False
+        # 期限切れ: rename で取り除けた worker だけが引き継ぐ
+        stale_path = f"{self.path}.{self.token}.stale"
+        try:
+            os.rename(self.path, stale_path)
+        except FileNotFoundError:
+            return False
+        taken = _read_json(stale_path)
+        if taken is None:
+            taken = {"mtime_ns": os.stat(stale_path).st_mtime_ns}
+        if taken.get("token") != current.get("token") or taken.get("mtime_ns") != current.get("mtime_ns"):
+            # 別の worker が引き継いだ直後の新しいリースだったので元に戻す
+            try:
+                os.link(stale_path, self.path)
+            except FileExistsError:
+                pass
+            os.remove(stale_path)
+            return False
+        os.remove(stale_path)
+        return self._create()
+
+    def owned(self):
+        current = _read_json(self.path)
+        return current is not None and current.get("token") == self.token
+
+    def renew(self):
+        if not self.owned():
+            self.lost.set()
+            return False
+        tmp_path = f"{self.path}.{self.token}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._payload(), f)
+        os.replace(tmp_path, self.path)
+        return True
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.seconds / 3):
+            if not self.renew():
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self.owned():
+            os.remove(self.path)
+
+
+def pending_files(target_dir, dirs):
+    """結果がまだ無い WAV (名前順)"""
+    return [path for path in sorted(glob.glob(os.path.join(target_dir, "*.wav")))
+            if not os.path.exists(os.path.join(dirs["results"], os.path.basename(path) + ".json"))]
+
+
+def run_worker(target_dir, queue_dir=None, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+               cache_path=DEFAULT_CACHE_PATH, poll_seconds=2.0, exit_when_idle=True):
+    """評価待ちがなくなるまで、リースを確保できたファイルを1件ずつ評価する"""
+    from tools.inspector import Inspector
+    from tools.diagnostician import Diagnostician
+    from tools.cache import ResultCache, CachedInspector
+    from tools.batch import evaluate_file
+
+    dirs = queue_dirs(target_dir, queue_dir)
+    check_hard_links(dirs["results"])
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    inspector = Inspector()
+    if cache_path:
+        inspector = CachedInspector(inspector, ResultCache(cache_path))
+    diagnostician = Diagnostician()
+    print(f"worker {worker_id}: 開始 ({target_dir})")
+
+    evaluated = []
+    # 評価を始めたファイル (結果を破棄した分も含む。同じファイルを2回評価していないかの確認用)
+    started = []
+    start = time.perf_counter()
+    while True:
+        pending = pending_files(target_dir, dirs)
+        if not pending:
+            if exit_when_idle:
+                break
+            time.sleep(poll_seconds)
+            continue
+        # worker ごとに開始位置をずらし、同じファイルの取り合いを減らす
+        offset = zlib.crc32(worker_id.encode()) % len(pending)
+        claimed = False
+        for wav_path in pending[offset:] + pending[:offset]:
+            name = os.path.basename(wav_path)
+            result_path = os.path.join(dirs["results"], name + ".json")
+            if os.path.exists(result_path):
+                continue
+            lease = Lease(os.path.join(dirs["leases"], name + ".lease"), worker_id, lease_seconds)
+            if not lease.acquire():
+                continue
+            claimed = True
+            with lease:
+                # リース確保までの間に他の worker が評価を終えていれば何もしない
+                if os.path.exists(result_path):
+                    continue
+                started.append(name)
+                result = evaluate_file(wav_path, inspector, diagnostician)
+                if lease.lost.is_set() or not lease.owned():
+                    print(f"worker {worker_id}: リースを失ったため結果を破棄: {name}")
+                    continue
+                payload = {
+                    "file": name,
+                    "worker": worker_id,
+                    "evaluated_at": datetime.now().isoformat(timespec="seconds"),
+                    "size": os.path.getsize(wav_path),
+                    "result": result,
+                }
+                if result is None:
+                    # 読み込めないファイル等は再試行し続けないよう、失敗として記録する
+                    payload["error"] = "evaluation failed"
+                if _write_exclusive(result_path, payload):
+                    evaluated.append(name)
+        if not claimed:
+            # 残りは全て他の worker が評価中。期限切れのリースがあれば次の周回で引き継ぐ
+            time.sleep(poll_seconds)
+
+    elapsed = time.perf_counter() - start
+    stats = {"worker": worker_id, "evaluated": evaluated, "started": started, "seconds": round(elapsed, 3)}
+    with open(os.path.join(dirs["workers"], f"{worker_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False)
+    print(f"worker {worker_id}: {len(evaluated)} 件を評価 ({elapsed:.1f}s)")
+    return stats
+
+
+def queue_status(target_dir, queue_dir=None):
+    dirs = queue_dirs(target_dir, queue_dir)
+    wavs = sorted(os.path.basename(p) for p in glob.glob(os.path.join(target_dir, "*.wav")))
+    done = {name for name in wavs if os.path.exists(os.path.join(dirs["results"], name + ".json"))}
+    leased = {}
+    for name in wavs:
+        lease = _read_json(os.path.join(dirs["leases"], name + ".lease"))
+        if lease and name not in done:
+            leased[name] = lease
+    now = time.time()
+    return {
+        "total": len(wavs),
+        "done": len(done),
+        "in_progress": sum(1 for lease in leased.values() if lease.get("expires", 0) > now),
+        "expired_leases": sum(1 for lease in leased.values() if lease.get("expires", 0) <= now),
+        "waiting": len(wavs) - len(done) - len(leased),
+    }
+
+
+def reduce_results(target_dir, queue_dir=None, store_path=DEFAULT_STORE_PATH, wait=False, poll_seconds=5.0):
+    """ファイルごとの結果を集めてレポート (と結果ストア) を作成する。wait なら全件そろうまで待つ"""
+    from tools.batch import write_reports
+
+    dirs = queue_dirs(target_dir, queue_dir)
+    while wait:
+        status = queue_status(target_dir, queue_dir)
+        if status["done"] >= status["total"]:
+            break
+        print(f"reducer: {status['done']}/{status['total']} 件 (評価中 {status['in_progress']})")
+        time.sleep(poll_seconds)
+
+    results, failed = [], []
+    for wav_path in sorted(glob.glob(os.path.join(target_dir, "*.wav"))):
+        payload = _read_json(os.path.join(dirs["results"], os.path.basename(wav_path) + ".json"))
+        if payload is None:
+            continue
+        if payload.get("result") is None:
+            failed.append(payload["file"])
+        else:
+            results.append(payload["result"])
+    if failed:
+        print(f"評価に失敗したファイル: {', '.join(failed)}")
+    if not results:
+        print("集計できる評価結果がありません。")
+        return None
+
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if store_path:
+        count = ResultStore(store_path).add(results, run_id=timestamp, source="distribute-common-eval")
+        print(f"結果ストアに {count} 件を保存しました: {store_path}")
+    return write_reports(results, target_dir, timestamp)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="共有ディレクトリ上のリースで複数ノードに評価を分散する")
+    parser.add_argument("mode", choices=["worker", "reduce", "status", "reset"],
+                        help="worker: 評価, reduce: レポート作成, status: 進捗, reset: キューの削除")
+    parser.add_argument("target_dir", nargs="?", default="tts_outputs", help="評価対象ディレクトリ (共有フォルダ)")
+    parser.add_argument("--queue-dir", default=None, help=f"リース・結果の置き場 (既定: <target_dir>/{QUEUE_NAME})")
+    parser.add_argument("--worker-id", default=None, help="worker の識別名 (既定: ホスト名-PID)")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="リースの有効期限。評価中は 1/3 ごとに延長し、worker が落ちると期限後に他が引き継ぐ")
+    parser.add_argument("--follow", action="store_true", help="worker を終了せず、新しいWAVを待ち続ける")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Inspector結果キャッシュ (各ノードのローカルに置く)")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わない")
+    parser.add_argument("--wait", action="store_true", help="reduce で全件の結果がそろうまで待つ")
+    parser.add_argument("--store-path", default=DEFAULT_STORE_PATH, help="評価結果ストア (SQLite)")
+    parser.add_argument("--no-store", action="store_true", help="結果ストアに保存しない")
+    args = parser.parse_args()
+
+    if args.mode == "worker":
+        try:
+            run_worker(args.target_dir, args.queue_dir, args.worker_id, args.lease_seconds,
+                       None if args.no_cache else args.cache_path, exit_when_idle=not args.follow)
+        except RuntimeError as e:
+            sys.exit(f"worker: {e}")
+    elif args.mode == "reduce":
+        reduce_results(args.target_dir, args.queue_dir, None if args.no_store else args.store_path, args.wait)
+    elif args.mode == "status":
+        print(json.dumps(queue_status(args.target_dir, args.queue_dir), ensure_ascii=False, indent=2))
+    else:
+        shutil.rmtree(args.queue_dir or os.path.join(args.target_dir, QUEUE_NAME), ignore_errors=True)
+        print("キューを削除しました。")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""
+話者埋め込みによる話者類似度 (CPU)
+
+SOURCE/*.wav (志ん生の参照音声) の埋め込みを一度だけ計算して行列としてディスクに保存し、
+候補音声の埋め込みはまとめてバッチで計算する。類似度は L2 正規化した埋め込み同士の
+行列積 (コサイン類似度) で、参照ごとの値と参照全体の重心との値を同時に求める。
+
+エンコーダー: resemblyzer (GE2E, 256次元) または ecapa (speechbrain ECAPA-TDNN, 192次元)
+"""
+import os
+import sys
+import glob
+import hashlib
+import argparse
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.cache import file_hash
+
+ENCODER_SAMPLE_RATE = 16000
+DEFAULT_REF_DIR = "SOURCE"
+DEFAULT_INDEX_DIR = ".cache"
+# エンコーダーごとの埋め込み次元
+ENCODERS = {"resemblyzer": 256, "ecapa": 192}
+
+
+def load_mono(audio_path, sr=ENCODER_SAMPLE_RATE):
+    y, file_sr = sf.read(audio_path, dtype="float32", always_2d=True)
+    y = y.mean(axis=1)
+    if file_sr != sr:
+        y = soxr.resample(y, file_sr, sr)
+    return y
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class SpeakerEncoder:
+    def __init__(self, backend="resemblyzer", device="cpu", batch_size=16):
+        if backend not in ENCODERS:
+            raise ValueError(f"Unknown speaker encoder: {backend} (choose from {', '.join(ENCODERS)})")
+        self.backend = backend
+        self.device = device
+        self.batch_size = batch_size
+        self._model = None
+
+    @property
+    def model(self):
+        # 初回だけロードし、以降は使い回す
+        if self._model is None:
+            if self.backend == "resemblyzer":
+                from resemblyzer import VoiceEncoder
+                self._model = VoiceEncoder(device=self.device, verbose=False)
+            else:
+                try:
+                    from speechbrain.inference.speaker import EncoderClassifier
+                except ImportError:
+                    from speechbrain.pretrained import EncoderClassifier
+                self._model = EncoderClassifier.from_hparams(
+                    source="speechbrain/spkrec-ecapa-voxceleb", run_opts={"device": self.device})
+        return self._model
+
+    def embed_many(self, audio_paths):
+        """L2 正規化した埋め込み (ファイル数 x 次元)。読み込めないファイルの行は NaN"""
+        wavs = [None] * len(audio_paths)
+        for i, path in enumerate(audio_paths):
+            try:
+                wavs[i] = load_mono(path)
+            except Exception as e:
+                print(f"話者埋め込みをスキップ: {os.path.basename(path)} ({type(e).__name__}: {e})")
+        return self.embed_arrays(wavs)
+
+    def embed_arrays(self, wavs):
+        """16kHz モノラル波形のリストに対する埋め込み。None の行は NaN"""
+        embed = self._embed_resemblyzer if self.backend == "resemblyzer" else self._embed_ecapa
+        loaded = [i for i, w in enumerate(wavs) if w is not None]
+        result = np.full((len(wavs), ENCODERS[self.backend]), np.nan, dtype=np.float32)
+        for k in range(0, len(loaded), self.batch_size):
+            batch = loaded[k:k + self.batch_size]
+            result[batch] = _normalize_rows(embed([wavs[i] for i in batch]))
+        return result
+
+    def _embed_resemblyzer(self, wavs):
+        import torch
+        from resemblyzer import preprocess_wav
+        from resemblyzer.audio import wav_to_mel_spectrogram
+
+        # VoiceEncoder.embed_utterance と同じ部分区間 (1.6秒) 分割を、複数ファイル分まとめて1回で推論する
+        encoder = self.model
+        partials, counts = [], []
+        for wav in wavs:
+            wav = preprocess_wav(wav, source_sr=ENCODER_SAMPLE_RATE)
+            wav_slices, mel_slices = encoder.compute_partial_slices(len(wav), rate=1.3, min_coverage=0.75)
+            if wav_slices[-1].stop >= len(wav):
+                wav = np.pad(wav, (0, wav_slices[-1].stop - len(wav)))
+            mel = wav_to_mel_spectrogram(wav)
+            partials.extend(mel[s] for s in mel_slices)
+            counts.append(len(mel_slices))
+        with torch.no_grad():
+            partial_embeds = encoder(torch.from_numpy(np.array(partials)).to(self.device)).cpu().numpy()
+        offsets = np.cumsum([0] + counts)
+        return np.stack([partial_embeds[a:b].mean(axis=0) for a, b in zip(offsets[:-1], offsets[1:])])
+
+    def _embed_ecapa(self, wavs):
+        import torch
+
+        # 長さの違う音声を末尾ゼロ埋めし、相対長 (wav_lens) で有効区間を渡す
+        longest = max(len(w) for w in wavs)
+        batch = np.zeros((len(wavs), longest), dtype=np.float32)
+        for i, w in enumerate(wavs):
+            batch[i, :len(w)] = w
+        lengths = torch.tensor([len(w) / longest for w in wavs])
+        with torch.no_grad():
+            embeddings = self.model.encode_batch(torch.from_numpy(batch), lengths)
+        return embeddings.squeeze(1).cpu().numpy()
+
+
+class ReferenceIndex:
+    """参照音声の埋め込み行列。行は L2 正規化済み"""
+
+    def __init__(self, names, hashes, matrix, encoder_name):
+        self.names = list(names)
+        self.hashes = list(hashes)
+        self.matrix = matrix
+        self.encoder_name = encoder_name
+        self.centroid = _normalize_rows(matrix.mean(axis=0)) if len(matrix) else matrix
+
+    @property
+    def fingerprint(self):
+        """参照セットとエンコーダーの識別子 (評価結果キャッシュのキーに使う)"""
+        digest = hashlib.sha1(self.encoder_name.encode())
+        for name, h in zip(self.names, self.hashes):
+            digest.update(f"{name}:{h}".encode())
+        return digest.hexdigest()[:12]
+
+    @classmethod
+    def load_or_build(cls, encoder, ref_dir=DEFAULT_REF_DIR, index_path=None):
+        """保存済みの行列を読み込み、追加・変更された参照音声だけ埋め込みを計算して保存し直す"""
+        index_path = index_path or os.path.join(DEFAULT_INDEX_DIR, f"speaker_refs_{encoder.backend}.npz")
+        ref_paths = sorted(glob.glob(os.path.join(ref_dir, "*.wav")))
+        hashes = [file_hash(path) for path in ref_paths]
+
+        saved = {}
+        if os.path.exists(index_path):
+            with np.load(index_path) as data:
+                saved = dict(zip(data["hashes"].tolist(), data["matrix"]))
+
+        pending = [(path, h) for path, h in zip(ref_paths, hashes) if h not in saved]
+        if pending:
+            print(f"参照音声の埋め込みを計算中: {len(pending)} / {len(ref_paths)} 件 ({encoder.backend})")
+            paths, new_hashes = zip(*pending)
+            for h, row in zip(new_hashes, encoder.embed_many(list(paths))):
+                # 読み込めなかった参照音声は索引に入れない
+                if np.isfinite(row).all():
+                    saved[h] = row
+        kept = [(path, h) for path, h in zip(ref_paths, hashes) if h in saved]
+        ref_paths, hashes = [path for path, _ in kept], [h for _, h in kept]
+        dim = ENCODERS[encoder.backend]
+        matrix = np.stack([saved[h] for h in hashes]) if hashes else np.zeros((0, dim), dtype=np.float32)
+
+        if pending or len(saved) != len(hashes):
+            os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+            # 途中で中断されても壊れないよう、一時ファイルに書いてから置き換える
+            tmp_path = index_path + ".tmp.npz"
+            np.savez(tmp_path, names=np.array([os.path.basename(p) for p in ref_paths]),
+                     hashes=np.array(hashes), matrix=matrix)
+            os.replace(tmp_path, index_path)
+        return cls([os.path.basename(p) for p in ref_paths], hashes, matrix, encoder.backend)
+
+    def score(self, embeddings):
+        """候補の埋め込み (n x d) に対する参照ごとの類似度 (n x 参照数) と重心との類似度 (n)"""
+        per_reference = embeddings @ self.matrix.T
+        centroid = embeddings @ self.centroid
+        return per_reference, centroid
+
+
+def build_speaker_scorer(backend="resemblyzer", ref_dir=DEFAULT_REF_DIR, batch_size=16):
+    """エンコーダーと参照インデックス。依存ライブラリや参照音声が無ければ (None, None)"""
+    module = "resemblyzer" if backend == "resemblyzer" else "speechbrain"
+    try:
+        __import__(module)
+    except ImportError:
+        print(f"{module} が見つからないため話者類似度を計算しません (pip install {module})")
+        return None, None
+    encoder = SpeakerEncoder(backend, batch_size=batch_size)
+    index = ReferenceIndex.load_or_build(encoder, ref_dir)
+    if not index.names:
+        print(f"{ref_dir} に参照音声が無いため話者類似度を計算しません")
+        return None, None
+    return encoder, index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="候補音声と参照音声 (SOURCE/*.wav) の話者類似度を表示する")
+    parser.add_argument("audio_paths", nargs="+", help="候補音声")
+    parser.add_argument("--ref-dir", default=DEFAULT_REF_DIR, help="参照音声のディレクトリ")
+    parser.add_argument("--encoder", choices=ENCODERS, default="resemblyzer", help="話者埋め込みモデル")
+    parser.add_argument("--batch-size", type=int, default=16, help="1回の推論でまとめるファイル数")
+    args = parser.parse_args()
+
+    encoder, index = build_speaker_scorer(args.encoder, args.ref_dir, args.batch_size)
+    if encoder is None:
+        sys.exit(1)
+    per_reference, centroid = index.score(encoder.embed_many(args.audio_paths))
+    print("| ファイル | 重心 | " + " | ".join(index.names) + " |")
+    print("| :--- | :---: |" + " :---: |" * len(index.names))
+    for path, row, c in zip(args.audio_paths, per_reference, centroid):
+        if np.isnan(c):
+            print(f"| {os.path.basename(path)} | 読み込み失敗 |" + " - |" * len(index.names))
+        else:
+            print(f"| {os.path.basename(path)} | {c:.3f} | " + " | ".join(f"{v:.3f}" for v in row) + " |")
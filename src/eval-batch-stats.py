@@ -2,6 +2,11 @@ import os
 import sys
 import json
 import glob
+import time
+import argparse
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import numpy as np
@@ -12,53 +17,357 @@ if str(current_dir) not in sys.path:
     sys.path.append(str(current_dir))
 
 try:
-    from tools.inspector import Inspector
+    from tools.inspector import Inspector, StageTimer, summarize_timings
     from tools.diagnostician import Diagnostician
+    from tools.cache import ResultCache, CachedInspector, DEFAULT_CACHE_PATH, file_hash, source_version
+    from tools.store import ResultStore, DEFAULT_STORE_PATH
+    from tools.linguist import build_linguist
+    from tools.decode import DecodedAudio, DEFAULT_PREFETCH, prefetch as prefetch_audio
+    from tools.scorer import build_audio_scorer, MODEL_SAMPLE_RATE
 except ImportError:
     # Docker内などの環境に合わせたフォールバック
     sys.path.append("/app/src")
-    from tools.inspector import Inspector
+    from tools.inspector import Inspector, StageTimer, summarize_timings
     from tools.diagnostician import Diagnostician
+    from tools.cache import ResultCache, CachedInspector, DEFAULT_CACHE_PATH, file_hash, source_version
+    from tools.store import ResultStore, DEFAULT_STORE_PATH
+    from tools.linguist import build_linguist
+    from tools.decode import DecodedAudio, DEFAULT_PREFETCH, prefetch as prefetch_audio
+    from tools.scorer import build_audio_scorer, MODEL_SAMPLE_RATE
 
-def run_batch_evaluation(target_dir="tts_outputs"):
-    print(f"\n--- 一括評価・統計開始: {target_dir} ---")
-    
-    wav_files = glob.glob(os.path.join(target_dir, "*.wav"))
-    if not wav_files:
-        print("評価対象のWAVファイルが見つかりません。")
-        return
+# 差分評価用のマニフェスト (評価対象ディレクトリ内に保存)
+MANIFEST_NAME = "eval_manifest.json"
 
+# ADR-010 の判定帯 (平均スコアの下限, 判定)
+VERDICT_BANDS = [
+    (75, "期待大 (学習継続)"),
+    (60, "見極め中 (LoRA検討)"),
+    (float("-inf"), "見限り検討 (要構造見直し)"),
+]
+
+# ワーカープロセスごとに1回だけ生成する評価器
+_worker = {}
+
+def _build_inspector(cache_path):
     inspector = Inspector()
-    diagnostician = Diagnostician()
-    
-    results = []
-    model_stats = {}
+    if cache_path:
+        inspector = CachedInspector(inspector, ResultCache(cache_path))
+    return inspector
 
-    for wav_path in wav_files:
-        try:
-            print(f"評価中: {os.path.basename(wav_path)}")
-            # モデル名をファイル名から抽出 (例: xtts-audio-...)
-            model_name = os.path.basename(wav_path).split('-')[0]
-            
-            inspector_results = inspector.analyze(wav_path)
-            report = diagnostician.diagnose(inspector_results)
-            
-            score = report['overall_score']
-            results.append({
-                "file": os.path.basename(wav_path),
-                "model": model_name,
-                "score": score,
-                "buckets": report['buckets'],
-                "lora_recommended": report.get('lora_recommended', False),
-                "inspector_data": inspector_results
-            })
-
-            if model_name not in model_stats:
-                model_stats[model_name] = []
-            model_stats[model_name].append(score)
+def _init_worker(cache_path, profile=False, scorer_options=None):
+    _worker["inspector"] = _build_inspector(cache_path)
+    _worker["diagnostician"] = Diagnostician()
+    _worker["profile"] = profile
+    # MOS・話者埋め込みのモデルもワーカーごとに1回だけロードする
+    _worker["scorer"] = build_audio_scorer(**scorer_options) if scorer_options is not None else None
+    _worker["score_cache"] = ResultCache(cache_path) if cache_path else None
+
+def evaluate_file(wav_path, inspector, diagnostician, profile=False, linguist_data=None, audio=None):
+    """1ファイルを評価する (MOS・話者類似度は evaluate_chunk でまとめて求める)。
+    失敗しても他のファイルに影響しないよう None を返す
+
+    audio: 先読み済みの DecodedAudio (無ければここでデコードする)
+    """
+    try:
+        print(f"評価中: {os.path.basename(wav_path)}")
+        # モデル名をファイル名から抽出 (例: xtts-audio-...)
+        model_name = os.path.basename(wav_path).split('-')[0]
+
+        timer = StageTimer() if profile else None
+        # Inspector (24kHz) と MOS・話者類似度 (16kHz) は同じデコード結果から波形を取る
+        audio = audio or DecodedAudio(wav_path)
+        inspector_results = inspector.analyze(wav_path, timer=timer, audio=audio)
+        if timer:
+            with timer.stage("diagnose"):
+                report = diagnostician.diagnose(inspector_results, linguist_data)
+        else:
+            report = diagnostician.diagnose(inspector_results, linguist_data)
+
+        result = {
+            "file": os.path.basename(wav_path),
+            "model": model_name,
+            "score": report['overall_score'],
+            "buckets": report['buckets'],
+            "lora_recommended": report.get('lora_recommended', False),
+            "inspector_data": inspector_results
+        }
+        if linguist_data:
+            result["linguist_data"] = linguist_data
+        if timer:
+            result["timings"] = timer.as_dict()
+        return result
+    except Exception as e:
+        print(f"Error evaluating {wav_path}: {e}")
+        return None
+
+def evaluate_chunk(wav_paths, inspector, diagnostician, profile=False, linguist_results=None, scorer=None,
+                   score_cache=None, audios=None):
+    """数ファイルを評価し、MOS・話者類似度は評価できたファイルをまとめて1回の score_many で求める
+
+    audios: 先読み済みの DecodedAudio (None の要素はここでデコードする)
+    """
+    linguist_results = linguist_results or [None] * len(wav_paths)
+    audios = audios or [None] * len(wav_paths)
+    audios = [audio or DecodedAudio(wav_path) for wav_path, audio in zip(wav_paths, audios)]
+    results = [evaluate_file(wav_path, inspector, diagnostician, profile, linguist_data, audio)
+               for wav_path, linguist_data, audio in zip(wav_paths, linguist_results, audios)]
+    done = [i for i, res in enumerate(results) if res is not None]
+    if scorer is None or not done:
+        return results
 
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        scored = scorer.score_many([audios[i] for i in done], score_cache)
+    except Exception as e:
+        # 採点できなかったファイルは評価済みとして残さない (次回に評価し直す)
+        print(f"Error scoring {len(done)} files: {e}")
+        return [None] * len(wav_paths)
+    # プロファイルでは、まとめて推論した時間をファイル数で割って各ファイルに計上する
+    share = [round((time.perf_counter() - wall) / len(done), 6), round((time.thread_time() - cpu) / len(done), 6)]
+    for i, extra in zip(done, scored):
+        if extra is not None:
+            results[i].update(extra)
+        if profile:
+            results[i]["timings"]["ai_scores"] = share
+    return results
+
+def _evaluate_in_worker(wav_paths, linguist_results=None):
+    return evaluate_chunk(wav_paths, _worker["inspector"], _worker["diagnostician"], _worker["profile"],
+                          linguist_results, _worker["scorer"], _worker["score_cache"])
+
+def _chunks(items, size):
+    return [items[k:k + size] for k in range(0, len(items), size)]
+
+def _chunk_size(scorer):
+    """MOS・話者埋め込みのバッチと同じ件数ずつ評価する (採点しなければ1件ずつワーカーに配る)"""
+    return scorer.options.get("batch_size", 16) if scorer is not None else 1
+
+def _prefetched(wav_files, inspector, scorer, score_cache, prefetch):
+    """解析中に次のファイルを読み込みスレッドでデコード・リサンプルしておく (キャッシュ済みのファイルはデコードしない)
+
+    キャッシュ済みかの判定 (内容ハッシュの計算) も読み込みスレッドで行う。ハッシュは ResultCache に
+    覚えておくため、解析側がキーを作る時にはファイルを読み直さない
+    """
+    if not prefetch:
+        return [None] * len(wav_files)
+    rates = [inspector.sr] + ([MODEL_SAMPLE_RATE] if scorer is not None else [])
+
+    def should_decode(wav_path):
+        if not hasattr(inspector, "is_cached") or not inspector.is_cached(wav_path):
+            return True
+        return scorer is not None and (score_cache is None or not scorer.is_cached(wav_path, score_cache))
+
+    return prefetch_audio(wav_files, rates, should_decode=should_decode, **prefetch)
+
+def _worker_pool(workers, cache_path, profile=False, scorer=None):
+    """評価ワーカーのプロセスプール。Inspector・スコアラーのモデルはワーカーごとに1回だけ読み込む"""
+    print(f"ワーカー数: {workers}")
+    scorer_options = scorer.options if scorer is not None else None
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(cache_path, profile, scorer_options))
+
+def evaluate_files(wav_files, workers=1, cache_path=DEFAULT_CACHE_PATH, profile=False, linguist=None,
+                   scorer=None, prefetch=DEFAULT_PREFETCH, pool=None):
+    """ファイル順を保ったまま評価する (失敗したファイルは None)
+
+    prefetch: 逐次実行時の先読み設定 (DEFAULT_PREFETCH と同じキーの dict, None で先読みしない)
+    pool: 何回も呼ぶ場合に使い回す _worker_pool() (無ければ workers > 1 の時に呼び出しごとに作る)
+    """
+    cache_before = ResultCache(cache_path).stats() if cache_path else None
+
+    # ASR モデルはワーカーごとに複製せず、メインプロセスで常駐させてまとめて文字起こしする
+    linguist_results = [None] * len(wav_files)
+    if linguist:
+        try:
+            linguist_results = linguist.analyze_many(wav_files)
         except Exception as e:
-            print(f"Error evaluating {wav_path}: {e}")
+            print(f"Linguist の実行に失敗したため発音評価をスキップします: {e}")
+
+    size = _chunk_size(scorer)
+    file_chunks, linguist_chunks = _chunks(list(wav_files), size), _chunks(linguist_results, size)
+    if pool is not None:
+        evaluated = [res for chunk in pool.map(_evaluate_in_worker, file_chunks, linguist_chunks) for res in chunk]
+    elif workers > 1:
+        with _worker_pool(workers, cache_path, profile, scorer) as executor:
+            evaluated = [res for chunk in executor.map(_evaluate_in_worker, file_chunks, linguist_chunks)
+                         for res in chunk]
+    else:
+        inspector = _build_inspector(cache_path)
+        diagnostician = Diagnostician()
+        score_cache = ResultCache(cache_path) if cache_path and scorer is not None else None
+        stream = iter(_prefetched(wav_files, inspector, scorer, score_cache, prefetch))
+        evaluated = []
+        for chunk, linguist_chunk in zip(file_chunks, linguist_chunks):
+            audios = list(itertools.islice(stream, len(chunk)))
+            evaluated.extend(evaluate_chunk(chunk, inspector, diagnostician, profile, linguist_chunk, scorer,
+                                            score_cache, audios))
+
+    if cache_path:
+        # カウンタはキャッシュファイル側で集計されるため、並列実行でも合算される
+        cache_after = ResultCache(cache_path).stats()
+        print(f"キャッシュ: ヒット {cache_after['hits'] - cache_before['hits']} / "
+              f"ミス {cache_after['misses'] - cache_before['misses']} "
+              f"(保存数 {cache_after['entries']}, {cache_after['bytes'] / 1e6:.1f} MB)")
+    return evaluated
+
+def evaluator_version(linguist=None, scorer=None):
+    """評価結果に影響するスクリプトのハッシュ (変われば全ファイルを再評価する)"""
+    names = ["inspect-common-audio.py", "diagnose-common-system.py"]
+    if linguist:
+        names.append("transcribe-common-audio.py")
+    version = "-".join(source_version(str(current_dir / name)) for name in names)
+    if linguist:
+        version = f"{version}-asr:{linguist.model_size}"
+    if scorer is not None:
+        params = scorer.cache_params()
+        version = f"{version}-score:{params['version']}:{params['speaker']}:{params['mos']}"
+    return version
+
+def load_manifest(target_dir):
+    manifest_path = os.path.join(target_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(target_dir, manifest):
+    # 途中で中断されても壊れないよう、一時ファイルに書いてから置き換える
+    manifest_path = os.path.join(target_dir, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def _is_current(entry, stat, version, wav_path):
+    if entry is None or entry.get("version") != version or entry.get("size") != stat.st_size:
+        return False
+    if entry.get("mtime") == stat.st_mtime:
+        return True
+    # mtime だけ変わった (コピー・同期など) 場合は内容ハッシュで判定する
+    if entry.get("sha256") == file_hash(wav_path):
+        entry["mtime"] = stat.st_mtime
+        return True
+    return False
+
+def verdict(mean_score):
+    for lower, label in VERDICT_BANDS:
+        if mean_score >= lower:
+            return label
+
+def bootstrap_interval(scores, rng, n_boot=2000, confidence=0.95):
+    """平均スコアのブートストラップ信頼区間 (再標本化は n_boot 件ずつの配列演算で行う)
+
+    信頼水準が高く裾の確率が小さい場合は、裾に 10 件以上入るよう再標本化の回数を増やす。
+    """
+    scores = np.asarray(scores, dtype=float)
+    alpha = (1 - confidence) / 2
+    total = max(n_boot, int(np.ceil(10 / alpha)))
+    means = np.concatenate([
+        scores[rng.integers(0, len(scores), size=(min(n_boot, total - done), len(scores)))].mean(axis=1)
+        for done in range(0, total, n_boot)
+    ])
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+def spent_alpha(fraction, alpha):
+    """線形の α 消費関数 (Lan-DeMets)。全数のうち fraction を評価した時点までに使ってよい誤り率"""
+    return alpha * min(max(fraction, 0.0), 1.0)
+
+def adaptive_evaluation(wav_files, workers=1, cache_path=DEFAULT_CACHE_PATH, profile=False,
+                        min_samples=10, step=5, confidence=0.95, n_boot=2000, seed=0, linguist=None,
+                        scorer=None, prefetch=DEFAULT_PREFETCH):
+    """逐次評価: モデルごとにランダム順で少しずつ評価し、信頼区間が1つの判定帯に収まった時点で打ち切る
+
+    区間は途中で何度も見るため、1回ごとに confidence の区間を使うと全体の信頼水準が下がる。
+    モデルごとの誤り率 1 - confidence を評価済みの割合に比例して各回に配分し (α 消費関数)、
+    各回はその回に配分した分だけの区間を使う。配分の合計は 1 - confidence を超えないので、
+    どの回で打ち切っても区間全体の信頼水準は confidence 以上になる (Bonferroni)。
+    """
+    rng = np.random.default_rng(seed)
+    alpha = 1 - confidence
+    queues = {}
+    for wav_path in wav_files:
+        queues.setdefault(os.path.basename(wav_path).split('-')[0], []).append(wav_path)
+    for model in queues:
+        queues[model] = list(rng.permutation(queues[model]))
+    totals = {model: len(queue) for model, queue in queues.items()}
+    spent = {model: 0.0 for model in queues}
+    looks = {model: 0 for model in queues}
+
+    scores = {model: [] for model in queues}
+    summary = {}
+    results = []
+    # 毎回プールを作り直すとワーカーがモデルを読み込み直すため、全ての回で1つのプールを使う
+    pool = _worker_pool(workers, cache_path, profile, scorer) if workers > 1 else contextlib.nullcontext()
+    with pool:
+        while len(summary) < len(queues):
+            # 未確定のモデルから step 件ずつ (初回は min_samples 件) まとめて評価する
+            batch = []
+            for model, queue in queues.items():
+                if model in summary:
+                    continue
+                n = max(step, min_samples - len(scores[model]))
+                batch.extend(queue[:n])
+                del queue[:n]
+            evaluated = [res for res in evaluate_files(batch, workers, cache_path, profile, linguist,
+                                                       scorer, prefetch, pool if workers > 1 else None)
+                         if res is not None]
+            results.extend(evaluated)
+            for res in evaluated:
+                scores[res["model"]].append(res["score"])
+
+            for model, queue in queues.items():
+                if model in summary:
+                    continue
+                exhausted = not queue
+                if not scores[model]:
+                    if exhausted:
+                        summary[model] = None
+                    continue
+                if len(scores[model]) < min_samples and not exhausted:
+                    continue
+                # 前回から今回までに評価した割合の分だけ誤り率を使う
+                budget = spent_alpha(1 - len(queue) / totals[model], alpha)
+                look_alpha = budget - spent[model]
+                spent[model] = budget
+                looks[model] += 1
+                low, high = bootstrap_interval(scores[model], rng, n_boot, 1 - look_alpha)
+                decided = verdict(low) == verdict(high)
+                if decided or exhausted:
+                    summary[model] = {
+                        "samples": len(scores[model]),
+                        "total": len(scores[model]) + len(queue),
+                        "mean": float(np.mean(scores[model])),
+                        "ci_low": low,
+                        "ci_high": high,
+                        "confidence": confidence,
+                        "looks": looks[model],
+                        "look_confidence": 1 - look_alpha,
+                        "stopped_early": decided and not exhausted,
+                    }
+                    state = "打ち切り" if summary[model]["stopped_early"] else "全数評価"
+                    print(f"{model}: {state} ({summary[model]['samples']}/{summary[model]['total']} 件, "
+                          f"平均 {summary[model]['mean']:.2f}, 区間 [{low:.2f}, {high:.2f}])")
+
+    summary = {model: st for model, st in summary.items() if st is not None}
+    return results, summary
+
+def timing_table(summary):
+    """処理段階ごとの時間内訳 (Markdown の表)"""
+    lines = [
+        "| 段階 | ファイル数 | p50 (s) | p95 (s) | 合計 wall (s) | 合計 CPU (s) |",
+        "| :--- | :---: | :---: | :---: | :---: | :---: |",
+    ]
+    for name, st in sorted(summary.items(), key=lambda item: -item[1]["total_wall"]):
+        lines.append(f"| {name} | {st['files']} | {st['p50_wall']:.3f} | {st['p95_wall']:.3f} | "
+                     f"{st['total_wall']:.2f} | {st['total_cpu']:.2f} |")
+    return lines
+
+def write_reports(results, target_dir, timestamp, timing_summary=None, adaptive_summary=None):
+    model_stats = {}
+    for res in results:
+        if res["model"] not in model_stats:
+            model_stats[res["model"]] = []
+        model_stats[res["model"]].append(res["score"])
 
     # 統計レポート1: モデル選定サマリー (Go/No-Go判断用)
     summary_report_path = os.path.join(target_dir, f"report_1_model_summary_{timestamp}.md")
@@ -73,24 +382,251 @@ def run_batch_evaluation(target_dir="tts_outputs"):
         f.write("| :--- | :---: | :---: | :--- |\n")
         for model, scores in model_stats.items():
             avg = np.mean(scores)
-            status = "期待大 (学習継続)" if avg > 75 else "見極め中 (LoRA検討)" if avg > 60 else "見限り検討 (要構造見直し)"
-            f.write(f"| {model} | {len(scores)} | {avg:.2f} | {status} |\n")
+            f.write(f"| {model} | {len(scores)} | {avg:.2f} | {verdict(avg)} |\n")
+        if adaptive_summary:
+            f.write("\n## 逐次評価 (信頼区間による早期打ち切り)\n")
+            confidence = next(iter(adaptive_summary.values()))["confidence"]
+            f.write(f"信頼区間はブートストラップ (百分位法)。途中で区間を見るたびに誤り率 {1 - confidence:.0%} を"
+                    f"評価済みの割合に比例して配分し (線形の α 消費関数, Bonferroni)、"
+                    f"打ち切りの回数によらず全体で信頼水準 {confidence:.0%} 以上になるようにしています。"
+                    f"「回数」は区間を見た回数、括弧内はその回の信頼水準です。\n\n")
+            f.write("| モデル | 評価数 / 全数 | 平均スコア | 信頼区間 | 回数 | 判定 | 打ち切り |\n")
+            f.write("| :--- | :---: | :---: | :---: | :---: | :--- | :---: |\n")
+            for model, st in adaptive_summary.items():
+                stopped = "✅" if st["stopped_early"] else "-"
+                f.write(f"| {model} | {st['samples']} / {st['total']} | {st['mean']:.2f} | "
+                        f"[{st['ci_low']:.2f}, {st['ci_high']:.2f}] | {st['looks']} ({st['look_confidence']:.2%}) | "
+                        f"{verdict(st['mean'])} | {stopped} |\n")
         f.write("\n※ 判断基準は ADR-010 に準拠しています。")
 
     # レポート2の作成
     with open(detailed_report_path, "w", encoding="utf-8") as f:
         f.write(f"# レポート2: 詳細メトリクス一覧 ({timestamp})\n\n")
-        f.write("| ファイル名 | モデル | スコア | 物理特性 (RMS) | LoRA推奨 |\n")
-        f.write("| :--- | :--- | :---: | :---: | :---: |\n")
+        # --ai-scores で MOS・話者類似度を求めた場合だけ列を追加する
+        with_ai = any("ai_scores" in res for res in results)
+        if with_ai:
+            f.write("| ファイル名 | モデル | スコア | 物理特性 (RMS) | MOS予測 | 話者類似度 | LoRA推奨 |\n")
+            f.write("| :--- | :--- | :---: | :---: | :---: | :---: | :---: |\n")
+        else:
+            f.write("| ファイル名 | モデル | スコア | 物理特性 (RMS) | LoRA推奨 |\n")
+            f.write("| :--- | :--- | :---: | :---: | :---: |\n")
         for res in sorted(results, key=lambda x: x['score'], reverse=True):
             lora = "✅" if res['lora_recommended'] else "-"
             # inspector_results から物理特性を取得
-            rms = res.get("inspector_data", {}).get("rms", 0.0)
-            f.write(f"| {res['file']} | {res['model']} | {res['score']} | {rms:.4f} | {lora} |\n")
+            rms = res.get("inspector_data", {}).get("quality", {}).get("rms", 0.0)
+            if with_ai:
+                ai = res.get("ai_scores", {})
+                mos, similarity = ai.get("mos_predicted"), ai.get("speaker_similarity")
+                f.write(f"| {res['file']} | {res['model']} | {res['score']} | {rms:.4f} | "
+                        f"{'-' if mos is None else mos} | {'-' if similarity is None else similarity} | {lora} |\n")
+            else:
+                f.write(f"| {res['file']} | {res['model']} | {res['score']} | {rms:.4f} | {lora} |\n")
+        if timing_summary:
+            f.write("\n## 処理時間の内訳 (今回評価したファイル)\n")
+            f.write("\n".join(timing_table(timing_summary)) + "\n")
 
     print(f"\n2種類のレポートを保存しました:\n1. {summary_report_path}\n2. {detailed_report_path}")
     return summary_report_path, detailed_report_path
 
+def _evaluate_incremental(wav_files, target_dir, workers, cache_path, profile=False, linguist=None, scorer=None,
+                          prefetch=DEFAULT_PREFETCH):
+    """差分評価: マニフェストと比べて新規・変更されたファイルだけを評価し、結果をマージする"""
+    version = evaluator_version(linguist, scorer)
+    old_manifest = load_manifest(target_dir)
+    manifest = {}
+    pending = []
+    for wav_path in wav_files:
+        name = os.path.basename(wav_path)
+        stat = os.stat(wav_path)
+        entry = old_manifest.get(name)
+        if _is_current(entry, stat, version, wav_path):
+            manifest[name] = entry
+        else:
+            pending.append(wav_path)
+    print(f"差分評価: 新規/変更 {len(pending)} 件, 再利用 {len(manifest)} 件")
+
+    evaluated = evaluate_files(pending, workers, cache_path, profile, linguist, scorer, prefetch) if pending else []
+    fresh = [res for res in evaluated if res is not None]
+    for wav_path, res in zip(pending, evaluated):
+        if res is None:
+            continue
+        stat = os.stat(wav_path)
+        manifest[res["file"]] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": file_hash(wav_path),
+            "version": version,
+            "result": res,
+        }
+    # 削除されたファイルはマニフェストからも除く
+    save_manifest(target_dir, manifest)
+
+    results = [manifest[os.path.basename(p)]["result"] for p in wav_files if os.path.basename(p) in manifest]
+    return results, fresh
+
+def run_batch_evaluation(target_dir="tts_outputs", workers=1, cache_path=DEFAULT_CACHE_PATH, incremental=False,
+                         store_path=DEFAULT_STORE_PATH, profile=False, adaptive=None, linguist=None,
+                         scorer=None, prefetch=DEFAULT_PREFETCH):
+    """adaptive に adaptive_evaluation() の引数 (dict) を渡すと逐次評価モードになる"""
+    print(f"\n--- 一括評価・統計開始: {target_dir} ---")
+    
+    # 並列実行時もレポートが同一になるよう、処理順を固定する
+    wav_files = sorted(glob.glob(os.path.join(target_dir, "*.wav")))
+    if not wav_files:
+        print("評価対象のWAVファイルが見つかりません。")
+        return
+
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    run_start = time.perf_counter()
+    adaptive_summary = None
+    if adaptive is not None:
+        results, adaptive_summary = adaptive_evaluation(wav_files, workers, cache_path, profile,
+                                                        linguist=linguist, scorer=scorer, prefetch=prefetch,
+                                                        **adaptive)
+        fresh = results
+    elif incremental:
+        results, fresh = _evaluate_incremental(wav_files, target_dir, workers, cache_path, profile, linguist,
+                                               scorer, prefetch)
+    else:
+        results = [res for res in evaluate_files(wav_files, workers, cache_path, profile, linguist, scorer, prefetch)
+                   if res is not None]
+        fresh = results
+
+    timing_summary = None
+    if profile:
+        timing_summary = summarize_timings([res["timings"] for res in fresh if "timings" in res])
+        print(f"\n処理時間の内訳 ({len(fresh)} ファイル, 全体 {time.perf_counter() - run_start:.2f}s, "
+              f"ワーカー数 {workers}):")
+        print("\n".join(timing_table(timing_summary)))
+
+    if store_path:
+        # 実行ごとのスナップショットとして結果ストアに追記する
+        count = ResultStore(store_path).add(results, run_id=timestamp)
+        print(f"結果ストアに {count} 件を保存しました: {store_path}")
+    return write_reports(results, target_dir, timestamp, timing_summary, adaptive_summary)
+
+
+def _change_waiter(target_dir, force_poll=False, poll_interval=1.0):
+    """ディレクトリの変更を待つ関数を返す (inotify が使えなければポーリング)"""
+    if not force_poll:
+        try:
+            from inotify_simple import INotify, flags
+            inotify = INotify()
+            inotify.add_watch(target_dir, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+                              | flags.DELETE | flags.MOVED_FROM | flags.MODIFY)
+            print("変更検知: inotify")
+            # 書き込み中の連続イベントはまとめて1回として扱う
+            return lambda timeout: inotify.read(timeout=int(timeout * 1000), read_delay=200)
+        except (ImportError, OSError) as e:
+            print(f"inotify が使えないためポーリングします ({e})")
+    else:
+        print("変更検知: ポーリング")
+    return lambda timeout: time.sleep(min(timeout, poll_interval))
+
+def watch_directory(target_dir="tts_outputs", workers=1, cache_path=DEFAULT_CACHE_PATH,
+                    store_path=DEFAULT_STORE_PATH, settle_seconds=2.0, force_poll=False, linguist=None,
+                    scorer=None, prefetch=DEFAULT_PREFETCH):
+    """新しいWAVが書き終わり次第評価し、レポートを更新し続ける (Ctrl+C で終了)"""
+    print(f"\n--- 監視モード開始: {target_dir} ---")
+    os.makedirs(target_dir, exist_ok=True)
+    # セッション中は同じレポートファイルを上書きし続ける
+    session = datetime.now().strftime("%Y%m%d-%H%M%S")
+    wait_for_change = _change_waiter(target_dir, force_poll)
+    store = ResultStore(store_path) if store_path else None
+    evaluated_state = None
+
+    try:
+        while True:
+            # 最終更新から settle_seconds 経過したファイルを書き込み完了とみなす
+            now = time.time()
+            settled = {}
+            for wav_path in sorted(glob.glob(os.path.join(target_dir, "*.wav"))):
+                try:
+                    stat = os.stat(wav_path)
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime >= settle_seconds:
+                    settled[wav_path] = (stat.st_size, stat.st_mtime)
+
+            if settled != evaluated_state:
+                results, fresh = _evaluate_incremental(list(settled), target_dir, workers, cache_path,
+                                                       linguist=linguist, scorer=scorer, prefetch=prefetch)
+                if store and fresh:
+                    store.add(fresh, run_id=session, source="eval-batch-stats --watch")
+                if results:
+                    write_reports(results, target_dir, session)
+                evaluated_state = settled
+
+            wait_for_change(settle_seconds)
+    except KeyboardInterrupt:
+        print("\n監視を終了しました。")
+
+
 if __name__ == "__main__":
-    target = sys.argv[1] if len(sys.argv) > 1 else "tts_outputs"
-    run_batch_evaluation(target)
+    parser = argparse.ArgumentParser(description="tts_outputs 内のWAVを一括評価し統計レポートを作成する")
+    parser.add_argument("target_dir", nargs="?", default="tts_outputs", help="評価対象ディレクトリ")
+    parser.add_argument("--workers", type=int, default=1, help="並列評価のプロセス数 (1 = 逐次実行)")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Inspector結果キャッシュ (SQLite)")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わずに全ファイルを再解析する")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"{MANIFEST_NAME} を使い、新規・変更されたWAVだけを評価する")
+    parser.add_argument("--store-path", default=DEFAULT_STORE_PATH, help="評価結果ストア (SQLite)")
+    parser.add_argument("--no-store", action="store_true", help="結果ストアに保存しない")
+    parser.add_argument("--profile", action="store_true",
+                        help="段階ごと (decode/frontend/f0 等) の処理時間を計測し、レポート2に内訳を追記する")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="モデルごとにランダム順で評価し、平均スコアの信頼区間が ADR-010 の1つの判定帯に収まったら打ち切る")
+    parser.add_argument("--min-samples", type=int, default=10, help="逐次評価で区間を計算し始める最小評価数")
+    parser.add_argument("--step", type=int, default=5, help="逐次評価で1回に追加評価するモデルあたりのファイル数")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="逐次評価の信頼水準 (途中で区間を見る全回を通した値)")
+    parser.add_argument("--seed", type=int, default=0, help="逐次評価のサンプリング順の乱数シード")
+    parser.add_argument("--linguist", action="store_true",
+                        help="faster-whisper で文字起こしし、text.json との CER を発音スコアに反映する")
+    parser.add_argument("--asr-model", default="small", help="Linguist の faster-whisper モデル")
+    parser.add_argument("--asr-batch-size", type=int, default=8, help="Linguist で1回にまとめて推論するクリップ数")
+    parser.add_argument("--text-json", default=None, help="参照テキスト (既定: SOURCE/text.json, src/text.json)")
+    parser.add_argument("--ai-scores", action="store_true",
+                        help="同じデコード結果から MOS 予測・話者類似度も求める (score-common-audio.py と同じ採点)")
+    parser.add_argument("--ref-dir", default="SOURCE", help="話者類似度の参照音声ディレクトリ")
+    parser.add_argument("--encoder", choices=["resemblyzer", "ecapa"], default="resemblyzer", help="話者埋め込みモデル")
+    parser.add_argument("--mos-runtime", choices=["onnx", "torchscript"], default="onnx", help="MOS 予測の推論ランタイム")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH["depth"],
+                        help="逐次実行時に読み込みスレッドで先読みするファイル数 (0 = 先読みしない)")
+    parser.add_argument("--prefetch-mb", type=int, default=DEFAULT_PREFETCH["max_bytes"] // (1024 * 1024),
+                        help="先読み済みの波形を保持するメモリの上限 (MB)")
+    parser.add_argument("--watch", action="store_true",
+                        help="ディレクトリを監視し、新しいWAVが書き終わり次第評価してレポートを更新し続ける")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="監視モードで書き込み完了とみなすまでの無更新秒数")
+    parser.add_argument("--poll", action="store_true",
+                        help="inotify を使わずポーリングで監視する (Docker Desktop のバインドマウント等)")
+    args = parser.parse_args()
+    if args.adaptive and (args.watch or args.incremental):
+        parser.error("--adaptive は --watch / --incremental と同時に使えません")
+    linguist = None
+    if args.linguist:
+        linguist = build_linguist(args.asr_model, None if args.no_cache else args.cache_path,
+                                  args.asr_batch_size, args.text_json)
+    scorer = None
+    if args.ai_scores:
+        scorer = build_audio_scorer(args.encoder, args.ref_dir, mos_runtime=args.mos_runtime)
+    prefetch = None
+    if args.prefetch > 0:
+        prefetch = dict(DEFAULT_PREFETCH, depth=args.prefetch, max_bytes=args.prefetch_mb * 1024 * 1024)
+    if args.watch:
+        watch_directory(args.target_dir, workers=args.workers,
+                        cache_path=None if args.no_cache else args.cache_path,
+                        store_path=None if args.no_store else args.store_path,
+                        settle_seconds=args.settle, force_poll=args.poll, linguist=linguist, scorer=scorer,
+                        prefetch=prefetch)
+        sys.exit(0)
+    run_batch_evaluation(args.target_dir, workers=args.workers,
+                         cache_path=None if args.no_cache else args.cache_path,
+                         incremental=args.incremental,
+                         store_path=None if args.no_store else args.store_path,
+                         profile=args.profile,
+                         adaptive=dict(min_samples=args.min_samples, step=args.step,
+                                       confidence=args.confidence, seed=args.seed) if args.adaptive else None,
+                         linguist=linguist, scorer=scorer, prefetch=prefetch)
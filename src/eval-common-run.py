@@ -2,6 +2,8 @@ import sys
 import os
 import json
 import argparse
+import urllib.error
+import urllib.request
 from pathlib import Path
 
 # Add the current directory to sys.path to ensure imports work
@@ -9,49 +11,131 @@ current_dir = Path(__file__).parent.absolute()
 if str(current_dir) not in sys.path:
     sys.path.append(str(current_dir))
 
-# Add project root to path for importing from src.tools
-project_root = current_dir.parent.parent
-if str(project_root) not in sys.path:
-    sys.path.append(str(project_root))
-
 try:
-    from src.tools.inspector import Inspector
-    from src.tools.diagnostician import Diagnostician
+    # Lightweight (stdlib only); the analysis modules are imported lazily by evaluate_locally()
+    from tools.cache import DEFAULT_CACHE_PATH
+    from tools.store import ResultStore, DEFAULT_STORE_PATH
 except ImportError as e:
     print(f"Import Error: {e}")
     # Fallback or detailed error message
     print("Please ensure you are running this script with the correct PYTHONPATH or from the project root.")
     sys.exit(1)
 
-def evaluate_audio(audio_path):
-    print(f"Evaluating audio: {audio_path}")
-    
-    if not os.path.exists(audio_path):
-        print(f"Error: File not found: {audio_path}")
-        return
+# Warm evaluation server started with src/serve-common-eval.py
+DEFAULT_SERVER_URL = os.environ.get("SNSW_EVAL_SERVER", "http://127.0.0.1:8765")
+
+class ServerMismatch(Exception):
+    """The server is running but cannot honour this request's Linguist/cache settings."""
+
+def request_evaluation(audio_path, server_url=DEFAULT_SERVER_URL, timeout=600, cache_path=DEFAULT_CACHE_PATH,
+                       linguist_options=None):
+    """Submit a file to the evaluation server. Raises ConnectionError if no server is running and
+    ServerMismatch if the server was started with different Linguist/cache settings."""
+    payload = {
+        "audio_path": os.path.abspath(audio_path),
+        "cache_path": os.path.abspath(cache_path) if cache_path else None,
+        "linguist": linguist_options is not None,
+    }
+    if linguist_options is not None:
+        payload["asr_model"] = linguist_options.get("model_size")
+    body = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(f"{server_url}/evaluate", data=body,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        # Proxies and crashed servers may answer with a non-JSON body
+        text = e.read().decode("utf-8", errors="replace")
+        try:
+            message = json.loads(text)["error"]
+        except (ValueError, KeyError, TypeError):
+            message = text.strip() or e.reason
+        if e.code == 409:
+            raise ServerMismatch(message) from e
+        raise RuntimeError(f"HTTP {e.code}: {message}") from e
+    except urllib.error.URLError as e:
+        raise ConnectionError(e.reason) from e
+
+def evaluate_locally(audio_path, cache_path=DEFAULT_CACHE_PATH, linguist=None):
+    """Run Inspector, Linguist and Diagnostician in this process."""
+    from tools.inspector import Inspector
+    from tools.diagnostician import Diagnostician
+    from tools.cache import ResultCache, CachedInspector
 
     # 1. Inspection
     print("Running Inspector...")
     try:
         inspector = Inspector()
+        if cache_path:
+            inspector = CachedInspector(inspector, ResultCache(cache_path))
         inspector_results = inspector.analyze(audio_path)
         print("Inspection complete.")
     except Exception as e:
-        print(f"Error during inspection: {e}")
-        return
+        raise RuntimeError(f"Error during inspection: {e}") from e
 
-    # 2. Diagnosis
+    # 2. Linguistic analysis (optional; without it the pronunciation bucket assumes CER 0)
+    linguist_results = None
+    if linguist:
+        print("Running Linguist...")
+        try:
+            linguist_results = linguist.analyze(audio_path)
+            if linguist_results is None:
+                print("No reference text in text.json for this file; skipping pronunciation check.")
+        except Exception as e:
+            print(f"Error during linguistic analysis: {e}")
+
+    # 3. Diagnosis
     print("Running Diagnostician...")
     try:
         diagnostician = Diagnostician()
-        # linguist_data is optional and currently not implemented in this flow
-        report = diagnostician.diagnose(inspector_results)
+        report = diagnostician.diagnose(inspector_results, linguist_results)
         print("Diagnosis complete.")
     except Exception as e:
-        print(f"Error during diagnosis: {e}")
+        raise RuntimeError(f"Error during diagnosis: {e}") from e
+
+    return {"inspection": inspector_results, "linguistics": linguist_results, "diagnosis": report}
+
+def evaluate_audio(audio_path, cache_path=DEFAULT_CACHE_PATH, store_path=DEFAULT_STORE_PATH, linguist_options=None,
+                   server_url=DEFAULT_SERVER_URL):
+    """Evaluate one file, preferring the warm server; linguist_options (build_linguist kwargs) enables
+    the Linguist. Falls back to local evaluation if the server's Linguist/cache settings differ."""
+    print(f"Evaluating audio: {audio_path}")
+    
+    if not os.path.exists(audio_path):
+        print(f"Error: File not found: {audio_path}")
         return
 
-    # 3. Output
+    result = None
+    if server_url:
+        try:
+            result = request_evaluation(audio_path, server_url, cache_path=cache_path,
+                                        linguist_options=linguist_options)
+            print(f"Evaluated by server: {server_url} ({result['timings']['server_seconds']:.2f}s)")
+        except ConnectionError:
+            print(f"No evaluation server at {server_url}; evaluating locally.")
+        except ServerMismatch as e:
+            print(f"Warning: evaluation server at {server_url} cannot honour these options ({e}); "
+                  f"evaluating locally.")
+        except RuntimeError as e:
+            print(f"Error from evaluation server: {e}")
+            return
+    if result is None:
+        linguist = None
+        if linguist_options is not None:
+            from tools.linguist import build_linguist
+            linguist = build_linguist(**linguist_options)
+        try:
+            result = evaluate_locally(audio_path, cache_path, linguist)
+        except RuntimeError as e:
+            print(e)
+            return
+
+    inspector_results = result["inspection"]
+    linguist_results = result["linguistics"]
+    report = result["diagnosis"]
+
+    # 4. Output
     print("\n" + "="*50)
     print("EVALUATION REPORT")
     print("="*50)
@@ -61,6 +145,14 @@ def evaluate_audio(audio_path):
     for category, score in report['buckets'].items():
         print(f"  - {category.capitalize()}: {score}")
 
+    if linguist_results:
+        print("\n[Transcription]")
+        print(f"  Expected:   {linguist_results['reference']}")
+        print(f"  Recognized: {linguist_results['hypothesis']}")
+        for span in linguist_results["mismatches"]:
+            print(f"  x [{span['ref_start']}:{span['ref_end']}] "
+                  f"'{span['expected']}' -> '{span['recognized']}'")
+
     print("\n[Highlights]")
     if report['highlights']:
         for highlight in report['highlights']:
@@ -86,16 +178,46 @@ def evaluate_audio(audio_path):
     with open(output_json_path, 'w', encoding='utf-8') as f:
         json.dump({
             "inspection": inspector_results,
+            "linguistics": linguist_results,
             "diagnosis": report
         }, f, indent=2, ensure_ascii=False)
     print(f"\nDetailed report saved to: {output_json_path}")
 
+    if store_path:
+        ResultStore(store_path).add([{
+            "file": os.path.basename(audio_path),
+            "model": os.path.basename(audio_path).split('-')[0],
+            "score": report['overall_score'],
+            "buckets": report['buckets'],
+            "lora_recommended": report.get('lora_recommended', False),
+            "inspector_data": inspector_results,
+            "linguist_data": linguist_results
+        }], source="eval-common-run")
+        print(f"Result stored in: {store_path}")
+
 def main():
     parser = argparse.ArgumentParser(description="Evaluate audio quality and prosody using SNSW tools.")
     parser.add_argument("audio_path", help="Path to the audio file (.wav, .mp3) to evaluate")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Inspector result cache (SQLite)")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-run the Inspector")
+    parser.add_argument("--store-path", default=DEFAULT_STORE_PATH, help="Evaluation results store (SQLite)")
+    parser.add_argument("--no-store", action="store_true", help="Do not record the result in the store")
+    parser.add_argument("--linguist", action="store_true",
+                        help="Transcribe with faster-whisper and score pronunciation by CER against text.json")
+    parser.add_argument("--asr-model", default="small", help="faster-whisper model for the Linguist")
+    parser.add_argument("--text-json", default=None, help="Reference texts (default: SOURCE/text.json, src/text.json)")
+    parser.add_argument("--server", default=DEFAULT_SERVER_URL,
+                        help="Warm evaluation server (src/serve-common-eval.py); falls back to local evaluation")
+    parser.add_argument("--local", action="store_true", help="Always evaluate in this process")
     args = parser.parse_args()
 
-    evaluate_audio(args.audio_path)
+    cache_path = None if args.no_cache else args.cache_path
+    linguist_options = None
+    if args.linguist:
+        linguist_options = {"model_size": args.asr_model, "cache_path": cache_path, "text_json_path": args.text_json}
+    evaluate_audio(args.audio_path, cache_path=cache_path,
+                   store_path=None if args.no_store else args.store_path, linguist_options=linguist_options,
+                   server_url=None if args.local else args.server)
 
 if __name__ == "__main__":
     main()
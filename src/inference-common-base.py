@@ -7,6 +7,12 @@ from pathlib import Path
 from TTS.tts.configs.xtts_config import XttsConfig
 from TTS.tts.models.xtts import Xtts
 
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.voice import VoiceProfileCache, DEFAULT_VOICE_DIR, reference_paths
+
 def load_model(checkpoint_dir):
     """
     XTTSモデルをロードする
@@ -39,16 +45,20 @@ def load_model(checkpoint_dir):
     print("Model loaded successfully!")
     return model
 
-def run_inference(model, text, speaker_wav, language="ja", output_path="output.wav"):
+def run_inference(model, text, speaker_wav, language="ja", output_path="output.wav", voice=None):
     """
     音声合成を実行する
+    voice: VoiceProfileCache.latents() で得た (gpt_cond_latent, speaker_embedding)。
+           None なら speaker_wav から計算する
     """
     print(f"Generating audio for text: '{text[:20]}...'")
     print(f"Speaker reference: {speaker_wav}")
     
-    gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(
-        audio_path=[speaker_wav]
-    )
+    if voice is None:
+        voice = model.get_conditioning_latents(
+            audio_path=[speaker_wav]
+        )
+    gpt_cond_latent, speaker_embedding = voice
     
     out = model.inference(
         text,
@@ -65,19 +75,37 @@ def run_inference(model, text, speaker_wav, language="ja", output_path="output.w
 def main():
     parser = argparse.ArgumentParser(description="XTTS Inference Script")
     parser.add_argument("--text", type=str, required=True, help="Text to synthesize")
-    parser.add_argument("--speaker_wav", type=str, required=True, help="Path to reference speaker wav file")
+    parser.add_argument("--speaker_wav", type=str, nargs="+", required=True,
+                        help="Reference speaker wav file(s), directories or globs (merged into one voice profile)")
     parser.add_argument("--language", type=str, default="ja", help="Language code (ja, en, etc.)")
     parser.add_argument("--model_dir", type=str, required=True, help="Directory containing model checkpoints")
     parser.add_argument("--output_dir", type=str, default="output", help="Output directory")
     parser.add_argument("--output_filename", type=str, default="generated.wav", help="Output filename")
+    parser.add_argument("--voice_cache_dir", type=str, default=DEFAULT_VOICE_DIR,
+                        help="Where conditioning latents are cached per (references, checkpoint)")
+    parser.add_argument("--no_voice_cache", action="store_true", help="Recompute conditioning latents every run")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write audio chunks as the GPT stage emits tokens and report TTFA / RTF")
     
     args = parser.parse_args()
     
     os.makedirs(args.output_dir, exist_ok=True)
     output_path = os.path.join(args.output_dir, args.output_filename)
     
+    # ディレクトリ・glob は話者キャッシュを使うかどうかによらず同じように展開する
+    speaker_wavs = reference_paths(args.speaker_wav)
     model = load_model(args.model_dir)
-    run_inference(model, args.text, args.speaker_wav, args.language, output_path)
+    if args.no_voice_cache:
+        voice = model.get_conditioning_latents(audio_path=speaker_wavs)
+    else:
+        voice = VoiceProfileCache(args.voice_cache_dir).latents(model, speaker_wavs, args.model_dir)
+    if args.stream:
+        from tools.stream import StreamingSynthesis, stream_to_wav
+        stream = StreamingSynthesis(model, args.text, *voice, language=args.language)
+        stream_to_wav(stream, output_path)
+        print(f"Saved to {output_path}: {stream.report()}")
+        return
+    run_inference(model, args.text, ", ".join(speaker_wavs), args.language, output_path, voice=voice)
 
 if __name__ == "__main__":
     main()
@@ -1,32 +1,316 @@
+import hashlib
+import itertools
+import contextlib
 import numpy as np
 import librosa
+import scipy.stats
+import soundfile as sf
+import soxr
 import json
+import os
 import sys
+import time
+import argparse
+
+FMIN = librosa.note_to_hz('C2')
+FMAX = librosa.note_to_hz('C7')
+
+
+def _acf(frames, max_period):
+    n_fft = 2 * frames.shape[0]
+    spec = np.fft.rfft(frames, n=n_fft, axis=0)
+    return np.fft.irfft(np.abs(spec) ** 2, n=n_fft, axis=0)[:max_period + 1]
+
+
+def _cmnd(frames, min_period, max_period):
+    """YIN cumulative mean normalized difference over already-framed audio."""
+    acf = _acf(frames, max_period)
+    energy = np.cumsum(frames ** 2, axis=0)
+    diff = np.zeros((max_period + 1, frames.shape[1]))
+    diff[1:] = 2 * (acf[:1] - acf[1:]) - energy[:max_period]
+
+    cumulative_mean = np.cumsum(diff[1:], axis=0) / np.arange(1, max_period + 1)[:, None]
+    denominator = cumulative_mean[min_period - 1:max_period]
+    return diff[min_period:] / (denominator + np.finfo(diff.dtype).tiny)
+
+
+def _parabolic_shifts(x):
+    shifts = np.zeros_like(x)
+    a = x[2:] + x[:-2] - 2 * x[1:-1]
+    b = (x[2:] - x[:-2]) / 2
+    valid = np.abs(b) < np.abs(a)
+    shifts[1:-1][valid] = -b[valid] / a[valid]
+    return shifts
+
+
+def _pyin_decode(cmnd, sr, hop_length, min_period, fmin=FMIN, fmax=FMAX):
+    """pYIN trough probabilities + Viterbi decoding (librosa.pyin defaults)."""
+    shifts = _parabolic_shifts(cmnd)
+    thresholds = np.linspace(0, 1, 101)
+    beta_probs = np.diff(scipy.stats.beta.cdf(thresholds, 2, 18))
+    n_bins_per_semitone = 10
+    n_pitch_bins = int(np.floor(12 * n_bins_per_semitone * np.log2(fmax / fmin))) + 1
+
+    is_trough = librosa.util.localmin(cmnd, axis=0)
+    is_trough[0] = cmnd[0] < cmnd[1]
+    yin_probs = np.zeros_like(cmnd)
+    for i in range(cmnd.shape[1]):
+        (trough_index,) = np.nonzero(is_trough[:, i])
+        if len(trough_index) == 0:
+            continue
+        trough_heights = cmnd[trough_index, i]
+        trough_thresholds = np.less.outer(trough_heights, thresholds[1:])
+        trough_positions = np.cumsum(trough_thresholds, axis=0) - 1
+        n_troughs = np.count_nonzero(trough_thresholds, axis=0)
+        trough_prior = scipy.stats.boltzmann.pmf(trough_positions, 2, n_troughs)
+        trough_prior[~trough_thresholds] = 0
+        probs = trough_prior.dot(beta_probs)
+        global_min = np.argmin(trough_heights)
+        n_below_min = np.count_nonzero(~trough_thresholds[global_min, :])
+        probs[global_min] += 0.01 * np.sum(beta_probs[:n_below_min])
+        yin_probs[trough_index, i] = probs
+
+    yin_period, frame_index = np.nonzero(yin_probs)
+    periods = min_period + yin_period + shifts[yin_period, frame_index]
+    bin_index = 12 * n_bins_per_semitone * np.log2(sr / periods / fmin)
+    bin_index = np.clip(np.round(bin_index), 0, n_pitch_bins).astype(int)
+
+    observation_probs = np.zeros((2 * n_pitch_bins, cmnd.shape[1]))
+    observation_probs[bin_index, frame_index] = yin_probs[yin_period, frame_index]
+    voiced_prob = np.clip(np.sum(observation_probs[:n_pitch_bins], axis=0), 0, 1)
+    observation_probs[n_pitch_bins:] = (1 - voiced_prob) / n_pitch_bins
+
+    max_semitones_per_frame = round(35.92 * 12 * hop_length / sr)
+    transition = librosa.sequence.transition_local(
+        n_pitch_bins, max_semitones_per_frame * n_bins_per_semitone + 1,
+        window="triangle", wrap=False)
+    transition = np.kron(librosa.sequence.transition_loop(2, 0.99), transition)
+    p_init = np.ones(2 * n_pitch_bins) / (2 * n_pitch_bins)
+    states = librosa.sequence.viterbi(observation_probs, transition, p_init=p_init)
+
+    freqs = fmin * 2 ** (np.arange(n_pitch_bins) / (12 * n_bins_per_semitone))
+    f0 = freqs[states % n_pitch_bins]
+    f0[states >= n_pitch_bins] = np.nan
+    return f0
+
+
+def _yin_track(frames, sr, hop_length, min_period, max_period, threshold=0.2):
+    """Vectorized YIN: first trough under the threshold in every frame at once.
+
+    Frames without such a trough are treated as unvoiced (NaN), matching the
+    voicing semantics of pyin so f0_stats stay comparable.
+    """
+    cmnd = _cmnd(frames, min_period, max_period)
+    is_trough = librosa.util.localmin(cmnd, axis=0)
+    is_trough[0] = cmnd[0] < cmnd[1]
+    candidates = is_trough & (cmnd < threshold)
+
+    lag = np.argmax(candidates, axis=0)
+    columns = np.arange(cmnd.shape[1])
+    periods = min_period + lag + _parabolic_shifts(cmnd)[lag, columns]
+    f0 = sr / periods
+    f0[~candidates.any(axis=0)] = np.nan
+    return f0
+
+
+def _autocorr_track(frames, sr, hop_length, min_period, max_period, threshold=0.3):
+    """Vectorized normalized-autocorrelation (r(tau) / r(0)) tracker.
+
+    Picks the shortest lag whose correlation peak is within 90% of the frame
+    maximum (suppresses octave-down errors); frames whose peak stays below
+    the threshold are unvoiced (NaN).
+    """
+    acf = _acf(frames, max_period)
+    nacf = acf[min_period:] / (acf[:1] + np.finfo(acf.dtype).tiny)
+
+    peak = np.max(nacf, axis=0)
+    is_peak = librosa.util.localmax(nacf, axis=0) & (nacf >= 0.9 * peak)
+    lag = np.argmax(is_peak, axis=0)
+    columns = np.arange(nacf.shape[1])
+    periods = min_period + lag + _parabolic_shifts(-nacf)[lag, columns]
+    f0 = sr / periods
+    f0[(peak < threshold) | ~is_peak.any(axis=0)] = np.nan
+    return f0
+
+
+def _pyin_track(frames, sr, hop_length, min_period, max_period):
+    return _pyin_decode(_cmnd(frames, min_period, max_period), sr, hop_length, min_period)
+
+
+F0_TRACKERS = {
+    "pyin": _pyin_track,
+    "yin": _yin_track,
+    "autocorr": _autocorr_track,
+}
+
+
+class StageTimer:
+    """Wall-clock / CPU seconds per named stage (one timer per file).
+
+    CPU time is per calling thread, so prefetch reader threads decoding other files in the
+    background are not charged to the stage that happens to be running.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            prev_wall, prev_cpu = self.stages.get(name, (0.0, 0.0))
+            self.stages[name] = (prev_wall + time.perf_counter() - wall,
+                                 prev_cpu + time.thread_time() - cpu)
+
+    def as_dict(self):
+        return {name: [round(wall, 6), round(cpu, 6)] for name, (wall, cpu) in self.stages.items()}
+
+
+class _NullTimer:
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+
+NULL_TIMER = _NullTimer()
+
+
+def summarize_timings(timings):
+    """Per-stage p50/p95/total over StageTimer.as_dict() records of many files."""
+    per_stage = {}
+    for record in timings:
+        for name, (wall, cpu) in record.items():
+            per_stage.setdefault(name, []).append((wall, cpu))
+    summary = {}
+    for name, values in per_stage.items():
+        walls = np.array([wall for wall, _ in values])
+        summary[name] = {
+            "files": len(values),
+            "p50_wall": float(np.percentile(walls, 50)),
+            "p95_wall": float(np.percentile(walls, 95)),
+            "total_wall": float(np.sum(walls)),
+            "total_cpu": float(sum(cpu for _, cpu in values)),
+        }
+    return summary
+
+
+class _LogHistogram:
+    """Streaming quantile sketch: fixed log-spaced bins, ~1% relative error."""
+
+    def __init__(self, lo=1e-10, hi=1e4, bins_per_decade=200):
+        n_edges = int(round(np.log10(hi / lo) * bins_per_decade)) + 1
+        self.edges = np.logspace(np.log10(lo), np.log10(hi), n_edges)
+        # counts[0]: below lo (incl. exact zeros), counts[-1]: above hi
+        self.counts = np.zeros(n_edges + 1, dtype=np.int64)
+
+    def update(self, values):
+        index = np.searchsorted(self.edges, np.ravel(values), side="right")
+        self.counts += np.bincount(index, minlength=len(self.counts))
+
+    def quantile(self, q):
+        cumulative = np.cumsum(self.counts)
+        # Same rank convention as np.percentile (linear interpolation)
+        rank = q * (cumulative[-1] - 1)
+        b = int(np.searchsorted(cumulative, rank, side="right"))
+        if b == 0:
+            return 0.0
+        if b >= len(self.edges):
+            return float(self.edges[-1])
+        lower, upper = self.edges[b - 1], self.edges[b]
+        fraction = (rank - cumulative[b - 1]) / self.counts[b]
+        return float(lower * (upper / lower) ** fraction)
+
 
 class Inspector:
-    def __init__(self, sample_rate=24000):
+    def __init__(self, sample_rate=24000, frame_length=2048, hop_length=512, f0_method="pyin"):
+        if f0_method not in F0_TRACKERS:
+            raise ValueError(f"Unknown f0_method: {f0_method} (choose from {', '.join(F0_TRACKERS)})")
         self.sr = sample_rate
+        self.f0_method = f0_method
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+
+    def cache_params(self):
+        """Parameters that change analyze() output (result cache key)."""
+        with open(__file__, "rb") as f:
+            version = hashlib.sha1(f.read()).hexdigest()[:12]
+        return {
+            "analyzer": "inspector",
+            "version": version,
+            "sample_rate": self.sr,
+            "frame_length": self.frame_length,
+            "hop_length": self.hop_length,
+            "f0_method": self.f0_method,
+        }
+
+    def _frontend(self, y):
+        # Frame once (centered, zero padded like librosa.stft/pyin/split) and
+        # derive the magnitude spectrogram and RMS envelope from the same frames.
+        pad = self.frame_length // 2
+        frames = librosa.util.frame(np.pad(y, pad), frame_length=self.frame_length,
+                                    hop_length=self.hop_length)
+        return (frames,) + self._frame_features(frames)
+
+    def _frame_features(self, frames):
+        window = librosa.filters.get_window("hann", self.frame_length, fftbins=True)
+        magnitude = np.abs(np.fft.rfft(frames * window[:, None], axis=0))
+        rms = np.sqrt(np.mean(frames ** 2, axis=0))
+        return magnitude, rms
+
+    def _f0_periods(self, sr):
+        min_period = int(np.floor(sr / FMAX))
+        max_period = min(int(np.ceil(sr / FMIN)), self.frame_length - 1)
+        return min_period, max_period
+
+    def _silence_durations(self, rms, n_samples, top_db=30):
+        # Same frame decisions as librosa.effects.split(y, top_db=30)
+        non_silent = librosa.amplitude_to_db(rms, ref=np.max, top_db=None) > -top_db
+        edges = np.flatnonzero(np.diff(non_silent.astype(int))) + 1
+        if non_silent[0]:
+            edges = np.r_[0, edges]
+        if non_silent[-1]:
+            edges = np.r_[edges, len(non_silent)]
+        edges = np.minimum(edges * self.hop_length, n_samples).reshape(-1, 2)
+
+        silence_durations = []
+        last_end = 0
+        for start, end in edges:
+            if start > last_end:
+                silence_durations.append(float((start - last_end) / self.sr))
+            last_end = end
+        return silence_durations
+
+    def analyze(self, audio_path, timer=None, audio=None):
+        """audio: an already decoded DecodedAudio for audio_path (skips reading the file again)."""
+        timer = timer or NULL_TIMER
+        with timer.stage("decode"):
+            if audio is not None:
+                y, sr = audio.at(self.sr), self.sr
+            else:
+                y, sr = librosa.load(audio_path, sr=self.sr)
+        with timer.stage("frontend"):
+            frames, magnitude, rms = self._frontend(y)
 
-    def analyze(self, audio_path):
-        y, sr = librosa.load(audio_path, sr=self.sr)
-        
         # 1. Quality Metrics
-        # Clipping detection
-        clipping_rate = np.sum(np.abs(y) >= 0.99) / len(y)
-        
-        # SNR estimation (simplified)
-        stft = np.abs(librosa.stft(y))
-        noise_floor = np.percentile(stft, 10)
-        signal_power = np.mean(stft**2)
-        snr = 10 * np.log10(signal_power / (noise_floor**2 + 1e-10))
-        
-        # Spectral Flatness (higher means more noise-like)
-        flatness = np.mean(librosa.feature.spectral_flatness(y=y))
+        with timer.stage("quality"):
+            # Clipping detection
+            clipping_rate = np.sum(np.abs(y) >= 0.99) / len(y)
+
+            # SNR estimation (simplified)
+            noise_floor = np.percentile(magnitude, 10)
+            signal_power = np.mean(magnitude**2)
+            snr = 10 * np.log10(signal_power / (noise_floor**2 + 1e-10))
+
+            # Spectral Flatness (higher means more noise-like)
+            flatness = np.mean(librosa.feature.spectral_flatness(S=magnitude))
 
         # 2. Prosody Metrics (F0)
-        f0, voiced_flag, voiced_probs = librosa.pyin(y, fmin=librosa.note_to_hz('C2'), fmax=librosa.note_to_hz('C7'))
+        with timer.stage("f0_" + self.f0_method):
+            min_period, max_period = self._f0_periods(sr)
+            f0 = F0_TRACKERS[self.f0_method](frames, sr, self.hop_length, min_period, max_period)
         f0_clean = f0[~np.isnan(f0)]
-        
+
         f0_stats = {
             "mean": float(np.mean(f0_clean)) if len(f0_clean) > 0 else 0,
             "std": float(np.std(f0_clean)) if len(f0_clean) > 0 else 0,
@@ -35,19 +319,15 @@ class Inspector:
         }
 
         # 3. Silence / Rhythm
-        intervals = librosa.effects.split(y, top_db=30)
-        silence_durations = []
-        last_end = 0
-        for start, end in intervals:
-            if start > last_end:
-                silence_durations.append((start - last_end) / sr)
-            last_end = end
-        
+        with timer.stage("silence"):
+            silence_durations = self._silence_durations(rms, len(y))
+
         return {
             "quality": {
                 "clipping_rate": float(clipping_rate),
                 "snr_est": float(snr),
-                "spectral_flatness": float(flatness)
+                "spectral_flatness": float(flatness),
+                "rms": float(np.sqrt(np.mean(y**2)))
             },
             "prosody": {
                 "f0": f0_stats,
@@ -56,11 +336,218 @@ class Inspector:
             }
         }
 
+    def _stream_frames(self, audio_path, block_frames):
+        """Yield (frames, samples) per block, framed exactly like _frontend on the whole file."""
+        hop, pad = self.hop_length, self.frame_length // 2
+        empty = np.zeros(0, dtype=np.float32)
+        with sf.SoundFile(audio_path) as f:
+            resampler = None
+            if f.samplerate != self.sr:
+                resampler = soxr.ResampleStream(f.samplerate, self.sr, 1, dtype="float32", quality="HQ")
+
+            # Only the frame overlap (frame_length - hop samples) is carried between blocks
+            buffer = np.zeros(pad, dtype=np.float32)
+            blocks = f.blocks(blocksize=hop * block_frames, dtype="float32", always_2d=True)
+            for block in itertools.chain(blocks, [None]):
+                if block is None:
+                    samples = resampler.resample_chunk(empty, last=True) if resampler else empty
+                    tail = np.zeros(pad, dtype=np.float32)
+                else:
+                    samples = block.mean(axis=1)
+                    samples = resampler.resample_chunk(samples) if resampler else samples
+                    tail = empty
+                buffer = np.concatenate([buffer, samples, tail])
+
+                n_frames = max(0, 1 + (len(buffer) - self.frame_length) // hop)
+                frames = librosa.util.frame(buffer[:(n_frames - 1) * hop + self.frame_length],
+                                            frame_length=self.frame_length, hop_length=hop) \
+                    if n_frames else np.zeros((self.frame_length, 0), dtype=np.float32)
+                buffer = buffer[n_frames * hop:]
+                yield frames, samples
+
+    def analyze_stream(self, audio_path, block_frames=1024, top_db=30):
+        """Bounded-memory variant of analyze() for hour-long recordings.
+
+        Same output schema. The file is read twice in blocks: the first pass
+        only finds the peak frame RMS that anchors the silence threshold.
+        The noise floor comes from a quantile sketch and the F0 tracker runs
+        per block (pyin decodes each block separately).
+        """
+        sr = self.sr
+        min_period, max_period = self._f0_periods(sr)
+        tracker = F0_TRACKERS[self.f0_method]
+
+        peak_rms = 0.0
+        for frames, _ in self._stream_frames(audio_path, block_frames):
+            if frames.shape[1]:
+                peak_rms = max(peak_rms, float(np.max(np.sqrt(np.mean(frames ** 2, axis=0)))))
+
+        n_samples = n_clipped = 0
+        sum_sq = 0.0
+        noise_sketch = _LogHistogram()
+        power_sum, n_bins = 0.0, 0
+        flatness_sum, n_frames = 0.0, 0
+        f0_count, f0_mean, f0_m2 = 0, 0.0, 0.0
+        f0_min, f0_max, jump_max, last_f0 = np.inf, -np.inf, 0.0, None
+        silence_durations, last_end, prev_non_silent = [], 0, False
+
+        for frames, samples in self._stream_frames(audio_path, block_frames):
+            n_samples += len(samples)
+            n_clipped += int(np.sum(np.abs(samples) >= 0.99))
+            sum_sq += float(np.sum(samples.astype(np.float64) ** 2))
+            if not frames.shape[1]:
+                continue
+            magnitude, rms = self._frame_features(frames)
+
+            # 1. Quality Metrics (running aggregates)
+            noise_sketch.update(magnitude)
+            power_sum += float(np.sum(magnitude ** 2))
+            n_bins += magnitude.size
+            flatness_sum += float(np.sum(librosa.feature.spectral_flatness(S=magnitude)))
+
+            # 2. Prosody Metrics (F0, merged with Chan's parallel variance update)
+            f0 = tracker(frames, sr, self.hop_length, min_period, max_period)
+            voiced = f0[~np.isnan(f0)]
+            if len(voiced):
+                delta = np.mean(voiced) - f0_mean
+                total = f0_count + len(voiced)
+                f0_m2 += np.sum((voiced - np.mean(voiced)) ** 2) + delta ** 2 * f0_count * len(voiced) / total
+                f0_mean += delta * len(voiced) / total
+                f0_count = total
+                f0_min, f0_max = min(f0_min, np.min(voiced)), max(f0_max, np.max(voiced))
+                chain = voiced if last_f0 is None else np.r_[last_f0, voiced]
+                if len(chain) > 1:
+                    jump_max = max(jump_max, float(np.max(np.abs(np.diff(chain)))))
+                last_f0 = voiced[-1]
+
+            # 3. Silence / Rhythm (incremental version of _silence_durations)
+            non_silent = librosa.amplitude_to_db(rms, ref=peak_rms, top_db=None) > -top_db
+            for i in np.flatnonzero(np.diff(np.r_[prev_non_silent, non_silent].astype(int))):
+                boundary = (n_frames + i) * self.hop_length
+                if non_silent[i] and boundary > last_end:
+                    silence_durations.append(float((boundary - last_end) / sr))
+                elif not non_silent[i]:
+                    last_end = boundary
+            prev_non_silent = bool(non_silent[-1])
+            n_frames += frames.shape[1]
+
+        noise_floor = noise_sketch.quantile(0.10)
+        signal_power = power_sum / n_bins
+        snr = 10 * np.log10(signal_power / (noise_floor**2 + 1e-10))
+
+        f0_stats = {
+            "mean": float(f0_mean) if f0_count > 0 else 0,
+            "std": float(np.sqrt(f0_m2 / f0_count)) if f0_count > 0 else 0,
+            "range": float(f0_max - f0_min) if f0_count > 0 else 0,
+            "jump_max": jump_max if f0_count > 1 else 0
+        }
+
+        return {
+            "quality": {
+                "clipping_rate": float(n_clipped / n_samples),
+                "snr_est": float(snr),
+                "spectral_flatness": float(flatness_sum / n_frames),
+                "rms": float(np.sqrt(sum_sq / n_samples))
+            },
+            "prosody": {
+                "f0": f0_stats,
+                "silence_durations": silence_durations,
+                "total_duration": float(n_samples / sr)
+            }
+        }
+
+
+def compare_f0_methods(audio_paths, sample_rate=24000):
+    """Frame-level accuracy of every F0 backend against pyin on the same clips."""
+    rows = []
+    for audio_path in audio_paths:
+        inspector = Inspector(sample_rate=sample_rate)
+        y, sr = librosa.load(audio_path, sr=sample_rate)
+        frames, _, _ = inspector._frontend(y)
+        min_period, max_period = inspector._f0_periods(sr)
+
+        tracks = {}
+        for method, tracker in F0_TRACKERS.items():
+            start = time.perf_counter()
+            tracks[method] = tracker(frames, sr, inspector.hop_length, min_period, max_period)
+            tracks[method + "_sec"] = time.perf_counter() - start
+
+        reference = tracks["pyin"]
+        for method in F0_TRACKERS:
+            f0 = tracks[method]
+            both = ~np.isnan(f0) & ~np.isnan(reference)
+            cents = np.abs(1200 * np.log2(f0[both] / reference[both]))
+            rows.append({
+                "file": audio_path,
+                "method": method,
+                "seconds": round(tracks[method + "_sec"], 4),
+                "voicing_agreement": float(np.mean(np.isnan(f0) == np.isnan(reference))),
+                "median_cents": float(np.median(cents)) if len(cents) else 0.0,
+                "gross_error_rate": float(np.mean(cents > 50)) if len(cents) else 0.0,
+            })
+    return rows
+
+def iter_paths(audio_paths, stdin=None):
+    """Paths from the command line, or one per line from stdin when none (or "-") are given."""
+    if audio_paths and audio_paths != ["-"]:
+        yield from audio_paths
+        return
+    for line in stdin or sys.stdin:
+        path = line.strip()
+        if path:
+            yield path
+
+
+def inspect_ndjson(inspector, audio_paths, out=None, stream=False):
+    """Write one feature record per line, flushed as soon as each file is done.
+
+    Every record carries "file"; unreadable files produce {"file", "error"} instead of
+    stopping the pipeline, so downstream stages see every input exactly once.
+    """
+    out = out or sys.stdout
+    analyze = inspector.analyze_stream if stream else inspector.analyze
+    count = 0
+    for audio_path in audio_paths:
+        try:
+            record = {"file": audio_path, **analyze(audio_path)}
+        except Exception as e:
+            record = {"file": audio_path, "error": f"{type(e).__name__}: {e}"}
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        count += 1
+    return count
+
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python3 inspector.py <audio_path>")
-        sys.exit(1)
-    
-    inspector = Inspector()
-    results = inspector.analyze(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Extract quality/prosody features from audio.")
+    parser.add_argument("audio_paths", nargs="*",
+                        help="Audio file(s) to inspect (with --ndjson, read from stdin when omitted or \"-\")")
+    parser.add_argument("--f0-method", choices=list(F0_TRACKERS), default="pyin",
+                        help="F0 backend (pyin: accurate/slow, yin/autocorr: vectorized/fast)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Bounded-memory block processing for long recordings")
+    parser.add_argument("--compare-f0", action="store_true",
+                        help="Compare all F0 backends against pyin on the given clips")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Emit one JSON record per line for every input path (pipe into diagnose-common-system.py --ndjson)")
+    args = parser.parse_args()
+    if not args.audio_paths and not args.ndjson:
+        parser.error("audio_paths is required unless --ndjson reads them from stdin")
+
+    if args.compare_f0:
+        print(json.dumps(compare_f0_methods(args.audio_paths), indent=2))
+        sys.exit(0)
+
+    inspector = Inspector(f0_method=args.f0_method)
+    if args.ndjson:
+        try:
+            inspect_ndjson(inspector, iter_paths(args.audio_paths), stream=args.stream)
+        except BrokenPipeError:
+            # The downstream stage exited early (e.g. `| head`); stop quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(0)
+    if args.stream:
+        results = inspector.analyze_stream(args.audio_paths[0])
+    else:
+        results = inspector.analyze(args.audio_paths[0])
     print(json.dumps(results, indent=2))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+TTS エンジンのモデルプール (CPU)
+
+(エンジン, チェックポイント) ごとにモデルを一度だけ読み込み、text.json の各エントリーで
+使い回す。読み込みは初めて使われた時点で行い、合計が RAM 予算を超える場合は最も長く
+使われていないモデルから解放する (XTTS と 7B の Qwen2-Audio を同時にメモリへ置かない)。
+
+モデルの大きさは読み込み後にパラメーターのバイト数 (取れなければ RSS の増分) で測り、
+まだ読み込んだことのないモデルは ENGINE_FOOTPRINT_GB の見積もりで予算を確保する。
+"""
+import os
+import gc
+import time
+import collections
+
+# 読み込み前の見積もり (GB)。一度読み込んだモデルは実測値を使う
+ENGINE_FOOTPRINT_GB = {
+    "xtts": 2.0,
+    "qwen2-audio": 32.0,  # 7B パラメーター (float32, CPU)
+    "gpt-sovits": 1.0,
+    "fish-speech": 2.0,
+    "styletts2": 1.0,
+}
+# 既定の RAM 予算 (GB)。環境変数 SNSW_RAM_BUDGET_GB で上書きできる
+DEFAULT_RAM_BUDGET_GB = float(os.environ.get("SNSW_RAM_BUDGET_GB", 24))
+
+GB = 1024 ** 3
+
+
+def _rss_bytes():
+    """現在のプロセスの常駐メモリ (取得できなければ None)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def parameter_bytes(model):
+    """torch のモジュール (またはそのタプル・dict) のパラメーターとバッファーの合計バイト数"""
+    if isinstance(model, dict):
+        return sum(parameter_bytes(m) for m in model.values())
+    if isinstance(model, (list, tuple)):
+        return sum(parameter_bytes(m) for m in model)
+    if hasattr(model, "nbytes") and not callable(model.nbytes):
+        # numpy 配列
+        return int(model.nbytes)
+    total = 0
+    for attr in ("parameters", "buffers"):
+        tensors = getattr(model, attr, None)
+        if callable(tensors):
+            try:
+                total += sum(t.numel() * t.element_size() for t in tensors())
+            except TypeError:
+                pass
+    return total
+
+
+class ModelPool:
+    """(エンジン, チェックポイント) をキーにしたモデルの LRU プール"""
+
+    def __init__(self, ram_budget_gb=DEFAULT_RAM_BUDGET_GB, verbose=True):
+        self.budget = int(ram_budget_gb * GB)
+        self.verbose = verbose
+        self._models = collections.OrderedDict()  # key -> (model, bytes)
+        self._measured = {}  # key -> 実測したバイト数 (解放後も覚えておく)
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    @property
+    def used(self):
+        return sum(size for _, size in self._models.values())
+
+    def estimate(self, engine, checkpoint):
+        key = (engine, checkpoint)
+        if key in self._measured:
+            return self._measured[key]
+        return int(ENGINE_FOOTPRINT_GB.get(engine, 1.0) * GB)
+
+    def __contains__(self, key):
+        return key in self._models
+
+    def get(self, engine, checkpoint, loader):
+        """モデルを返す。未読み込みなら予算を空けてから loader() で読み込む"""
+        key = (engine, checkpoint)
+        if key in self._models:
+            self._models.move_to_end(key)
+            self.hits += 1
+            return self._models[key][0]
+
+        needed = self.estimate(engine, checkpoint)
+        self._make_room(needed)
+        self._log(f"モデルを読み込み中: {engine} ({checkpoint})")
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = loader()
+        elapsed = time.perf_counter() - start
+        size = parameter_bytes(model)
+        if not size and rss_before is not None:
+            size = max(_rss_bytes() - rss_before, 0)
+        size = size or needed
+        self._models[key] = (model, size)
+        self._measured[key] = size
+        self.loads += 1
+        self.load_seconds += elapsed
+        self._log(f"読み込み完了: {engine} {size / GB:.2f}GB ({elapsed:.1f}s, プール {self.used / GB:.2f}/{self.budget / GB:.1f}GB)")
+        return model
+
+    def _make_room(self, needed):
+        # 予算より大きいモデルでも1つは置けるよう、空になったら止める
+        while self._models and self.used + needed > self.budget:
+            self.evict(next(iter(self._models)))
+
+    def evict(self, key):
+        model, size = self._models.pop(key)
+        del model
+        self.evictions += 1
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        self._log(f"モデルを解放: {key[0]} ({size / GB:.2f}GB)")
+
+    def clear(self):
+        while self._models:
+            self.evict(next(iter(self._models)))
+
+    def stats(self):
+        return {
+            "models": [engine for engine, _ in self._models],
+            "used_gb": round(self.used / GB, 2),
+            "budget_gb": round(self.budget / GB, 2),
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "load_seconds": round(self.load_seconds, 2),
+        }
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+"""
+MOS (自然さ) 予測 (CPU)
+
+download-eval-models.py で取得した wvmos (wav2vec2-base + 線形ヘッド) を、初回に ONNX
+(または TorchScript) へ書き出し、以降は CPU 向けランタイムで推論する。
+
+クリップは長さ順に並べ、最も長いクリップとの差が MAX_PADDING (長さの割合) 以内のものだけを
+batch_size 件までまとめてゼロ埋めする。モデルはフレームごとのスコアを返し、平均は各クリップの
+有効フレームだけで取る (ゼロ埋め部分のフレームは捨てる)。wav2vec2-base の特徴抽出は時間方向の
+GroupNorm を使い、アテンションマスクも受け取らないため、ゼロ埋めは有効フレームのスコアにも
+わずかに影響する。ゼロ埋めを長さの1割までに抑えて、1件ずつ推論した場合との差を小さく保つ
+(max_padding=0 なら同じ長さのクリップだけをまとめ、1件ずつ推論した場合と一致する)。
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.cache import file_hash, source_version
+
+MOS_SAMPLE_RATE = 16000
+DEFAULT_MODEL_DIR = "C:/models/eval/wvmos"
+DEFAULT_EXPORT_DIR = ".cache"
+RUNTIMES = ("onnx", "torchscript")
+# 1つのバッチで許すゼロ埋め (最も長いクリップの長さに対する割合)
+MAX_PADDING = 0.1
+# wav2vec2 の畳み込み特徴抽出 (kernel, stride)。有効フレーム数の計算に使う
+_CONV_LAYERS = ((10, 5), (3, 2), (3, 2), (3, 2), (3, 2), (2, 2), (2, 2))
+
+
+def load_mono(audio_path, sr=MOS_SAMPLE_RATE):
+    y, file_sr = sf.read(audio_path, dtype="float32", always_2d=True)
+    y = y.mean(axis=1)
+    if file_sr != sr:
+        y = soxr.resample(y, file_sr, sr)
+    return y
+
+
+def frame_count(num_samples):
+    """wav2vec2 の特徴フレーム数 (ゼロ埋め前の長さから有効フレームを求める)"""
+    frames = np.asarray(num_samples)
+    for kernel, stride in _CONV_LAYERS:
+        frames = (frames - kernel) // stride + 1
+    return np.maximum(frames, 1)
+
+
+def length_buckets(lengths, batch_size, max_padding=MAX_PADDING):
+    """クリップの添字をバッチに分ける
+
+    長さ順に並べ、バッチ内で最も長いクリップに対するゼロ埋めが max_padding 以内に収まる間だけ
+    batch_size 件までまとめる。
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    for i in order:
+        batch = batches[-1] if batches else None
+        if batch and len(batch) < batch_size and lengths[batch[0]] >= (1 - max_padding) * lengths[i]:
+            batch.append(i)
+        else:
+            batches.append([i])
+    return batches
+
+
+class MosPredictor:
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, runtime="onnx", batch_size=8,
+                 export_dir=DEFAULT_EXPORT_DIR, num_threads=None, max_padding=MAX_PADDING):
+        if runtime not in RUNTIMES:
+            raise ValueError(f"Unknown MOS runtime: {runtime} (choose from {', '.join(RUNTIMES)})")
+        self.model_dir = model_dir
+        self.runtime = runtime
+        self.batch_size = batch_size
+        self.max_padding = max_padding
+        self.export_dir = export_dir
+        self.num_threads = num_threads or os.cpu_count()
+        self._checkpoint = None
+        self._fingerprint = None
+        self._session = None
+        # 直近の predict_many の処理件数・推論回数・時間
+        self.last_stats = None
+
+    @property
+    def checkpoint(self):
+        if self._checkpoint is None:
+            candidates = sorted(glob.glob(os.path.join(self.model_dir, "*.ckpt")) +
+                                glob.glob(os.path.join(self.model_dir, "*.pth")))
+            if not candidates:
+                raise FileNotFoundError(f"wvmos checkpoint (*.ckpt / *.pth) not found in {self.model_dir}")
+            self._checkpoint = candidates[0]
+        return self._checkpoint
+
+    @property
+    def fingerprint(self):
+        """チェックポイントの識別子 (書き出し済みモデルと評価結果キャッシュのキーに使う)"""
+        if self._fingerprint is None:
+            self._fingerprint = file_hash(self.checkpoint)[:12]
+        return self._fingerprint
+
+    @property
+    def version(self):
+        """評価結果キャッシュのキー。チェックポイントに加え、推論の方法 (本スクリプト・ゼロ埋めの上限) が変われば変わる"""
+        return f"{self.fingerprint}-{source_version(__file__)}-pad{self.max_padding:g}"
+
+    def _load_torch_model(self):
+        """wvmos と同じ構成 (wav2vec2-base + 768->128->1 のヘッド) でフレームごとのスコアを返すモデル"""
+        import torch
+        from transformers import Wav2Vec2Model
+
+        class FrameScorer(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.encoder = Wav2Vec2Model.from_pretrained("facebook/wav2vec2-base")
+                self.encoder.freeze_feature_encoder()
+                self.dense = torch.nn.Sequential(
+                    torch.nn.Linear(768, 128), torch.nn.ReLU(), torch.nn.Dropout(0.1), torch.nn.Linear(128, 1))
+
+            def forward(self, waveforms):
+                hidden = self.encoder(waveforms).last_hidden_state
+                return self.dense(hidden).squeeze(-1)
+
+        model = FrameScorer()
+        state = torch.load(self.checkpoint, map_location="cpu")
+        state = state.get("state_dict", state)
+        # PyTorch Lightning で保存されたキーの "model." を外す
+        state = {key[len("model."):] if key.startswith("model.") else key: value for key, value in state.items()}
+        model.load_state_dict(state)
+        return model.eval()
+
+    @property
+    def session(self):
+        # 書き出し済みのモデルがあれば transformers 無しで読み込める
+        if self._session is None:
+            suffix = "onnx" if self.runtime == "onnx" else "pt"
+            export_path = os.path.join(self.export_dir, f"wvmos-{self.fingerprint}.{suffix}")
+            if not os.path.exists(export_path):
+                self._export(export_path)
+            self._session = self._open(export_path)
+        return self._session
+
+    def _export(self, export_path):
+        import torch
+        if self.runtime == "onnx":
+            import onnx  # noqa: F401  torch.onnx.export が必要とする
+
+        print(f"MOS モデルを書き出し中: {export_path}")
+        os.makedirs(self.export_dir, exist_ok=True)
+        model = self._load_torch_model()
+        example = torch.zeros(2, MOS_SAMPLE_RATE)
+        tmp_path = export_path + ".tmp"
+        with torch.no_grad():
+            if self.runtime == "onnx":
+                torch.onnx.export(model, (example,), tmp_path, input_names=["waveforms"],
+                                  output_names=["frame_scores"], opset_version=17, dynamo=False,
+                                  dynamic_axes={"waveforms": {0: "batch", 1: "samples"},
+                                                "frame_scores": {0: "batch", 1: "frames"}})
+            else:
+                torch.jit.save(torch.jit.freeze(torch.jit.trace(model, example)), tmp_path)
+        os.replace(tmp_path, export_path)
+
+    def _open(self, export_path):
+        if self.runtime == "onnx":
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = self.num_threads
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(export_path, options, providers=["CPUExecutionProvider"])
+            return lambda batch: session.run(None, {"waveforms": batch})[0]
+
+        import torch
+        torch.set_num_threads(self.num_threads)
+        module = torch.jit.load(export_path, map_location="cpu")
+
+        def run(batch):
+            with torch.inference_mode():
+                return module(torch.from_numpy(batch)).numpy()
+        return run
+
+    def predict_arrays(self, wavs):
+        """16kHz モノラル波形のリストに対する MOS のリスト"""
+        start = time.perf_counter()
+        lengths = [len(w) for w in wavs]
+        if not wavs:
+            self.last_stats = None
+            return []
+        scores = np.zeros(len(wavs), dtype=np.float32)
+        batches = length_buckets(lengths, self.batch_size, self.max_padding)
+        padded = 0
+        for batch in batches:
+            longest = max(lengths[i] for i in batch)
+            inputs = np.zeros((len(batch), longest), dtype=np.float32)
+            for row, i in enumerate(batch):
+                w = wavs[i]
+                # wav2vec2-base の前処理 (発話ごとに平均0・分散1)。ゼロ埋めは正規化の後
+                inputs[row, :len(w)] = (w - w.mean()) / np.sqrt(w.var() + 1e-7)
+            padded += inputs.size - sum(lengths[i] for i in batch)
+            frame_scores = self.session(inputs)
+            valid = frame_count([lengths[i] for i in batch])
+            mask = np.arange(frame_scores.shape[1]) < valid[:, None]
+            scores[batch] = (frame_scores * mask).sum(axis=1) / mask.sum(axis=1)
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            "clips": len(wavs),
+            "batches": len(batches),
+            "seconds": elapsed,
+            "clips_per_second": len(wavs) / elapsed if elapsed > 0 else 0.0,
+            "padding_ratio": padded / max(sum(lengths) + padded, 1),
+        }
+        return [float(s) for s in np.clip(scores, 1.0, 5.0)]
+
+    def predict_many(self, audio_paths):
+        """音声ファイルごとの MOS。読み込めないファイルは NaN"""
+        wavs = {}
+        for i, path in enumerate(audio_paths):
+            try:
+                wavs[i] = load_mono(path)
+            except Exception as e:
+                print(f"MOS予測をスキップ: {os.path.basename(path)} ({type(e).__name__}: {e})")
+        scores = [float("nan")] * len(audio_paths)
+        for i, mos in zip(wavs, self.predict_arrays(list(wavs.values()))):
+            scores[i] = mos
+        return scores
+
+    def throughput(self):
+        stats = self.last_stats
+        if not stats:
+            return "MOS予測: 0 件"
+        return (f"MOS予測: {stats['clips']} 件 / {stats['seconds']:.2f}s "
+                f"({stats['clips_per_second']:.1f} clips/s, 推論 {stats['batches']} 回, "
+                f"ゼロ埋め {stats['padding_ratio']:.1%}, {self.runtime}, batch {self.batch_size})")
+
+
+def build_mos_predictor(model_dir=DEFAULT_MODEL_DIR, runtime="onnx", batch_size=8, max_padding=MAX_PADDING):
+    """ランタイムやチェックポイントが無い環境では None"""
+    module = "onnxruntime" if runtime == "onnx" else "torch"
+    try:
+        __import__(module)
+    except ImportError:
+        print(f"{module} が見つからないため MOS を予測しません (pip install {module})")
+        return None
+    predictor = MosPredictor(model_dir, runtime, batch_size, max_padding=max_padding)
+    try:
+        _ = predictor.session
+    except (FileNotFoundError, ImportError) as e:
+        print(f"MOS 予測モデルを準備できないためスキップします: {e}")
+        return None
+    return predictor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="wvmos で MOS (自然さ) を予測し、スループットを表示する")
+    parser.add_argument("audio_paths", nargs="+", help="評価する音声")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="wvmos のチェックポイントがあるディレクトリ")
+    parser.add_argument("--runtime", choices=RUNTIMES, default="onnx", help="推論ランタイム")
+    parser.add_argument("--batch-size", type=int, default=8, help="1回の推論でまとめるクリップ数")
+    parser.add_argument("--max-padding", type=float, default=MAX_PADDING,
+                        help="1つのバッチで許すゼロ埋めの割合 (0 なら同じ長さのクリップだけをまとめる)")
+    args = parser.parse_args()
+
+    predictor = build_mos_predictor(args.model_dir, args.runtime, args.batch_size, args.max_padding)
+    if predictor is None:
+        sys.exit(1)
+    for path, mos in zip(args.audio_paths, predictor.predict_many(args.audio_paths)):
+        print(f"{os.path.basename(path)}: {mos:.2f}")
+    print(predictor.throughput())
@@ -1,11 +1,26 @@
 #!/usr/bin/env python
 import os
-import librosa
 import numpy as np
-import torch
+import sys
 import json
+import argparse
+import itertools
 from pathlib import Path
 
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.cache import ResultCache, CachedInspector, DEFAULT_CACHE_PATH, source_version
+from tools.decode import prefetch
+from tools.inspector import Inspector
+from tools.diagnostician import Diagnostician
+from tools.speaker import build_speaker_scorer
+from tools.mos import build_mos_predictor, DEFAULT_MODEL_DIR as DEFAULT_MOS_MODEL_DIR
+
+# MOS 予測・話者埋め込みの入力サンプルレート
+MODEL_SAMPLE_RATE = 16000
+
 def calculate_physical_stats(y):
     """物理的な統計情報を算出"""
     return {
@@ -14,68 +29,197 @@ def calculate_physical_stats(y):
         "rms": float(np.sqrt(np.mean(y**2)))
     }
 
-def predict_mos(y, sr):
+# 総合スコアの配点 (計算できなかった項目は除き、残りで100点満点に換算する)
+SCORE_WEIGHTS = {"mos": 60, "similarity": 40}
+
+def total_score(mos, similarity):
+    """総合スコア (100点満点)"""
+    parts = {"mos": None if mos is None else mos / 5.0, "similarity": similarity}
+    available = {name: value for name, value in parts.items() if value is not None}
+    if not available:
+        return 0.0
+    weight = sum(SCORE_WEIGHTS[name] for name in available)
+    return sum(SCORE_WEIGHTS[name] * value for name, value in available.items()) / weight * 100
+
+class AudioScorer:
     """
-    MOS (自然さ) を予測するプレースホルダ
-    実際には NISQA などのモデルをロードして計算する
+    1回のデコード結果 (DecodedAudio) から物理統計・MOS・話者類似度を求める。
+    MOS と話者埋め込みはどちらも同じ 16kHz の波形を使い、複数ファイルをまとめてバッチで推論する
     """
-    # デモ用にランダムな値を返す (3.0 - 4.8)
-    return float(np.random.uniform(3.0, 4.8))
 
-def calculate_similarity(y, ref_y):
+    def __init__(self, encoder=None, index=None, mos_predictor=None, options=None):
+        self.encoder = encoder
+        self.index = index
+        self.mos_predictor = mos_predictor
+        # ワーカープロセスで同じ構成を作り直すための build_audio_scorer() の引数
+        self.options = options or {}
+
+    def cache_params(self):
+        # 参照音声の集合・エンコーダー・MOS モデルや本スクリプトが変われば別キーになる
+        return {
+            "analyzer": "score",
+            "version": source_version(__file__),
+            "speaker": self.index.fingerprint if self.index is not None else None,
+            "mos": self.mos_predictor.version if self.mos_predictor is not None else None,
+        }
+
+    def is_cached(self, audio_path, cache):
+        return cache.contains(cache.make_key(audio_path, self.cache_params()))
+
+    def score_many(self, audios, cache=None):
+        """DecodedAudio のリストに対する {physical_stats, ai_scores} のリスト (読み込めないファイルは None)。
+        キャッシュに無いものだけ推論する"""
+        results, keys = {}, {}
+        if cache is not None:
+            params = self.cache_params()
+            for i, audio in enumerate(audios):
+                keys[i] = cache.make_key(audio.path, params)
+                cached = cache.get(keys[i])
+                if cached is not None:
+                    results[i] = cached
+
+        # キャッシュに全て揃っていればファイルはデコードしない
+        decoded = {}
+        for i in range(len(audios)):
+            if i in results:
+                continue
+            try:
+                decoded[i] = audios[i].at(MODEL_SAMPLE_RATE)
+            except Exception as e:
+                print(f"採点をスキップ: {os.path.basename(audios[i].path)} ({type(e).__name__}: {e})")
+                results[i] = None
+        pending, wavs = list(decoded), list(decoded.values())
+        per_reference = np.full((len(pending), 0), np.nan)
+        centroid = np.full(len(pending), np.nan)
+        if pending and self.index is not None:
+            per_reference, centroid = self.index.score(self.encoder.embed_arrays(wavs))
+        mos = [float("nan")] * len(pending)
+        if pending and self.mos_predictor is not None:
+            mos = self.mos_predictor.predict_arrays(wavs)
+
+        for k, i in enumerate(pending):
+            names = self.index.names if self.index is not None else []
+            results[i] = _score(audios[i].native[0], mos[k], centroid[k], dict(zip(names, per_reference[k])))
+            if cache is not None:
+                cache.put(keys[i], results[i])
+        return [results[i] for i in range(len(audios))]
+
+def build_audio_scorer(encoder="resemblyzer", ref_dir="SOURCE", mos_model_dir=DEFAULT_MOS_MODEL_DIR,
+                       mos_runtime="onnx", batch_size=16):
+    """使えないモデル (依存ライブラリ・参照音声・チェックポイントが無い) は除いて組み立てる"""
+    options = dict(encoder=encoder, ref_dir=ref_dir, mos_model_dir=mos_model_dir,
+                   mos_runtime=mos_runtime, batch_size=batch_size)
+    # 参照音声の埋め込み行列は初回だけ計算し、以降は .cache から読み込む
+    speaker_encoder, index = build_speaker_scorer(encoder, ref_dir, batch_size)
+    mos_predictor = build_mos_predictor(mos_model_dir, mos_runtime, batch_size)
+    return AudioScorer(speaker_encoder, index, mos_predictor, options)
+
+def score_files(audio_paths, scorer, cache=None, inspector=None, diagnostician=None, chunk_size=16):
     """
-    話者類似度を算出するプレースホルダ
-    実際には Resemblyzer 等の埋め込みベクトルで計算する
+    ディレクトリ全体を1パスで採点する。各ファイルは一度だけデコードし、その波形から
+    物理統計・MOS・話者類似度と (inspector があれば) Inspector の特徴量・診断を求めて1つの記録にまとめる。
+    chunk_size 件ずつ処理し、デコード済みの波形はチャンクごとに解放する。次のチャンクのデコードは
+    読み込みスレッドで先読みし、現在のチャンクの推論と重ねる
     """
-    # デモ用にランダムな値を返す (0.7 - 0.98)
-    return float(np.random.uniform(0.7, 0.98))
+    rates = [MODEL_SAMPLE_RATE] + ([inspector.sr] if inspector is not None else [])
 
-def score_audio(audio_path, ref_path=None):
-    print(f"\n--- 採点中: {os.path.basename(audio_path)} ---")
-    
-    y, sr = librosa.load(audio_path, sr=None)
+    def should_decode(path):
+        # 採点結果も Inspector の結果もキャッシュ済みなら波形は不要
+        if cache is None or not scorer.is_cached(path, cache):
+            return True
+        return inspector is not None and not (hasattr(inspector, "is_cached") and inspector.is_cached(path))
+
+    stream = prefetch(audio_paths, rates, depth=chunk_size, should_decode=should_decode)
+    results = []
+    mos_stats = []
+    for k in range(0, len(audio_paths), chunk_size):
+        audios = list(itertools.islice(stream, chunk_size))
+        if scorer.mos_predictor is not None:
+            scorer.mos_predictor.last_stats = None
+        scored_chunk = scorer.score_many(audios, cache)
+        if scorer.mos_predictor is not None and scorer.mos_predictor.last_stats:
+            mos_stats.append(scorer.mos_predictor.last_stats)
+        for audio, scored in zip(audios, scored_chunk):
+            if scored is None:
+                continue
+            record = {"file": os.path.basename(audio.path), **scored}
+            if inspector is not None:
+                # Inspector も同じ DecodedAudio から 24kHz の波形を取る (キャッシュヒットならデコードしない)
+                record["inspector_data"] = inspector.analyze(audio.path, audio=audio)
+                if diagnostician is not None:
+                    report = diagnostician.diagnose(record["inspector_data"])
+                    record["diagnosis"] = {
+                        "score": report["overall_score"],
+                        "buckets": report["buckets"],
+                        "lora_recommended": report.get("lora_recommended", False),
+                    }
+            results.append(record)
+
+    if mos_stats:
+        clips = sum(st["clips"] for st in mos_stats)
+        seconds = sum(st["seconds"] for st in mos_stats)
+        print(f"MOS予測: {clips} 件 / {seconds:.2f}s ({clips / seconds if seconds > 0 else 0.0:.1f} clips/s)")
+    return results
+
+def _score(y, mos, similarity, per_reference):
     stats = calculate_physical_stats(y)
     
-    mos_score = predict_mos(y, sr)
-    
-    similarity = 0.0
-    if ref_path and os.path.exists(ref_path):
-        ref_y, _ = librosa.load(ref_path, sr=sr)
-        similarity = calculate_similarity(y, ref_y)
-    
-    # 総合スコア (100点満点)
-    total_score = (mos_score / 5.0 * 60) + (similarity * 40)
+    # MOS は wvmos の予測値、話者類似度は参照音声全体の重心とのコサイン類似度 (計算できなければ None)
+    mos_score = float(mos) if np.isfinite(mos) else None
+    similarity = float(similarity) if np.isfinite(similarity) else None
     
     return {
-        "file": os.path.basename(audio_path),
         "physical_stats": stats,
         "ai_scores": {
-            "mos_predicted": round(mos_score, 2),
-            "speaker_similarity": round(similarity, 2),
-            "total_score": round(total_score, 1)
+            "mos_predicted": None if mos_score is None else round(mos_score, 2),
+            "speaker_similarity": None if similarity is None else round(similarity, 2),
+            "speaker_similarity_per_reference": {
+                name: round(float(value), 3) for name, value in per_reference.items()
+            },
+            "total_score": round(total_score(mos_score, similarity), 1)
         }
     }
 
 def main():
-    OUTPUT_DIR = "tts_outputs"
-    REF_AUDIO = "SOURCE/001.wav"
+    parser = argparse.ArgumentParser(description="生成音声の MOS 予測・話者類似度を採点する")
+    parser.add_argument("--output-dir", default="tts_outputs", help="採点対象の WAV があるディレクトリ")
+    parser.add_argument("--ref-dir", default="SOURCE", help="参照音声 (志ん生) のディレクトリ")
+    parser.add_argument("--encoder", choices=["resemblyzer", "ecapa"], default="resemblyzer", help="話者埋め込みモデル")
+    parser.add_argument("--batch-size", type=int, default=16, help="話者埋め込み・MOS 予測を1回の推論でまとめるファイル数")
+    parser.add_argument("--mos-model-dir", default=DEFAULT_MOS_MODEL_DIR, help="wvmos のチェックポイントがあるディレクトリ")
+    parser.add_argument("--mos-runtime", choices=["onnx", "torchscript"], default="onnx", help="MOS 予測の推論ランタイム")
+    parser.add_argument("--inspect", action="store_true",
+                        help="同じデコード結果から Inspector の特徴量と診断スコアも求め、1つの記録にまとめる")
+    parser.add_argument("--json", default=None, help="採点結果 (1ファイル1記録) を JSON で保存するパス")
+    args = parser.parse_args()
+
     STATS_FILE = "OUTPUTS/audio_analysis_stats.txt"
     
-    results = []
+    cache = ResultCache(DEFAULT_CACHE_PATH)
     
     # tts_outputs 内の wav ファイルをスキャン
-    wav_files = list(Path(OUTPUT_DIR).glob("*.wav"))
+    wav_files = sorted(str(p) for p in Path(args.output_dir).glob("*.wav"))
     if not wav_files:
         print("採点対象のWAVファイルが見つかりません。")
         return
 
-    for wav_path in wav_files:
-        score_data = score_audio(str(wav_path), REF_AUDIO)
-        results.append(score_data)
-        
+    scorer = build_audio_scorer(args.encoder, args.ref_dir, args.mos_model_dir, args.mos_runtime, args.batch_size)
+    inspector = diagnostician = None
+    if args.inspect:
+        inspector = CachedInspector(Inspector(), cache)
+        diagnostician = Diagnostician()
+    results = score_files(wav_files, scorer, cache, inspector, diagnostician, chunk_size=args.batch_size)
+    for score_data in results:
+        print(f"\n[{score_data['file']}]")
         print(f"  MOS予測: {score_data['ai_scores']['mos_predicted']}")
         print(f"  類似度: {score_data['ai_scores']['speaker_similarity']}")
         print(f"  総合スコア: {score_data['ai_scores']['total_score']}")
+        if "diagnosis" in score_data:
+            print(f"  診断スコア: {score_data['diagnosis']['score']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
 
     # 結果をテキストファイルに追記
     with open(STATS_FILE, "a", encoding="utf-8") as f:
@@ -86,7 +230,9 @@ def main():
             f.write(f"  話者類似度: {res['ai_scores']['speaker_similarity']}\n")
             f.write(f"  総合スコア: {res['ai_scores']['total_score']}/100\n")
 
+    stats = cache.stats()
     print(f"\n採点完了。レポートを {STATS_FILE} に追記しました。")
+    print(f"キャッシュ: 累計ヒット {stats['hits']} / ミス {stats['misses']} (保存数 {stats['entries']})")
 
 if __name__ == "__main__":
     main()
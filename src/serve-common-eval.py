@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+常駐評価サーバー (localhost HTTP)
+
+Inspector / Diagnostician (と任意で Linguist の ASR モデル) を起動時に一度だけロードして保持し、
+eval-common-run.py からの評価リクエストを低レイテンシで処理する。出世魚ループのように
+反復ごとに1ファイルずつ評価する用途で、インタプリタ起動・import・モデルロードを毎回払わずに済む。
+
+  POST /evaluate  {"audio_path": "/abs/path.wav"}  -> {"inspection", "linguistics", "diagnosis", "timings"}
+                  (任意で "linguist", "asr_model", "cache_path"。サーバーの設定と合わなければ 409)
+  GET  /health                                     -> 稼働状況とキュー・処理数の統計
+
+Inspector はワーカープロセス (--concurrency 個) で並列に実行し、受け付け中のリクエストが
+concurrency + max_queue を超えた場合は 503 を返す。
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.inspector import Inspector
+from tools.diagnostician import Diagnostician
+from tools.cache import ResultCache, CachedInspector, DEFAULT_CACHE_PATH
+from tools.linguist import build_linguist
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# ワーカープロセスごとに1回だけ生成する Inspector
+_worker = {}
+
+
+def _init_worker(cache_path):
+    inspector = Inspector()
+    # import 直後の初回呼び出しは遅いため、短い合成音で一度解析しておく
+    with tempfile.NamedTemporaryFile(suffix=".wav") as f:
+        t = np.arange(inspector.sr) / inspector.sr
+        sf.write(f.name, 0.3 * np.sin(2 * np.pi * 150 * t), inspector.sr)
+        inspector.analyze(f.name)
+    if cache_path:
+        inspector = CachedInspector(inspector, ResultCache(cache_path))
+    _worker["inspector"] = inspector
+
+
+def _ready():
+    # ワーカーの起動 (と _init_worker の完了) を待つためのタスク
+    time.sleep(0.1)
+    return os.getpid()
+
+
+def _inspect_in_worker(audio_path):
+    return _worker["inspector"].analyze(audio_path)
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class EvaluationService:
+    def __init__(self, concurrency=2, max_queue=16, cache_path=DEFAULT_CACHE_PATH, linguist=None):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.cache_path = os.path.abspath(cache_path) if cache_path else None
+        self.executor = ProcessPoolExecutor(max_workers=concurrency, initializer=_init_worker,
+                                            initargs=(cache_path,))
+        self.diagnostician = Diagnostician()
+        self.linguist = linguist
+        # ASR モデルは1つだけ常駐させ、同時に使うのは1リクエストまで
+        self.linguist_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(concurrency + max_queue)
+        self.stats_lock = threading.Lock()
+        self.stats = {"in_flight": 0, "served": 0, "failed": 0, "rejected": 0, "total_seconds": 0.0}
+
+    def warm_up(self):
+        start = time.perf_counter()
+        pids = {f.result() for f in [self.executor.submit(_ready) for _ in range(self.concurrency)]}
+        if self.linguist:
+            # ASR モデルをロードしておく
+            _ = self.linguist.pipeline
+        print(f"ウォームアップ完了: ワーカー {len(pids)} プロセス ({time.perf_counter() - start:.1f}s)")
+
+    def _count(self, **deltas):
+        with self.stats_lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def mismatch(self, options):
+        """リクエストの設定 (Linguist・キャッシュ) のうち、このサーバーで満たせないものの説明 (無ければ None)"""
+        if options.get("linguist"):
+            if self.linguist is None:
+                return "server was started without --linguist"
+            asr_model = options.get("asr_model")
+            if asr_model and asr_model != self.linguist.model_size:
+                return f"server Linguist uses ASR model {self.linguist.model_size}, not {asr_model}"
+        if "cache_path" in options:
+            cache_path = os.path.abspath(options["cache_path"]) if options["cache_path"] else None
+            if cache_path != self.cache_path:
+                return f"server uses cache {self.cache_path or '(none)'}, not {cache_path or '(none)'}"
+        return None
+
+    def evaluate(self, audio_path, use_linguist=True):
+        if not self.slots.acquire(blocking=False):
+            self._count(rejected=1)
+            raise ServiceBusy(f"queue is full ({self.concurrency} running + {self.max_queue} queued)")
+        self._count(in_flight=1)
+        start = time.perf_counter()
+        try:
+            # Inspector はワーカープロセスで、Linguist はこのプロセスで同時に進める
+            inspection_future = self.executor.submit(_inspect_in_worker, audio_path)
+            linguistics = None
+            try:
+                if self.linguist and use_linguist:
+                    with self.linguist_lock:
+                        linguistics = self.linguist.analyze(audio_path)
+            finally:
+                # Linguist が失敗しても、ワーカーで解析中のうちは枠を返さない
+                wait([inspection_future])
+            inspection = inspection_future.result()
+            diagnosis = self.diagnostician.diagnose(inspection, linguistics)
+        except Exception:
+            self._count(failed=1)
+            raise
+        finally:
+            self._count(in_flight=-1)
+            self.slots.release()
+        elapsed = time.perf_counter() - start
+        self._count(served=1, total_seconds=elapsed)
+        return {
+            "inspection": inspection,
+            "linguistics": linguistics,
+            "diagnosis": diagnosis,
+            "timings": {"server_seconds": round(elapsed, 4)},
+        }
+
+    def health(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["mean_seconds"] = stats["total_seconds"] / stats["served"] if stats["served"] else 0.0
+        return {"status": "ok", "concurrency": self.concurrency, "max_queue": self.max_queue,
+                "linguist": self.linguist is not None, **stats}
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, self.service.health())
+        else:
+            self._reply(404, {"error": f"unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/evaluate":
+            self._reply(404, {"error": f"unknown path: {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            audio_path = request["audio_path"]
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {"error": "expected JSON body with 'audio_path'"})
+            return
+        if not os.path.isfile(audio_path):
+            self._reply(400, {"error": f"File not found: {audio_path}"})
+            return
+        mismatch = self.service.mismatch(request)
+        if mismatch:
+            self._reply(409, {"error": mismatch})
+            return
+        try:
+            self._reply(200, self.service.evaluate(audio_path, request.get("linguist", True)))
+        except ServiceBusy as e:
+            self._reply(503, {"error": str(e)})
+        except Exception as e:
+            self._reply(500, {"error": f"Error during evaluation: {type(e).__name__}: {e}"})
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {format % args}")
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, concurrency=2, max_queue=16, cache_path=DEFAULT_CACHE_PATH,
+          linguist=None):
+    service = EvaluationService(concurrency, max_queue, cache_path, linguist)
+    service.warm_up()
+    _Handler.service = service
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    print(f"評価サーバー起動: http://{host}:{port} (並列数 {concurrency}, 待ち行列 {max_queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n評価サーバーを終了します。")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspector/Diagnostician を常駐させる評価サーバー")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="待ち受けアドレス (既定はローカルのみ)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="待ち受けポート")
+    parser.add_argument("--concurrency", type=int, default=2, help="同時に評価するファイル数 (ワーカープロセス数)")
+    parser.add_argument("--max-queue", type=int, default=16, help="実行待ちにできるリクエスト数 (超えると 503)")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Inspector結果キャッシュ (SQLite)")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わない")
+    parser.add_argument("--linguist", action="store_true", help="ASR モデルを常駐させ、発音 (CER) も評価する")
+    parser.add_argument("--asr-model", default="small", help="Linguist の faster-whisper モデル")
+    parser.add_argument("--text-json", default=None, help="参照テキスト (既定: SOURCE/text.json, src/text.json)")
+    args = parser.parse_args()
+
+    cache_path = None if args.no_cache else args.cache_path
+    linguist = build_linguist(args.asr_model, cache_path, text_json_path=args.text_json) if args.linguist else None
+    serve(args.host, args.port, args.concurrency, args.max_queue, cache_path, linguist)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+評価結果の列指向ストア (SQLite)
+
+eval-batch-stats.py / eval-common-run.py の評価結果を、1ファイル1行・特徴量1列で蓄積する。
+実行 (run_id) ごとのスナップショットを追記するため、週をまたいだスコア推移を
+散在する JSON / Markdown を読み直さずに比較できる。
+"""
+import os
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+
+DEFAULT_STORE_PATH = os.path.join("OUTPUTS", "eval_results.sqlite")
+
+# (列名, 型, 評価結果 dict からの取り出し方)
+COLUMNS = [
+    ("file", "TEXT", lambda r: r["file"]),
+    ("model", "TEXT", lambda r: r["model"]),
+    ("score", "REAL", lambda r: r["score"]),
+    ("quality", "REAL", lambda r: r["buckets"]["quality"]),
+    ("pronunciation", "REAL", lambda r: r["buckets"]["pronunciation"]),
+    ("prosody", "REAL", lambda r: r["buckets"]["prosody"]),
+    ("cer", "REAL", lambda r: (r.get("linguist_data") or {}).get("cer")),
+    ("mos_predicted", "REAL", lambda r: (r.get("ai_scores") or {}).get("mos_predicted")),
+    ("speaker_similarity", "REAL", lambda r: (r.get("ai_scores") or {}).get("speaker_similarity")),
+    ("lora_recommended", "INTEGER", lambda r: int(bool(r["lora_recommended"]))),
+    ("clipping_rate", "REAL", lambda r: r["inspector_data"]["quality"]["clipping_rate"]),
+    ("snr_est", "REAL", lambda r: r["inspector_data"]["quality"]["snr_est"]),
+    ("spectral_flatness", "REAL", lambda r: r["inspector_data"]["quality"]["spectral_flatness"]),
+    ("rms", "REAL", lambda r: r["inspector_data"]["quality"].get("rms", 0.0)),
+    ("f0_mean", "REAL", lambda r: r["inspector_data"]["prosody"]["f0"]["mean"]),
+    ("f0_std", "REAL", lambda r: r["inspector_data"]["prosody"]["f0"]["std"]),
+    ("f0_range", "REAL", lambda r: r["inspector_data"]["prosody"]["f0"]["range"]),
+    ("f0_jump_max", "REAL", lambda r: r["inspector_data"]["prosody"]["f0"]["jump_max"]),
+    ("max_silence", "REAL", lambda r: max(r["inspector_data"]["prosody"]["silence_durations"], default=0.0)),
+    ("total_duration", "REAL", lambda r: r["inspector_data"]["prosody"]["total_duration"]),
+]
+COLUMN_NAMES = ["run_id", "evaluated_at", "source"] + [name for name, _, _ in COLUMNS] + ["inspector_json"]
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        columns = ",\n".join(f"{name} {sql_type}" for name, sql_type, _ in COLUMNS)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS evaluations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT NOT NULL,
+                evaluated_at TEXT NOT NULL,
+                source TEXT NOT NULL,
+                {columns},
+                inspector_json TEXT
+            )""")
+        # 後から追加した列は既存のストアにも追加する (値は NULL)
+        existing = {row["name"] for row in self.conn.execute("PRAGMA table_info(evaluations)")}
+        for name, sql_type, _ in COLUMNS:
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE evaluations ADD COLUMN {name} {sql_type}")
+        self.conn.executescript("""
+            CREATE INDEX IF NOT EXISTS evaluations_model ON evaluations (model);
+            CREATE INDEX IF NOT EXISTS evaluations_run ON evaluations (run_id);
+            CREATE INDEX IF NOT EXISTS evaluations_score ON evaluations (model, score);
+            CREATE INDEX IF NOT EXISTS evaluations_file ON evaluations (file);
+            -- ファイルごとの最新の評価だけを見るビュー
+            CREATE VIEW IF NOT EXISTS latest AS
+                SELECT * FROM evaluations
+                WHERE id IN (SELECT MAX(id) FROM evaluations GROUP BY file);
+        """)
+        self.conn.commit()
+
+    def add(self, results, run_id=None, source="eval-batch-stats"):
+        """評価結果 (eval-batch-stats.py の results と同じ形) を1回の実行分として追記する"""
+        run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        evaluated_at = datetime.now().isoformat(timespec="seconds")
+        rows = [
+            [run_id, evaluated_at, source]
+            + [extract(res) for _, _, extract in COLUMNS]
+            + [json.dumps(res.get("inspector_data"), ensure_ascii=False)]
+            for res in results
+        ]
+        placeholders = ", ".join("?" for _ in COLUMN_NAMES)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO evaluations ({', '.join(COLUMN_NAMES)}) VALUES ({placeholders})", rows)
+        return len(rows)
+
+    def _query(self, sql, params=()):
+        return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def top_n(self, model, n=10):
+        """モデルの最新評価のうちスコア上位 n 件"""
+        return self._query(
+            "SELECT * FROM latest WHERE model = ? ORDER BY score DESC, file LIMIT ?", (model, n))
+
+    def score_history(self, model):
+        """実行ごとのサンプル数・平均/最小/最大スコアの推移"""
+        return self._query(
+            """SELECT run_id, COUNT(*) AS samples, AVG(score) AS mean_score,
+                      MIN(score) AS min_score, MAX(score) AS max_score
+               FROM evaluations WHERE model = ? GROUP BY run_id ORDER BY run_id""", (model,))
+
+    def filter(self, **conditions):
+        """列の一致条件で最新評価を絞り込む (例: filter(lora_recommended=True, model="xtts"))"""
+        unknown = set(conditions) - set(COLUMN_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(sorted(unknown))}")
+        where = " AND ".join(f"{name} = ?" for name in conditions) or "1"
+        params = [int(v) if isinstance(v, bool) else v for v in conditions.values()]
+        return self._query(f"SELECT * FROM latest WHERE {where} ORDER BY score DESC, file", params)
+
+    def models(self):
+        return [row["model"] for row in self._query("SELECT DISTINCT model FROM evaluations ORDER BY model")]
+
+
+def _print_rows(rows, columns):
+    print(" | ".join(columns))
+    for row in rows:
+        print(" | ".join(f"{row[c]:.2f}" if isinstance(row[c], float) else str(row[c]) for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="蓄積された評価結果を検索する")
+    parser.add_argument("--path", default=DEFAULT_STORE_PATH, help="結果ストア (SQLite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    top = sub.add_parser("top", help="モデル別スコア上位")
+    top.add_argument("model")
+    top.add_argument("-n", type=int, default=10)
+    history = sub.add_parser("history", help="実行ごとのスコア推移")
+    history.add_argument("model")
+    lora = sub.add_parser("lora", help="LoRA推奨のファイル一覧")
+    lora.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    store = ResultStore(args.path)
+    if args.command == "top":
+        _print_rows(store.top_n(args.model, args.n), ["file", "score", "quality", "pronunciation", "prosody", "run_id"])
+    elif args.command == "history":
+        _print_rows(store.score_history(args.model), ["run_id", "samples", "mean_score", "min_score", "max_score"])
+    elif args.command == "lora":
+        conditions = {"lora_recommended": True}
+        if args.model:
+            conditions["model"] = args.model
+        _print_rows(store.filter(**conditions), ["file", "model", "score", "quality", "run_id"])
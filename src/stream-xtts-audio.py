@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+XTTS のストリーミング合成
+
+発話全体の生成を待たず、GPT 段が音声トークンを stream_chunk_size 個出すごとに HiFi-GAN で
+波形に変換して返す (Xtts.inference_stream)。IncrementalWavWriter は届いたチャンクをそのまま
+WAV に追記するため、生成中のファイルを再生し始められる。ヘッダーのサイズ欄は閉じる時に書き直す
+(標準出力など seek できない出力では「長さ不明」のまま)。
+
+指標: 最初のチャンクが届くまでの時間 (TTFA) と実時間係数 (RTF = 生成時間 / 音声の長さ)
+"""
+import os
+import sys
+import time
+import struct
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+XTTS_SAMPLE_RATE = 24000
+DEFAULT_CHUNK_TOKENS = 20
+# 生成中のヘッダーに書く「長さ不明」のサイズ
+_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+class IncrementalWavWriter:
+    """16bit PCM の WAV をチャンクごとに追記する。close() でヘッダーのサイズ欄を確定させる"""
+
+    def __init__(self, path_or_file, sample_rate=XTTS_SAMPLE_RATE, channels=1):
+        if isinstance(path_or_file, (str, os.PathLike)):
+            self._file = open(path_or_file, "wb")
+            self._owns_file = True
+        else:
+            self._file = path_or_file
+            self._owns_file = False
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = 0
+        self._write_header(_UNKNOWN_SIZE, _UNKNOWN_SIZE)
+
+    def _write_header(self, riff_size, data_size):
+        block_align = self.channels * 2
+        self._file.write(b"RIFF" + struct.pack("<I", riff_size) + b"WAVE")
+        self._file.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, self.channels, self.sample_rate,
+                                               self.sample_rate * block_align, block_align, 16))
+        self._file.write(b"data" + struct.pack("<I", data_size))
+
+    def write(self, chunk):
+        """float の波形 (-1.0〜1.0) を追記して、読み手から見えるよう flush する"""
+        pcm = (np.clip(np.asarray(chunk, dtype=np.float32), -1.0, 1.0) * 32767).astype("<i2")
+        self._file.write(pcm.tobytes())
+        self._file.flush()
+        self.frames += len(pcm) // self.channels
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate
+
+    def close(self):
+        data_size = self.frames * self.channels * 2
+        try:
+            seekable = self._file.seekable()
+        except (AttributeError, ValueError):
+            seekable = False
+        if seekable:
+            self._file.seek(4)
+            self._file.write(struct.pack("<I", 36 + data_size))
+            self._file.seek(40)
+            self._file.write(struct.pack("<I", data_size))
+            self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamingSynthesis:
+    """Xtts.inference_stream() を包み、チャンク (float32 numpy) を返しながら指標を更新するイテレーター
+
+    metrics: ttfa (最初のチャンクまでの秒), elapsed, audio_seconds, rtf, chunks
+    """
+
+    def __init__(self, model, text, gpt_cond_latent, speaker_embedding, language="ja",
+                 stream_chunk_size=DEFAULT_CHUNK_TOKENS, sample_rate=XTTS_SAMPLE_RATE, **settings):
+        self.model = model
+        self.text = text
+        self.latents = (gpt_cond_latent, speaker_embedding)
+        self.language = language
+        self.stream_chunk_size = stream_chunk_size
+        self.sample_rate = sample_rate
+        self.settings = settings
+        self.metrics = {"ttfa": None, "elapsed": 0.0, "audio_seconds": 0.0, "rtf": None, "chunks": 0}
+
+    def __iter__(self):
+        start = time.perf_counter()
+        chunks = self.model.inference_stream(
+            self.text, self.language, *self.latents,
+            stream_chunk_size=self.stream_chunk_size, enable_text_splitting=True, **self.settings)
+        samples = 0
+        for chunk in chunks:
+            if hasattr(chunk, "cpu"):
+                chunk = chunk.cpu().numpy()
+            now = time.perf_counter() - start
+            if self.metrics["ttfa"] is None:
+                self.metrics["ttfa"] = now
+            samples += len(chunk)
+            self.metrics.update(elapsed=now, audio_seconds=samples / self.sample_rate,
+                                chunks=self.metrics["chunks"] + 1)
+            self.metrics["rtf"] = now / self.metrics["audio_seconds"] if samples else None
+            yield chunk
+        self.metrics["elapsed"] = time.perf_counter() - start
+        if samples:
+            self.metrics["rtf"] = self.metrics["elapsed"] / self.metrics["audio_seconds"]
+
+    def report(self):
+        m = self.metrics
+        if m["ttfa"] is None:
+            return "ストリーミング: 出力なし"
+        return (f"TTFA {m['ttfa']:.2f}s, RTF {m['rtf']:.2f} "
+                f"({m['audio_seconds']:.2f}s の音声を {m['elapsed']:.2f}s, {m['chunks']} チャンク)")
+
+
+def stream_to_wav(stream, output):
+    """StreamingSynthesis のチャンクを届いた順に WAV へ書き出し、指標を返す"""
+    with IncrementalWavWriter(output, stream.sample_rate) as writer:
+        for chunk in stream:
+            writer.write(chunk)
+    return stream.metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XTTS でストリーミング合成し、届いたチャンクから WAV に書き出す")
+    parser.add_argument("text", nargs="?", default="こんにちは。ストリーミング生成のテストです。", help="合成するテキスト")
+    parser.add_argument("--speaker-wav", nargs="+", default=["SOURCE/001.wav"], help="参照音声")
+    parser.add_argument("--model-dir", default=None, help="XTTS のチェックポイントディレクトリ (省略時は Hub の xtts_v2)")
+    parser.add_argument("--id", default="stream", help="出力ファイル名の id (xtts-audio-{id}-{timestamp}.wav)")
+    parser.add_argument("--output", default=None,
+                        help="出力先 (既定: tts_outputs/xtts-audio-{id}-{timestamp}.wav。"
+                             "- で標準出力。例: | ffplay -nodisp -autoexit -)")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help="波形に変換する単位 (GPT の音声トークン数。小さいほど TTFA が短い)")
+    parser.add_argument("--language", default="ja")
+    args = parser.parse_args()
+
+    if args.output == "-":
+        # 標準出力は音声専用にする。先に複製してから fd 1 を標準エラーに付け替えるため、
+        # モデル読み込みや話者条件の計算のログ (C 拡張の出力を含む) は WAV に混ざらない
+        sys.stdout.flush()
+        output = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = args.output or os.path.join("tts_outputs", f"xtts-audio-{args.id}-{timestamp}.wav")
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    from tools.voice import VoiceProfileCache, conditioning_kwargs
+
+    if args.model_dir:
+        from tools import load_script
+        model = load_script("inference-common-base.py").load_model(args.model_dir)
+        checkpoint, cond_kwargs = args.model_dir, {}
+    else:
+        from TTS.api import TTS
+        checkpoint = "tts_models/multilingual/multi-dataset/xtts_v2"
+        model = TTS(checkpoint).synthesizer.tts_model
+        cond_kwargs = conditioning_kwargs(model.config)
+    latents = VoiceProfileCache().latents(model, args.speaker_wav, checkpoint, **cond_kwargs)
+
+    stream = StreamingSynthesis(model, args.text, *latents, language=args.language,
+                                stream_chunk_size=args.chunk_tokens)
+    stream_to_wav(stream, output)
+    if args.output == "-":
+        output.close()
+    else:
+        print(f"保存先: {output}")
+    # 標準出力が音声の場合に混ざらないよう、指標は標準エラーへ
+    print(stream.report(), file=sys.stderr)
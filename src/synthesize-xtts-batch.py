@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+XTTS のバッチ合成 (CPU)
+
+text.json のエントリーを1文ずつ合成すると、CPU では呼び出しごとのオーバーヘッドと
+行列が小さいことによる演算器の遊びが生成時間の大半を占める。ここでは文をトークン数
+(出力長の見積もり) の順に並べてバッチにまとめ、自己回帰 (GPT) 段を1回の generate で
+バッチ全体について回す。
+
+プレフィックス (話者条件 + テキスト埋め込み) は左詰めのゼロ埋めとアテンションマスクで
+長さを揃える。XTTS の GPT は絶対位置埋め込みを使わず (wpe は常にゼロ)、音声トークンの
+位置はプレフィックス長に依らないため、各文の結果は1文ずつ生成した場合と同じになる
+(greedy で確認)。GPT の潜在表現の再計算と HiFi-GAN は文ごとに行う。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+DEFAULT_BATCH_SIZE = 4
+# Synthesizer.tts() が文の後ろに入れる無音 (サンプル数)
+SENTENCE_GAP = 10000
+
+
+def generation_settings(config):
+    """Xtts.synthesize() と同じ生成設定 (XttsConfig から)"""
+    return {
+        "temperature": config.temperature,
+        "length_penalty": config.length_penalty,
+        "repetition_penalty": config.repetition_penalty,
+        "top_k": config.top_k,
+        "top_p": config.top_p,
+    }
+
+
+def plan_batches(lengths, batch_size):
+    """添字をバッチに分ける。見積もり長の長い順に並べ、batch_size ごとに区切る (ゼロ埋めを最小にする)"""
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    return [order[k:k + batch_size] for k in range(0, len(order), batch_size)]
+
+
+def _prefix_embedding(gpt, cond_latents, text_tokens):
+    # GPT.compute_embeddings() と同じ (1文分)
+    text_inputs = F.pad(text_tokens.unsqueeze(0), (0, 1), value=gpt.stop_text_token)
+    text_inputs = F.pad(text_inputs, (1, 0), value=gpt.start_text_token)
+    emb = gpt.text_embedding(text_inputs) + gpt.text_pos_embedding(text_inputs)
+    return torch.cat([cond_latents, emb], dim=1)[0]
+
+
+@torch.inference_mode()
+def generate_codes(gpt, cond_latents, text_tokens, **hf_generate_kwargs):
+    """複数文の音声トークンを1回の generate で生成する
+
+    gpt: Xtts.gpt (init_gpt_for_inference 済み)
+    text_tokens: 文ごとのテキストトークン (1次元テンソル) のリスト
+    戻り値: 文ごとの音声トークン (1次元, 終端トークンを含む。GPT.generate() の1文分と同じ形)
+    """
+    rows = [_prefix_embedding(gpt, cond_latents, tokens) for tokens in text_tokens]
+    prefix_len = max(len(row) for row in rows)
+    device = rows[0].device
+    prefix = rows[0].new_zeros(len(rows), prefix_len, rows[0].shape[-1])
+    attention_mask = torch.zeros(len(rows), prefix_len + 1, dtype=torch.long, device=device)
+    for i, row in enumerate(rows):
+        prefix[i, prefix_len - len(row):] = row
+        attention_mask[i, prefix_len - len(row):] = 1
+    gpt.gpt_inference.store_prefix_emb(prefix)
+
+    # GPT.compute_embeddings() と同じダミー入力 (プレフィックス位置は埋め込みで置き換えられる)
+    gpt_inputs = torch.full((len(rows), prefix_len + 1), 1, dtype=torch.long, device=device)
+    gpt_inputs[:, -1] = gpt.start_audio_token
+    generated = gpt.gpt_inference.generate(
+        gpt_inputs,
+        attention_mask=attention_mask,
+        bos_token_id=gpt.start_audio_token,
+        pad_token_id=gpt.stop_audio_token,
+        eos_token_id=gpt.stop_audio_token,
+        max_length=gpt.max_gen_mel_tokens + gpt_inputs.shape[-1],
+        **hf_generate_kwargs,
+    )[:, gpt_inputs.shape[-1]:]
+
+    codes = []
+    for row in generated:
+        stops = torch.nonzero(row == gpt.stop_audio_token)
+        end = int(stops[0]) + 1 if len(stops) else len(row)
+        codes.append(row[:end])
+    return codes
+
+
+@torch.inference_mode()
+def synthesize_batch(model, texts, gpt_cond_latent, speaker_embedding, language="ja",
+                     temperature=0.75, length_penalty=1.0, repetition_penalty=10.0, top_k=50, top_p=0.85,
+                     do_sample=True, speed=1.0):
+    """Xtts.inference() のバッチ版。文ごとの波形 (24kHz, numpy) のリスト"""
+    language = language.split("-")[0]
+    device = model.device
+    gpt_cond_latent = gpt_cond_latent.to(device)
+    speaker_embedding = speaker_embedding.to(device)
+    text_tokens = []
+    for text in texts:
+        tokens = torch.IntTensor(model.tokenizer.encode(text.strip().lower(), lang=language)).to(device)
+        assert len(tokens) < model.args.gpt_max_text_tokens, \
+            " ❗ XTTS can only generate text with a maximum of 400 tokens."
+        text_tokens.append(tokens)
+
+    codes = generate_codes(
+        model.gpt, gpt_cond_latent, text_tokens,
+        do_sample=do_sample, top_p=top_p, top_k=top_k, temperature=temperature,
+        num_return_sequences=1, num_beams=1, length_penalty=length_penalty,
+        repetition_penalty=repetition_penalty, output_attentions=False,
+    )
+
+    wavs = []
+    length_scale = 1.0 / max(speed, 0.05)
+    for tokens, gpt_codes in zip(text_tokens, codes):
+        tokens = tokens.unsqueeze(0)
+        gpt_codes = gpt_codes.unsqueeze(0)
+        gpt_latents = model.gpt(
+            tokens,
+            torch.tensor([tokens.shape[-1]], device=device),
+            gpt_codes,
+            torch.tensor([gpt_codes.shape[-1] * model.gpt.code_stride_len], device=device),
+            cond_latents=gpt_cond_latent,
+            return_attentions=False,
+            return_latent=True,
+        )
+        if length_scale != 1.0:
+            gpt_latents = F.interpolate(
+                gpt_latents.transpose(1, 2), scale_factor=length_scale, mode="linear").transpose(1, 2)
+        wavs.append(model.hifigan_decoder(gpt_latents, g=speaker_embedding).cpu().squeeze().numpy())
+    return wavs
+
+
+def synthesize_to_files(tts, jobs, gpt_cond_latent, speaker_embedding, language="ja",
+                        batch_size=DEFAULT_BATCH_SIZE):
+    """TTS.api.TTS (XTTS) で (テキスト, 出力先) のリストをバッチ合成して書き出す
+
+    tts_to_file() と同じく各エントリーを文に分け、文ごとの波形の後ろに無音を挟んで連結し、
+    Synthesizer.save_wav() で保存する。文は全エントリーをまとめてから長さ順にバッチ化する。
+    """
+    synthesizer = tts.synthesizer
+    model = synthesizer.tts_model
+    settings = generation_settings(model.config)
+    sentences = []  # (ジョブ番号, 文)
+    for job, (text, _) in enumerate(jobs):
+        # 空白だけの文は合成しない (文が1つも無いエントリーはファイルを作らない)
+        sentences.extend((job, sentence) for sentence in synthesizer.split_into_sentences(text)
+                         if sentence.strip())
+    lengths = [len(model.tokenizer.encode(s.strip().lower(), lang=language.split("-")[0])) for _, s in sentences]
+
+    waves = [None] * len(sentences)
+    start = time.perf_counter()
+    for batch in plan_batches(lengths, batch_size):
+        texts = [sentences[i][1] for i in batch]
+        for i, wav in zip(batch, synthesize_batch(model, texts, gpt_cond_latent, speaker_embedding,
+                                                  language, **settings)):
+            waves[i] = wav
+        print(f"  {len(batch)} 文を生成 ({time.perf_counter() - start:.1f}s)")
+
+    for job, (_, output_file) in enumerate(jobs):
+        parts = []
+        for (owner, _), wav in zip(sentences, waves):
+            if owner == job:
+                parts.extend([wav, np.zeros(SENTENCE_GAP, dtype=wav.dtype)])
+        if not parts:
+            print(f"スキップ (合成する文がありません): {output_file}")
+            continue
+        synthesizer.save_wav(wav=np.concatenate(parts), path=output_file)
+        print(f"完了: {output_file}")
+    return len(sentences)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XTTS で text.json をバッチ合成する")
+    parser.add_argument("--text-json", default="SOURCE/text.json", help="合成するエントリー")
+    parser.add_argument("--speaker-wav", nargs="+", default=["SOURCE/001.wav"], help="参照音声")
+    parser.add_argument("--output-dir", default="tts_outputs", help="出力先")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1回の生成でまとめる文の数")
+    args = parser.parse_args()
+
+    from datetime import datetime
+    from TTS.api import TTS
+    from tools.voice import VoiceProfileCache, conditioning_kwargs
+
+    checkpoint = "tts_models/multilingual/multi-dataset/xtts_v2"
+    tts = TTS(checkpoint).to("cuda" if torch.cuda.is_available() else "cpu")
+    model = tts.synthesizer.tts_model
+    latents = VoiceProfileCache().latents(model, args.speaker_wav, checkpoint, **conditioning_kwargs(model.config))
+
+    with open(args.text_json, encoding="utf-8") as f:
+        entries = [e for e in json.load(f) if e.get("text")]
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    jobs = [(e["text"], os.path.join(args.output_dir, f"xtts-audio-{e.get('id', 'unknown')}-{timestamp}.wav"))
+            for e in entries]
+    start = time.perf_counter()
+    count = synthesize_to_files(tts, jobs, *latents, batch_size=args.batch_size)
+    print(f"{len(jobs)} エントリー / {count} 文: {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,18 @@
+"""Importable aliases for the hyphenated scripts in src/ (ADR-004 tools/)."""
+import importlib.util
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+
+def load_script(filename):
+    """Import a script such as ``inspect-common-audio.py`` as a module (once per process)."""
+    name = "snsw_" + filename[:-len(".py")].replace("-", "_")
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, SRC_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,9 @@
+from . import load_script
+
+_script = load_script("align-common-text.py")
+
+normalize_kana = _script.normalize_kana
+levenshtein = _script.levenshtein
+banded_alignment = _script.banded_alignment
+character_error_rate = _script.character_error_rate
+character_error_rates = _script.character_error_rates
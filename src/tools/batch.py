@@ -0,0 +1,7 @@
+from . import load_script
+
+_script = load_script("eval-batch-stats.py")
+
+evaluate_file = _script.evaluate_file
+write_reports = _script.write_reports
+verdict = _script.verdict
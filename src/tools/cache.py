@@ -0,0 +1,9 @@
+from . import load_script
+
+_script = load_script("cache-common-results.py")
+
+ResultCache = _script.ResultCache
+CachedInspector = _script.CachedInspector
+DEFAULT_CACHE_PATH = _script.DEFAULT_CACHE_PATH
+file_hash = _script.file_hash
+source_version = _script.source_version
@@ -0,0 +1,8 @@
+from . import load_script
+
+_script = load_script("decode-common-audio.py")
+
+DecodedAudio = _script.DecodedAudio
+decode_audio = _script.decode_audio
+prefetch = _script.prefetch
+DEFAULT_PREFETCH = _script.DEFAULT_PREFETCH
@@ -0,0 +1,7 @@
+from . import load_script
+
+_script = load_script("diagnose-common-system.py")
+
+Diagnostician = _script.Diagnostician
+feature_table = _script.feature_table
+FEATURE_COLUMNS = _script.FEATURE_COLUMNS
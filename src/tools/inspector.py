@@ -0,0 +1,8 @@
+from . import load_script
+
+_script = load_script("inspect-common-audio.py")
+
+Inspector = _script.Inspector
+F0_TRACKERS = _script.F0_TRACKERS
+StageTimer = _script.StageTimer
+summarize_timings = _script.summarize_timings
@@ -0,0 +1,7 @@
+from . import load_script
+
+_script = load_script("transcribe-common-audio.py")
+
+Linguist = _script.Linguist
+build_linguist = _script.build_linguist
+load_texts = _script.load_texts
@@ -0,0 +1,8 @@
+from . import load_script
+
+_script = load_script("predict-common-mos.py")
+
+MosPredictor = _script.MosPredictor
+build_mos_predictor = _script.build_mos_predictor
+length_buckets = _script.length_buckets
+DEFAULT_MODEL_DIR = _script.DEFAULT_MODEL_DIR
@@ -0,0 +1,8 @@
+from . import load_script
+
+_script = load_script("pool-common-models.py")
+
+ModelPool = _script.ModelPool
+ENGINE_FOOTPRINT_GB = _script.ENGINE_FOOTPRINT_GB
+DEFAULT_RAM_BUDGET_GB = _script.DEFAULT_RAM_BUDGET_GB
+parameter_bytes = _script.parameter_bytes
@@ -0,0 +1,8 @@
+from . import load_script
+
+_script = load_script("score-common-audio.py")
+
+AudioScorer = _script.AudioScorer
+build_audio_scorer = _script.build_audio_scorer
+score_files = _script.score_files
+MODEL_SAMPLE_RATE = _script.MODEL_SAMPLE_RATE
@@ -0,0 +1,7 @@
+from . import load_script
+
+_script = load_script("embed-common-speaker.py")
+
+SpeakerEncoder = _script.SpeakerEncoder
+ReferenceIndex = _script.ReferenceIndex
+build_speaker_scorer = _script.build_speaker_scorer
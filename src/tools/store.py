@@ -0,0 +1,6 @@
+from . import load_script
+
+_script = load_script("store-common-results.py")
+
+ResultStore = _script.ResultStore
+DEFAULT_STORE_PATH = _script.DEFAULT_STORE_PATH
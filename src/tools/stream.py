@@ -0,0 +1,7 @@
+from . import load_script
+
+_script = load_script("stream-xtts-audio.py")
+
+StreamingSynthesis = _script.StreamingSynthesis
+IncrementalWavWriter = _script.IncrementalWavWriter
+stream_to_wav = _script.stream_to_wav
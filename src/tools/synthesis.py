@@ -0,0 +1,9 @@
+from . import load_script
+
+_script = load_script("synthesize-xtts-batch.py")
+
+synthesize_batch = _script.synthesize_batch
+synthesize_to_files = _script.synthesize_to_files
+generate_codes = _script.generate_codes
+plan_batches = _script.plan_batches
+DEFAULT_BATCH_SIZE = _script.DEFAULT_BATCH_SIZE
@@ -0,0 +1,8 @@
+from . import load_script
+
+_script = load_script("cache-xtts-voice.py")
+
+VoiceProfileCache = _script.VoiceProfileCache
+DEFAULT_VOICE_DIR = _script.DEFAULT_VOICE_DIR
+conditioning_kwargs = _script.conditioning_kwargs
+reference_paths = _script.reference_paths
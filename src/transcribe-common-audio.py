@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+Linguist (ADR-005): 生成音声を ASR で文字起こしし、入力テキストとの CER と誤読箇所を求める
+
+faster-whisper のモデルをプロセス内に1つだけ常駐させ (CPU では int8)、複数のクリップを
+まとめて1回のバッチ推論で文字起こしする。文字起こし結果は音声の内容ハッシュをキーに
+キャッシュするため、再評価では ASR を実行しない。
+"""
+import os
+import sys
+import json
+import re
+import bisect
+import argparse
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.cache import ResultCache, DEFAULT_CACHE_PATH
+from tools.alignment import character_error_rates
+
+ASR_SAMPLE_RATE = 16000
+# Whisper が1回に扱える長さ。これより長いクリップは VAD で区切って個別に処理する
+CHUNK_SECONDS = 30
+TEXT_JSON_PATHS = ["SOURCE/text.json", "src/text.json"]
+
+
+def load_texts(text_json_path=None):
+    """text.json を {id: text} として読み込む (見つからなければ空)"""
+    candidates = [text_json_path] if text_json_path else TEXT_JSON_PATHS
+    for path in candidates:
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return {str(entry.get("id")): entry.get("text", "") for entry in json.load(f)}
+    return {}
+
+
+# {model}-audio-{id}-{YYYYmmdd}-{HHMMSS}.wav
+_OUTPUT_NAME = re.compile(r"-audio-([^-]+)-\d{8}-\d{6}\.wav$")
+
+
+def text_id(audio_path):
+    """命名規則 {model}-audio-{id}-{timestamp}.wav から text.json の id を取り出す
+
+    モデル名はハイフンを含むことがある (fish-speech, gpt-sovits) ため、末尾の時刻から逆に探す
+    """
+    match = _OUTPUT_NAME.search(os.path.basename(audio_path))
+    return match.group(1) if match else None
+
+
+class Linguist:
+    def __init__(self, model_size="small", device="cpu", compute_type="int8", language="ja",
+                 beam_size=1, batch_size=8, cache=None, texts=None):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.language = language
+        self.beam_size = beam_size
+        self.batch_size = batch_size
+        self.cache = cache
+        # text.json の {id: text}
+        self.texts = texts if texts is not None else load_texts()
+        self._pipeline = None
+
+    def cache_params(self):
+        import faster_whisper
+        # CER の計算方法ではなく文字起こしに影響するものだけをキーにする
+        return {
+            "analyzer": "linguist-asr",
+            "faster_whisper": faster_whisper.__version__,
+            "model": self.model_size,
+            "compute_type": self.compute_type,
+            "language": self.language,
+            "beam_size": self.beam_size,
+        }
+
+    @property
+    def pipeline(self):
+        # 初回だけロードし、以降はプロセス内に常駐させる
+        if self._pipeline is None:
+            from faster_whisper import WhisperModel, BatchedInferencePipeline
+            print(f"ASRモデルをロード中: {self.model_size} ({self.device}, {self.compute_type})")
+            model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+            self._pipeline = BatchedInferencePipeline(model=model)
+        return self._pipeline
+
+    def _options(self):
+        return dict(language=self.language, beam_size=self.beam_size, batch_size=self.batch_size)
+
+    def _transcribe_batch(self, audio_paths):
+        """30秒以下のクリップを連結し、クリップ境界を clip_timestamps として1回で推論する
+
+        clip_timestamps は秒で渡す。faster-whisper 1.1 はサンプル位置として扱うため 1.2 以上が必要
+        """
+        from faster_whisper import decode_audio
+        clips = [decode_audio(path, sampling_rate=ASR_SAMPLE_RATE) for path in audio_paths]
+        starts = np.cumsum([0] + [len(clip) for clip in clips[:-1]]) / ASR_SAMPLE_RATE
+        timestamps = [{"start": float(start), "end": float(start + len(clip) / ASR_SAMPLE_RATE)}
+                      for start, clip in zip(starts, clips)]
+        segments, _ = self.pipeline.transcribe(np.concatenate(clips), clip_timestamps=timestamps,
+                                               **self._options())
+        texts = [""] * len(clips)
+        for segment in segments:
+            # サンプル単位への丸めで開始時刻がわずかに前にずれることがある
+            index = bisect.bisect_right(starts, segment.start + 1e-3) - 1
+            texts[max(index, 0)] += segment.text.strip()
+        return texts
+
+    def _transcribe_long(self, audio_path):
+        segments, _ = self.pipeline.transcribe(audio_path, vad_filter=True, **self._options())
+        return "".join(segment.text.strip() for segment in segments)
+
+    def transcribe_many(self, audio_paths):
+        """文字起こし結果 (文字列) のリスト。キャッシュに無いものだけをまとめて推論する"""
+        texts = {}
+        keys = {}
+        if self.cache:
+            params = self.cache_params()
+            for path in audio_paths:
+                keys[path] = self.cache.make_key(path, params)
+                cached = self.cache.get(keys[path])
+                if cached is not None:
+                    texts[path] = cached["text"]
+
+        pending = [path for path in dict.fromkeys(audio_paths) if path not in texts]
+        short, long = [], []
+        for path in pending:
+            (long if sf.info(path).duration > CHUNK_SECONDS else short).append(path)
+        for i in range(0, len(short), self.batch_size):
+            batch = short[i:i + self.batch_size]
+            texts.update(zip(batch, self._transcribe_batch(batch)))
+        for path in long:
+            texts[path] = self._transcribe_long(path)
+
+        if self.cache:
+            for path in pending:
+                self.cache.put(keys[path], {"text": texts[path]})
+        return [texts[path] for path in audio_paths]
+
+    def analyze_many(self, audio_paths):
+        """各クリップの linguist_data (cer, mismatches 等)。参照テキストが無いクリップは None"""
+        texts = self.texts
+        targets = [path for path in audio_paths if texts.get(text_id(path))]
+        if not targets:
+            return [None] * len(audio_paths)
+        print(f"Linguist: {len(targets)} 件を文字起こし中...")
+        hypotheses = self.transcribe_many(targets)
+        scored = character_error_rates([(texts[text_id(path)], text) for path, text in zip(targets, hypotheses)])
+        for result, text in zip(scored, hypotheses):
+            result["text"] = text
+        scored = dict(zip(targets, scored))
+        return [scored.get(path) for path in audio_paths]
+
+    def analyze(self, audio_path):
+        return self.analyze_many([audio_path])[0]
+
+
+def build_linguist(model_size="small", cache_path=DEFAULT_CACHE_PATH, batch_size=8, text_json_path=None):
+    """faster-whisper が無い環境では None (発音バケットは従来通り CER 0 とみなす)"""
+    try:
+        import faster_whisper  # noqa: F401
+    except ImportError:
+        print("faster-whisper が見つからないため Linguist をスキップします (pip install faster-whisper)")
+        return None
+    texts = load_texts(text_json_path)
+    if not texts:
+        print("text.json が見つからないため Linguist をスキップします")
+        return None
+    return Linguist(model_size=model_size, batch_size=batch_size,
+                    cache=ResultCache(cache_path) if cache_path else None, texts=texts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成音声を文字起こしし、text.json との CER と誤読箇所を表示する")
+    parser.add_argument("audio_paths", nargs="+", help="{model}-audio-{id}-{timestamp}.wav 形式の音声")
+    parser.add_argument("--text-json", default=None, help="参照テキスト (既定: SOURCE/text.json, src/text.json)")
+    parser.add_argument("--asr-model", default="small", help="faster-whisper のモデル (tiny/base/small/medium/large-v3)")
+    parser.add_argument("--batch-size", type=int, default=8, help="1回の推論でまとめるクリップ数")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="文字起こし結果キャッシュ (SQLite)")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わずに文字起こしする")
+    args = parser.parse_args()
+
+    linguist = build_linguist(args.asr_model, None if args.no_cache else args.cache_path, args.batch_size,
+                              args.text_json)
+    if linguist is None:
+        sys.exit(1)
+    for path, result in zip(args.audio_paths, linguist.analyze_many(args.audio_paths)):
+        print(json.dumps({"file": os.path.basename(path), **(result or {"cer": None})},
+                         ensure_ascii=False))
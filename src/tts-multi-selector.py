@@ -10,9 +10,46 @@ import torch
 import librosa
 import soundfile as sf
 import json
+import time
+import argparse
+import threading
+import subprocess
+from pathlib import Path
 from datetime import datetime
 
-def process_tts(model_type, text, speaker_wav, output_file):
+current_dir = Path(__file__).parent.absolute()
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from tools.pool import ModelPool, DEFAULT_RAM_BUDGET_GB
+from tools.voice import VoiceProfileCache, conditioning_kwargs
+
+ENGINES = ["xtts", "qwen2-audio", "gpt-sovits", "fish-speech", "styletts2"]
+# 並列実行でスレッド数を揃える環境変数 (torch / OpenMP / BLAS)。子プロセスの起動前に設定する
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+# エンジンごとのチェックポイント (モデルプールのキー)
+XTTS_CHECKPOINT = "tts_models/multilingual/multi-dataset/xtts_v2"
+QWEN2_AUDIO_CHECKPOINT = "Qwen/Qwen2-Audio-7B-Instruct"
+
+
+def load_xtts(device):
+    from TTS.api import TTS
+    # Docker内では /app/models/TTS/xtts_v2 などのパスを想定
+    # 無ければ自動ダウンロード
+    return TTS(XTTS_CHECKPOINT).to(device)
+
+
+def load_qwen2_audio():
+    from transformers import Qwen2AudioForConditionalGeneration, AutoProcessor
+    processor = AutoProcessor.from_pretrained(QWEN2_AUDIO_CHECKPOINT)
+    model = Qwen2AudioForConditionalGeneration.from_pretrained(QWEN2_AUDIO_CHECKPOINT, device_map="cpu")
+    return processor, model
+
+
+def process_tts(model_type, text, speaker_wav, output_file, pool=None, voices=None):
+    """pool: エントリー間でモデルを使い回す ModelPool (None なら呼び出しごとに読み込む)
+    voices: XTTS の話者条件を保存・再利用する VoiceProfileCache (None なら毎回参照音声から計算する)"""
     print(f"\n--- 生成開始 ---")
     print(f"モデル: {model_type}")
     print(f"テキスト: {text}")
@@ -22,18 +59,18 @@ def process_tts(model_type, text, speaker_wav, output_file):
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"使用デバイス: {device}")
 
+    pool = pool or ModelPool()
+
     if model_type == "xtts":
-        from TTS.api import TTS
-        # Docker内では /app/models/TTS/xtts_v2 などのパスを想定
-        # 無ければ自動ダウンロード
-        tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
-        tts.tts_to_file(text=text, speaker_wav=speaker_wav, language="ja", file_path=output_file)
+        tts = pool.get("xtts", XTTS_CHECKPOINT, lambda: load_xtts(device))
+        speaker = voices.register_speaker(tts, speaker_wav, XTTS_CHECKPOINT) if voices else None
+        if speaker:
+            tts.tts_to_file(text=text, speaker=speaker, language="ja", file_path=output_file)
+        else:
+            tts.tts_to_file(text=text, speaker_wav=speaker_wav, language="ja", file_path=output_file)
 
     elif model_type == "qwen2-audio":
-        from transformers import Qwen2AudioForConditionalGeneration, AutoProcessor
-        model_name = "Qwen/Qwen2-Audio-7B-Instruct"
-        processor = AutoProcessor.from_pretrained(model_name)
-        model = Qwen2AudioForConditionalGeneration.from_pretrained(model_name, device_map="cpu")
+        processor, model = pool.get("qwen2-audio", QWEN2_AUDIO_CHECKPOINT, load_qwen2_audio)
         print("Qwen2-Audio での生成（デモ）")
 
     elif model_type == "gpt-sovits":
@@ -58,6 +95,96 @@ def process_tts(model_type, text, speaker_wav, output_file):
 
     print(f"完了: {output_file}")
 
+def process_tts_batch(model_type, jobs, speaker_wav, pool=None, voices=None, batch_size=4):
+    """(テキスト, 出力先) のリストをまとめて生成する。XTTS は文を長さ順にバッチ化して
+    自己回帰段をまとめて回し、エントリーごとの出力ファイルは process_tts() と同じにする。
+    バッチ生成に対応していないモデルは1件ずつ process_tts() で生成する"""
+    pool = pool or ModelPool()
+    if model_type != "xtts" or batch_size <= 1:
+        for text, output_file in jobs:
+            process_tts(model_type, text, speaker_wav, output_file, pool, voices)
+        return
+
+    from tools.synthesis import synthesize_to_files
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"\n--- バッチ生成開始 ({len(jobs)} エントリー, batch {batch_size}, {device}) ---")
+    tts = pool.get("xtts", XTTS_CHECKPOINT, lambda: load_xtts(device))
+    model = tts.synthesizer.tts_model
+    if voices:
+        latents = voices.latents(model, speaker_wav, XTTS_CHECKPOINT, **conditioning_kwargs(model.config))
+    else:
+        latents = model.get_conditioning_latents(audio_path=[speaker_wav], **conditioning_kwargs(model.config))
+    synthesize_to_files(tts, jobs, *latents, language="ja", batch_size=batch_size)
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_core_sets(engines, cores=None):
+    """エンジンごとに重ならないコアの組を割り当てる (連続したコアを均等に分ける)。
+    コアがエンジン数より少ない場合は1コアずつ順番に割り当てる (重なりが出る)"""
+    cores = cores if cores is not None else available_cores()
+    if len(cores) < len(engines):
+        print(f"警告: コア数 ({len(cores)}) がエンジン数 ({len(engines)}) より少ないため、コアを共有します")
+        return {engine: [cores[i % len(cores)]] for i, engine in enumerate(engines)}
+    share, extra = divmod(len(cores), len(engines))
+    plan, start = {}, 0
+    for i, engine in enumerate(engines):
+        size = share + (1 if i < extra else 0)
+        plan[engine] = cores[start:start + size]
+        start += size
+    return plan
+
+
+def apply_cpu_limits(cores=None, threads=None):
+    """このプロセスを cores に固定し、torch のスレッド数を threads にする (モデルの読み込み前に呼ぶ)"""
+    if cores:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        else:
+            print("この OS ではコアの固定に対応していないため、スレッド数のみ設定します")
+    threads = threads or (len(cores) if cores else None)
+    if threads:
+        torch.set_num_threads(threads)
+
+
+def _forward_output(engine, pipe):
+    for line in iter(pipe.readline, ""):
+        print(f"[{engine}] {line}", end="", flush=True)
+    pipe.close()
+
+
+def run_engines(engines, child_args, cores=None):
+    """エンジンごとに1プロセスを起動して並列に生成する。各プロセスには重ならないコアの組と、
+    その数に合わせたスレッド数 (torch / OpenMP / BLAS) を割り当てる。終了コードの dict を返す"""
+    plan = plan_core_sets(engines, cores)
+    processes = {}
+    start = time.perf_counter()
+    for engine in engines:
+        engine_cores = plan[engine]
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        env.update({name: str(len(engine_cores)) for name in THREAD_ENV_VARS})
+        command = [sys.executable, os.path.abspath(__file__), *child_args, "--model", engine,
+                   "--cores", ",".join(map(str, engine_cores)), "--threads", str(len(engine_cores))]
+        print(f"起動: {engine} (コア {engine_cores})")
+        proc = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace")
+        reader = threading.Thread(target=_forward_output, args=(engine, proc.stdout), daemon=True)
+        reader.start()
+        processes[engine] = (proc, reader)
+
+    results = {}
+    for engine, (proc, reader) in processes.items():
+        results[engine] = proc.wait()
+        reader.join()
+        print(f"終了: {engine} (終了コード {results[engine]}, {time.perf_counter() - start:.1f}s)")
+    return results
+
+
 def main():
     # --- 設定項目 ---
     # 1. XTTS v2 (Coqui TTS) - 高品質・多言語
@@ -75,6 +202,41 @@ def main():
     # 5. StyleTTS2 - 高速・高品質な音声合成
     # MODEL_TYPE = "styletts2"
     
+    parser = argparse.ArgumentParser(description="複数モデル対応TTS (text.json があれば全エントリーを生成)")
+    parser.add_argument("text", nargs="?", default="こんにちは。モデル切り替えのテストです。", help="単発生成のテキスト")
+    parser.add_argument("speaker_wav", nargs="?", default=None, help="参照音声")
+    parser.add_argument("output_file", nargs="?", default=None, help="単発生成の出力先")
+    parser.add_argument("--model", default=MODEL_TYPE, choices=ENGINES, help="使用するモデル")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=None,
+                        help="複数のモデルを1モデル1プロセスで並列に生成する (コアを重ならないよう割り当てる)")
+    parser.add_argument("--cores", default=None,
+                        help="このプロセスを固定するコア (例: 0,1,2)。--engines では使えるコアの範囲")
+    parser.add_argument("--threads", type=int, default=None, help="torch のスレッド数 (既定: --cores の数)")
+    parser.add_argument("--timestamp", default=None, help="出力ファイル名のタイムスタンプ (並列実行で揃える)")
+    parser.add_argument("--ram-budget-gb", type=float, default=DEFAULT_RAM_BUDGET_GB,
+                        help="モデルプールに置くモデルの合計上限 (超えたら最も古く使われたモデルを解放)")
+    parser.add_argument("--no-voice-cache", action="store_true",
+                        help="XTTS の話者条件をキャッシュせず、エントリーごとに参照音声から計算する")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="text.json の文を長さ順にまとめて生成する数 (XTTS のみ。1 なら1件ずつ)")
+    args = parser.parse_args()
+    cores = [int(c) for c in args.cores.split(",")] if args.cores else None
+    if args.engines:
+        # 子プロセスには --engines / --cores / --threads 以外の引数をそのまま渡し、タイムスタンプを揃える
+        # 出力先はエンジンごとに {model}-audio-... で決めるため、output_file は渡さない
+        child_args = [args.text] + ([args.speaker_wav] if args.speaker_wav else [])
+        child_args += ["--ram-budget-gb", str(args.ram_budget_gb), "--batch-size", str(args.batch_size),
+                       "--timestamp", args.timestamp or datetime.now().strftime("%Y%m%d-%H%M%S")]
+        if args.no_voice_cache:
+            child_args.append("--no-voice-cache")
+        results = run_engines(args.engines, child_args, cores)
+        sys.exit(0 if all(code == 0 for code in results.values()) else 1)
+
+    apply_cpu_limits(cores, args.threads)
+    MODEL_TYPE = args.model
+    pool = ModelPool(args.ram_budget_gb)
+    voices = None if args.no_voice_cache else VoiceProfileCache()
+
     # --- パス設定 ---
     # text.json が SOURCE ディレクトリにある場合を優先する
     TEXT_JSON_PATH = "SOURCE/text.json"
@@ -96,7 +258,8 @@ def main():
 
     # 出力ディレクトリの作成
     if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+        # --engines では複数のプロセスが同時に作成しうる
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
         print(f"ディレクトリを作成しました: {OUTPUT_DIR}")
 
     # text.json が存在するか確認
@@ -105,7 +268,8 @@ def main():
         with open(TEXT_JSON_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        timestamp = args.timestamp or datetime.now().strftime("%Y%m%d-%H%M%S")
+        jobs = []
         for entry in data:
             entry_id = entry.get("id", "unknown")
             text = entry.get("text", "")
@@ -115,16 +279,18 @@ def main():
             # 命名規則: (モデル-)役割-特徴-タイムスタンプ.拡張子
             # text.json 用に ID を特徴部分に含める
             output_file = os.path.join(OUTPUT_DIR, f"{MODEL_TYPE}-audio-{entry_id}-{timestamp}.wav")
-            process_tts(MODEL_TYPE, text, DEFAULT_SPEAKER_WAV, output_file)
+            jobs.append((text, output_file))
+        process_tts_batch(MODEL_TYPE, jobs, DEFAULT_SPEAKER_WAV, pool, voices, args.batch_size)
     else:
         # 引数から単発処理
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        text = sys.argv[1] if len(sys.argv) > 1 else "こんにちは。モデル切り替えのテストです。"
-        speaker_wav = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SPEAKER_WAV
-        output_file = sys.argv[3] if len(sys.argv) > 3 else os.path.join(OUTPUT_DIR, f"{MODEL_TYPE}-audio-multi-{timestamp}.wav")
-        process_tts(MODEL_TYPE, text, speaker_wav, output_file)
+        timestamp = args.timestamp or datetime.now().strftime("%Y%m%d-%H%M%S")
+        text = args.text
+        speaker_wav = args.speaker_wav or DEFAULT_SPEAKER_WAV
+        output_file = args.output_file or os.path.join(OUTPUT_DIR, f"{MODEL_TYPE}-audio-multi-{timestamp}.wav")
+        process_tts(MODEL_TYPE, text, speaker_wav, output_file, pool, voices)
 
     print(f"\nすべての処理が完了しました。")
+    print(f"モデルプール: {pool.stats()}")
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,11 @@
 # Qwen4-TTS Voice Clone POC
 # シンプルな音声クローニング実装
 # 3秒程度の参照音声から声をクローンして、任意のテキストを読み上げます。
+#
+# text.json のバッチ合成 (synthesize-xtts-batch.py) の対象外で、1件ずつ生成します。
+# Colab から移した単体の POC で tts-multi-selector.py からは呼ばれず、Qwen3TTSModel.generate() も
+# 1テキスト・1参照音声の呼び出しでしか使っていません。qwen-tts を入れていない環境では
+# バッチ生成と1件ずつの生成の一致を確かめられないため、XTTS と同じ手順での移行は見送っています。
 
 # 必要なライブラリのインストール
 # !pip install -q qwen-tts soundfile torch torchaudio
@@ -0,0 +1,7 @@
+"""src/ のスクリプトを tools の別名 (tools.batch など) 経由で import できるようにする"""
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
@@ -0,0 +1,75 @@
+import numpy as np
+
+from tools import load_script
+
+batch = load_script("eval-batch-stats.py")
+
+
+def _fake_evaluate(scores_by_file):
+    def evaluate_files(wav_files, *args, **kwargs):
+        return [{"file": f, "model": f.split("-")[0], "score": scores_by_file[f]} for f in wav_files]
+    return evaluate_files
+
+
+def test_look_levels_spend_at_most_alpha(monkeypatch):
+    rng = np.random.default_rng(1)
+    files = [f"xtts-audio-{i}-20250101-000000.wav" for i in range(103)]
+    # 判定帯の境界 (75) 付近にして最後まで打ち切らせない
+    scores = {f: float(s) for f, s in zip(files, rng.normal(75, 8, len(files)))}
+    levels = []
+    interval = batch.bootstrap_interval
+
+    def recording_interval(values, rng, n_boot, confidence):
+        levels.append(confidence)
+        return interval(values, rng, n_boot, confidence)
+
+    monkeypatch.setattr(batch, "evaluate_files", _fake_evaluate(scores))
+    monkeypatch.setattr(batch, "bootstrap_interval", recording_interval)
+    _, summary = batch.adaptive_evaluation(files, min_samples=10, step=5, confidence=0.95, n_boot=200)
+
+    st = summary["xtts"]
+    assert len(levels) == st["looks"] > 1
+    assert sum(1 - c for c in levels) <= 0.05 + 1e-12
+    # 1回目は全体の 10/103 の割合だけ使う
+    assert abs((1 - levels[0]) - 0.05 * 10 / 103) < 1e-12
+    assert st["confidence"] == 0.95
+
+
+def test_clear_model_stops_early(monkeypatch):
+    files = [f"fish-audio-{i}-20250101-000000.wav" for i in range(200)]
+    scores = {f: 90.0 + (i % 3) for i, f in enumerate(files)}
+    monkeypatch.setattr(batch, "evaluate_files", _fake_evaluate(scores))
+    results, summary = batch.adaptive_evaluation(files, min_samples=10, step=5, n_boot=200)
+    assert summary["fish"]["stopped_early"]
+    assert len(results) == summary["fish"]["samples"] < len(files)
+
+
+def test_one_worker_pool_for_all_looks(monkeypatch):
+    files = [f"xtts-audio-{i}-20250101-000000.wav" for i in range(60)]
+    rng = np.random.default_rng(2)
+    scores = {f: float(s) for f, s in zip(files, rng.normal(75, 8, len(files)))}
+    pools = []
+
+    class FakePool:
+        # ワーカーの初期化 (モデルの読み込み) はプールを作る時に1回だけ行われる
+        def __init__(self, max_workers, initializer, initargs):
+            pools.append(self)
+
+        def map(self, fn, *iterables):
+            return map(fn, *iterables)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    def fake_worker(wav_paths, linguist_results=None):
+        return [{"file": f, "model": "xtts", "score": scores[f]} for f in wav_paths]
+
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(batch, "_evaluate_in_worker", fake_worker)
+    _, summary = batch.adaptive_evaluation(files, workers=2, cache_path=None, min_samples=10, step=5,
+                                           n_boot=200)
+    assert summary["xtts"]["looks"] > 1
+    assert len(pools) == 1
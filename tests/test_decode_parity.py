@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from tools.decode import DecodedAudio
+from tools.inspector import Inspector
+
+
+def _write_44k(path, frames):
+    sr = 44100
+    t = np.arange(frames) / sr
+    y = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    sf.write(path, np.stack([y, 0.5 * y], axis=1), sr, subtype="PCM_16")
+    return str(path)
+
+
+# soxr の出力が ceil(n * sr / 44100) より1サンプル短くなる長さ
+@pytest.mark.parametrize("frames, sr", [(123457, 24000), (200000, 16000), (44101, 16000)])
+def test_resampled_length_matches_librosa(tmp_path, frames, sr):
+    librosa = pytest.importorskip("librosa")
+    path = _write_44k(tmp_path / "clip.wav", frames)
+    expected, _ = librosa.load(path, sr=sr)
+    actual = DecodedAudio(path).at(sr)
+    assert len(actual) == len(expected)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_inspector_same_result_with_decoded_audio(tmp_path):
+    path = _write_44k(tmp_path / "xtts-audio-1-20250101-000000.wav", 123457)
+    inspector = Inspector(f0_method="yin")
+    direct = inspector.analyze(path)
+    shared = inspector.analyze(path, audio=DecodedAudio(path))
+    assert shared == direct
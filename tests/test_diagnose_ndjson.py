@@ -0,0 +1,43 @@
+import io
+import json
+
+from tools import load_script
+
+diagnose_ndjson = load_script("diagnose-common-system.py").diagnose_ndjson
+
+RECORD = {
+    "file": "xtts-audio-1-20250101-000000.wav",
+    "quality": {"clipping_rate": 0.0, "spectral_flatness": 0.0},
+    "prosody": {"f0": {"range": 100.0, "jump_max": 10.0}, "silence_durations": []},
+}
+
+
+def _run(lines):
+    out = io.StringIO()
+    count = diagnose_ndjson(lines, out)
+    reports = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert count == len(reports)
+    return reports
+
+
+def test_one_report_per_input_line():
+    lines = [
+        json.dumps(RECORD),
+        "",
+        json.dumps({"file": "fish-audio-9-x.wav", "error": "LibsndfileError: unreadable"}),
+        "not json",
+        "[1]",
+        "42",
+        json.dumps({"file": "gpt-sovits-audio-2-x.wav", "quality": {}}),
+        json.dumps({**RECORD, "linguist": {"cer": 0.2}}),
+    ]
+    reports = _run(lines)
+    assert len(reports) == 7
+    assert reports[0]["overall_score"] == 100.0
+    assert reports[1] == {"file": "fish-audio-9-x.wav", "error": "LibsndfileError: unreadable"}
+    assert reports[2]["file"] is None and reports[2]["error"].startswith("JSONDecodeError")
+    assert reports[3]["file"] is None and reports[3]["error"].startswith("TypeError")
+    assert reports[4]["file"] is None and reports[4]["error"].startswith("TypeError")
+    # 項目が足りない記録もファイル名は残す
+    assert reports[5]["file"] == "gpt-sovits-audio-2-x.wav" and reports[5]["error"].startswith("KeyError")
+    assert reports[6]["buckets"]["pronunciation"] == 60
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from tools.diagnostician import Diagnostician
+
+# 各閾値 (BATCH_RULES と同じ値)
+EDGES = {"clipping_rate": 0.01, "spectral_flatness": 0.1, "cer": 0.05,
+         "f0_range": 50, "f0_jump_max": 150, "max_silence": 1.0}
+
+
+def _inspector_data(clipping_rate, spectral_flatness, f0_range, f0_jump_max, max_silence):
+    return {
+        "quality": {"clipping_rate": clipping_rate, "spectral_flatness": spectral_flatness},
+        "prosody": {"f0": {"range": f0_range, "jump_max": f0_jump_max},
+                    "silence_durations": [max_silence] if max_silence != 0 else []},
+    }
+
+
+def _synthetic_table(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # 各閾値の境界ちょうど・前後の値と、全規則の組み合わせが出るよう閾値付近を重点的に生成する
+    table = {}
+    for name, edge in EDGES.items():
+        column = edge * rng.uniform(0, 2, n)
+        column[rng.random(n) < 0.1] = edge
+        column[rng.random(n) < 0.05] = np.nan
+        table[name] = column
+    # max_silence = 0 は「無音区間なし」
+    table["max_silence"][rng.random(n) < 0.1] = 0.0
+    return table
+
+
+def test_diagnose_many_matches_diagnose():
+    n = 10000
+    table = _synthetic_table(n)
+    diag = Diagnostician()
+    vectorized = diag.reports(diag.diagnose_many(table))
+    for row in range(n):
+        inspector_data = _inspector_data(
+            table["clipping_rate"][row], table["spectral_flatness"][row],
+            table["f0_range"][row], table["f0_jump_max"][row], table["max_silence"][row])
+        expected = diag.diagnose(inspector_data, {"cer": table["cer"][row], "mismatches": []})
+        assert vectorized[row] == expected, f"row {row}"
+
+
+def test_missing_cer_column_counts_as_zero():
+    table = {name: np.full(3, value) for name, value in
+             {"clipping_rate": 0.0, "spectral_flatness": 0.0, "f0_range": 100.0,
+              "f0_jump_max": 0.0, "max_silence": 0.0}.items()}
+    batch = Diagnostician().diagnose_many(table)
+    assert (batch["buckets"]["pronunciation"] == 100).all()
+
+
+@pytest.mark.parametrize("inputs, cer, buckets, highlights", [
+    ((0.0, 0.0, 100.0, 0.0, 0.0), 0.0, (100, 100, 100), []),
+    ((0.02, 0.2, 100.0, 0.0, 0.0), 0.0, (50, 100, 100),
+     ["Clipping detected (Audio level too high)", "High spectral flatness (Metallic or noisy sound)"]),
+    ((0.0, 0.0, 100.0, 0.0, 0.0), 0.1, (100, 60, 100), ["High Character Error Rate (10.00%)"]),
+    ((0.0, 0.0, 49.0, 151.0, 1.5), 0.0, (100, 100, 40),
+     ["Flat intonation (Narrow F0 range)", "Unnatural pitch jump detected", "Long silence detected (1.50s)"]),
+    # 境界ちょうどは減点しない
+    ((0.01, 0.1, 50.0, 150.0, 1.0), 0.05, (100, 100, 100), []),
+])
+def test_diagnose_thresholds(inputs, cer, buckets, highlights):
+    report = Diagnostician().diagnose(_inspector_data(*inputs), {"cer": cer, "mismatches": []})
+    assert tuple(report["buckets"].values()) == buckets
+    assert report["highlights"] == highlights
+    assert report["overall_score"] == round(sum(buckets) / 3, 1)
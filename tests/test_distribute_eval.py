@@ -0,0 +1,96 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from tools import SRC_DIR, load_script
+
+distribute = load_script("distribute-common-eval.py")
+SCRIPT = str(SRC_DIR / "distribute-common-eval.py")
+
+
+def _synthetic_wavs(target_dir, count, seconds=1.0, sr=24000):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    for i in range(count):
+        f0 = 110 + 40 * rng.random() + 10 * np.sin(2 * np.pi * 0.5 * t)
+        y = 0.3 * np.sin(2 * np.pi * np.cumsum(f0) / sr) * (np.sin(2 * np.pi * 0.7 * t) > -0.6)
+        sf.write(os.path.join(target_dir, f"synth-audio-{i + 1:03d}-test.wav"), y.astype("float32"), sr)
+
+
+def _lease_path(tmp_path):
+    dirs = distribute.queue_dirs(str(tmp_path))
+    return os.path.join(dirs["leases"], "synth-audio-001-test.wav.lease")
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_live_lease_is_not_taken(tmp_path):
+    path = _lease_path(tmp_path)
+    assert distribute.Lease(path, "a", seconds=60).acquire()
+    assert not distribute.Lease(path, "b", seconds=60).acquire()
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    path = _lease_path(tmp_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"owner": "dead", "token": "old", "expires": time.time() - 1}, f)
+    lease = distribute.Lease(path, "b", seconds=60)
+    assert lease.acquire()
+    assert lease.owned()
+    assert distribute._read_json(path)["owner"] == "b"
+    assert glob.glob(path + ".*") == []
+    # 引き継いだ後は他の worker から取れない
+    assert not distribute.Lease(path, "c", seconds=60).acquire()
+
+
+def test_empty_lease_expires_by_mtime(tmp_path):
+    # O_EXCL で作成した直後、書き込む前に worker が落ちた場合
+    path = _lease_path(tmp_path)
+    open(path, "w").close()
+    assert not distribute.Lease(path, "b", seconds=60).acquire()
+    _age(path, 120)
+    lease = distribute.Lease(path, "b", seconds=60)
+    assert lease.acquire()
+    assert lease.owned()
+
+
+def test_worker_fails_fast_without_hard_links(tmp_path, monkeypatch):
+    def no_links(src, dst):
+        raise PermissionError(1, "Operation not permitted")
+
+    monkeypatch.setattr(os, "link", no_links)
+    with pytest.raises(RuntimeError, match="ハードリンク"):
+        distribute.run_worker(str(tmp_path), cache_path=None)
+
+
+def test_workers_evaluate_each_file_once(tmp_path):
+    files = 6
+    target_dir = str(tmp_path)
+    _synthetic_wavs(target_dir, files)
+    procs = [subprocess.Popen([sys.executable, SCRIPT, "worker", target_dir, "--no-cache",
+                               "--worker-id", f"test{k}", "--lease-seconds", "10"],
+                              stdout=subprocess.DEVNULL)
+             for k in range(3)]
+    assert [proc.wait(timeout=600) for proc in procs] == [0, 0, 0]
+
+    dirs = distribute.queue_dirs(target_dir)
+    started, evaluated = [], []
+    for path in glob.glob(os.path.join(dirs["workers"], "*.json")):
+        stats = distribute._read_json(path)
+        started.extend(stats["started"])
+        evaluated.extend(stats["evaluated"])
+    # 結果ファイルは link で一意になるため、評価を始めた回数で重複を数える
+    assert sorted(started) == sorted(set(started))
+    assert sorted(evaluated) == sorted(os.path.basename(p) for p in glob.glob(os.path.join(target_dir, "*.wav")))
+    assert distribute.queue_status(target_dir)["done"] == files
+    assert distribute.reduce_results(target_dir, store_path=None) is not None
@@ -0,0 +1,44 @@
+from tools import load_script
+
+batch = load_script("eval-batch-stats.py")
+
+
+class _Inspector:
+    sr = 24000
+
+    def analyze(self, wav_path, timer=None, audio=None):
+        if "broken" in wav_path:
+            raise ValueError("cannot decode")
+        return {"path": wav_path}
+
+
+class _Diagnostician:
+    def diagnose(self, inspector_results, linguist_data=None):
+        return {"overall_score": 80, "buckets": {}}
+
+
+class _Scorer:
+    def __init__(self):
+        self.options = {"batch_size": 4}
+        self.calls = []
+
+    def score_many(self, audios, cache=None):
+        self.calls.append([audio.path for audio in audios])
+        return [{"ai_scores": {"source": audio.path}} for audio in audios]
+
+
+def test_scores_are_batched_per_chunk(monkeypatch):
+    monkeypatch.setattr(batch, "_build_inspector", lambda cache_path: _Inspector())
+    monkeypatch.setattr(batch, "Diagnostician", _Diagnostician)
+    files = [f"xtts-audio-{i}-20250101-000000.wav" for i in range(9)]
+    files[5] = "xtts-audio-broken-20250101-000000.wav"
+    scorer = _Scorer()
+
+    results = batch.evaluate_files(files, cache_path=None, scorer=scorer, prefetch=None)
+
+    # 解析に失敗したファイルは採点に回さない
+    assert [len(call) for call in scorer.calls] == [4, 3, 1]
+    assert results[5] is None
+    for wav_path, res in zip(files, results):
+        if res is not None:
+            assert res["ai_scores"]["source"] == wav_path
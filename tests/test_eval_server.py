@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tools import load_script
+
+run = load_script("eval-common-run.py")
+serve = load_script("serve-common-eval.py")
+
+
+class _Linguist:
+    model_size = "small"
+
+    def analyze(self, audio_path):
+        raise RuntimeError("ASR failed")
+
+
+def _service(linguist=None, cache_path=None):
+    service = serve.EvaluationService.__new__(serve.EvaluationService)
+    service.concurrency, service.max_queue = 1, 0
+    service.cache_path = cache_path
+    service.executor = ThreadPoolExecutor(max_workers=1)
+    service.diagnostician = None
+    service.linguist = linguist
+    service.linguist_lock = threading.Lock()
+    service.slots = threading.BoundedSemaphore(1)
+    service.stats_lock = threading.Lock()
+    service.stats = {"in_flight": 0, "served": 0, "failed": 0, "rejected": 0, "total_seconds": 0.0}
+    return service
+
+
+def test_slot_held_until_inspection_finishes(monkeypatch):
+    finished = []
+
+    def slow_inspect(audio_path):
+        time.sleep(0.3)
+        finished.append(audio_path)
+
+    monkeypatch.setattr(serve, "_inspect_in_worker", slow_inspect)
+    service = _service(linguist=_Linguist())
+    with pytest.raises(RuntimeError):
+        service.evaluate("a.wav")
+    # Linguist が先に失敗しても、枠は Inspector の完了後に返る
+    assert finished == ["a.wav"]
+    assert service.stats["in_flight"] == 0
+    service.executor.shutdown()
+
+
+def test_mismatched_options_are_reported(tmp_path):
+    service = _service(cache_path=str(tmp_path / "cache.db"))
+    assert "--linguist" in service.mismatch({"linguist": True})
+    assert service.mismatch({"cache_path": None})
+    assert service.mismatch({"cache_path": str(tmp_path / "other.db")})
+    assert service.mismatch({"cache_path": str(tmp_path / "cache.db"), "linguist": False}) is None
+    service.linguist = _Linguist()
+    assert "small" in service.mismatch({"linguist": True, "asr_model": "large-v3"})
+    service.executor.shutdown()
+
+
+def _server(status, body, content_type):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_non_json_error_body_is_reported(tmp_path):
+    server = _server(502, b"<html>Bad Gateway</html>", "text/html")
+    try:
+        with pytest.raises(RuntimeError, match="HTTP 502: <html>Bad Gateway</html>"):
+            run.request_evaluation(tmp_path / "a.wav", f"http://127.0.0.1:{server.server_port}")
+    finally:
+        server.shutdown()
+
+
+def test_conflict_raises_server_mismatch(tmp_path):
+    server = _server(409, b'{"error": "server was started without --linguist"}', "application/json")
+    try:
+        with pytest.raises(run.ServerMismatch, match="--linguist"):
+            run.request_evaluation(tmp_path / "a.wav", f"http://127.0.0.1:{server.server_port}",
+                                   linguist_options={"model_size": "small"})
+    finally:
+        server.shutdown()
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from tools.pool import ENGINE_FOOTPRINT_GB, ModelPool, parameter_bytes
+
+MB = 1024 * 1024
+SIZES_MB = {"a": 100, "b": 150, "c": 120}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    for engine, mb in SIZES_MB.items():
+        monkeypatch.setitem(ENGINE_FOOTPRINT_GB, engine, mb / 1024)
+    return ModelPool(ram_budget_gb=300 / 1024, verbose=False)
+
+
+def _load(pool, engine, loads):
+    def loader():
+        loads.append(engine)
+        return {"weights": np.ones(SIZES_MB[engine] * MB // 8)}
+    return pool.get(engine, f"ckpt-{engine}", loader)
+
+
+def test_reuse_and_lru_eviction(pool):
+    loads = []
+    for engine in ["a", "a", "b", "a", "c", "a", "b"]:
+        _load(pool, engine, loads)
+    # a(100) と b(150) を読み込み → c(120) で最も古い b を解放 → 再び b で、a より古い c を解放
+    assert loads == ["a", "b", "c", "b"]
+    stats = pool.stats()
+    assert stats["models"] == ["a", "b"]
+    assert (stats["hits"], stats["loads"], stats["evictions"]) == (3, 4, 2)
+    assert pool.used <= pool.budget
+
+
+def test_measured_size_replaces_estimate(pool, monkeypatch):
+    monkeypatch.setitem(ENGINE_FOOTPRINT_GB, "a", 10.0)
+    model = _load(pool, "a", [])
+    assert pool.estimate("a", "ckpt-a") == parameter_bytes(model) == SIZES_MB["a"] * MB
+
+
+def test_model_larger_than_budget_still_loads(pool):
+    pool.get("big", "ckpt-big", lambda: np.ones(400 * MB // 8))
+    pool.get("big2", "ckpt-big2", lambda: np.ones(400 * MB // 8))
+    assert pool.stats()["models"] == ["big2"]
+    assert pool.evictions == 1
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from tools.mos import MosPredictor, length_buckets
+
+
+def test_length_buckets_bound_padding():
+    rng = np.random.default_rng(0)
+    lengths = [int(n) for n in rng.uniform(16000, 64000, 50)]
+    batches = length_buckets(lengths, batch_size=8, max_padding=0.1)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 8
+        longest = max(lengths[i] for i in batch)
+        assert min(lengths[i] for i in batch) >= 0.9 * longest
+    # 長さが少しずつ違うクリップもまとめる (同じ長さだけだと 50 回推論になる)
+    assert len(batches) < len(lengths) / 2
+
+
+def test_zero_padding_groups_equal_lengths_only():
+    lengths = [16000, 8000, 16000, 16000, 12000, 8000]
+    batches = length_buckets(lengths, batch_size=2, max_padding=0)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 2
+        assert len({lengths[i] for i in batch}) == 1
+
+
+def _padding_sensitive_session(batch):
+    # GroupNorm のように時間方向全体 (ゼロ埋めを含む) の統計に依存するフレームスコア
+    frames = batch.shape[1] // 320
+    level = np.abs(batch).mean(axis=1, keepdims=True)
+    return np.repeat(1.0 + level, frames, axis=1) + np.linspace(0, 1, frames)[None, :]
+
+
+def _clips(rng, lengths):
+    return [rng.normal(0, 0.1, n).astype(np.float32) for n in lengths]
+
+
+def test_padding_effect_is_bounded():
+    rng = np.random.default_rng(0)
+    wavs = _clips(rng, (16000, 17000, 16500, 32000, 30000, 31000))
+    predictor = MosPredictor(batch_size=4, max_padding=0.1)
+    predictor._session = _padding_sensitive_session
+
+    batched = predictor.predict_arrays(wavs)
+    assert predictor.last_stats["batches"] == 2
+    single = [predictor.predict_arrays([w])[0] for w in wavs]
+    # ゼロ埋めは長さの1割まで。その分だけ時間方向の統計がずれる
+    np.testing.assert_allclose(batched, single, atol=0.1)
+
+    predictor.max_padding = 0
+    np.testing.assert_allclose(predictor.predict_arrays(wavs), single, rtol=1e-6)
+
+
+def test_groupnorm_encoder_matches_single_clip_scores():
+    torch = pytest.importorskip("torch")
+    torch.manual_seed(0)
+    # wav2vec2-base と同じ畳み込み構成で、最初の層だけ時間方向の GroupNorm を持つ
+    layers = [torch.nn.Conv1d(1, 32, 10, 5, bias=False), torch.nn.GroupNorm(32, 32), torch.nn.GELU()]
+    for kernel in (3, 3, 3, 3, 2, 2):
+        layers += [torch.nn.Conv1d(32, 32, kernel, 2, bias=False), torch.nn.GELU()]
+    encoder = torch.nn.Sequential(*layers)
+    head = torch.nn.Linear(32, 1)
+
+    def session(batch):
+        with torch.no_grad():
+            hidden = encoder(torch.from_numpy(batch)[:, None]).transpose(1, 2)
+            return (3 + torch.tanh(head(hidden))).squeeze(-1).numpy()
+
+    rng = np.random.default_rng(1)
+    t = np.arange(64000) / 16000
+    voice = (np.sin(2 * np.pi * 150 * t) * (0.5 + 0.5 * np.sin(2 * t))).astype(np.float32)
+    wavs = [voice[:int(n)] + rng.normal(0, 0.05, int(n)).astype(np.float32)
+            for n in rng.uniform(16000, 64000, 24)]
+    predictor = MosPredictor(batch_size=8, max_padding=0.1)
+    predictor._session = session
+
+    batched = predictor.predict_arrays(wavs)
+    assert predictor.last_stats["batches"] < len(wavs)
+    single = [predictor.predict_arrays([w])[0] for w in wavs]
+    np.testing.assert_allclose(batched, single, atol=1e-3)
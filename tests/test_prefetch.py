@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import soundfile as sf
+
+from tools.cache import ResultCache
+from tools.decode import prefetch
+
+
+def _write_clips(tmp_path, n, seconds=0.5, sr=24000):
+    paths = []
+    for i in range(n):
+        path = tmp_path / f"xtts-audio-{i}-20250101-000000.wav"
+        sf.write(path, np.zeros(int(seconds * sr), dtype=np.float32), sr)
+        paths.append(str(path))
+    return paths
+
+
+def test_should_decode_runs_on_reader_threads(tmp_path):
+    paths = _write_clips(tmp_path, 6)
+    consumer = threading.current_thread()
+    calls = []
+
+    def should_decode(path):
+        calls.append(threading.current_thread())
+        return paths.index(path) % 2 == 0
+
+    audios = list(prefetch(paths, rates=(16000,), depth=3, should_decode=should_decode))
+    assert [a.path for a in audios] == paths
+    assert len(calls) == len(paths)
+    assert all(thread is not consumer for thread in calls)
+    # キャッシュ済み扱いのファイルはデコードしない
+    assert [a.decode_count for a in audios] == [1, 0, 1, 0, 1, 0]
+
+
+def test_byte_limit_bounds_read_ahead(tmp_path):
+    paths = _write_clips(tmp_path, 8)
+    clip_bytes = 12000 * 4
+    started = []
+
+    def should_decode(path):
+        started.append(path)
+        return True
+
+    consumed = 0
+    for audio in prefetch(paths, depth=8, max_bytes=2 * clip_bytes, readers=1, should_decode=should_decode):
+        consumed += 1
+        # 先読みは上限 (2件分) までで、depth (8件) までは進まない
+        assert len(started) - consumed <= 3
+    assert consumed == len(paths)
+
+
+def test_result_cache_from_reader_thread(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    cache.put("key", {"value": 1})
+    found = []
+    reader = threading.Thread(target=lambda: found.append(cache.contains("key")))
+    reader.start()
+    reader.join()
+    assert found == [True]
+
+
+def test_stage_cpu_time_excludes_other_threads():
+    from tools.inspector import StageTimer
+
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            sum(range(1000))
+
+    timer = StageTimer()
+    background = threading.Thread(target=spin)
+    background.start()
+    try:
+        with timer.stage("idle"):
+            stop.wait(0.3)
+    finally:
+        stop.set()
+        background.join()
+    wall, cpu = timer.stages["idle"]
+    assert wall >= 0.3
+    assert cpu < 0.1
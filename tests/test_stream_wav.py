@@ -0,0 +1,135 @@
+import io
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from tools import SRC_DIR, load_script
+from tools.stream import IncrementalWavWriter, StreamingSynthesis, stream_to_wav
+
+SR = 24000
+
+
+class FakeXtts:
+    def inference_stream(self, text, language, gpt_cond_latent, speaker_embedding, stream_chunk_size, **kw):
+        rng = np.random.default_rng(0)
+        for _ in range(5):
+            time.sleep(0.01)  # GPT 段 stream_chunk_size トークン分の生成を模す
+            yield rng.uniform(-0.5, 0.5, stream_chunk_size * 1024).astype(np.float32)
+
+
+def test_header_is_patched_and_partial_file_is_readable(tmp_path):
+    path = str(tmp_path / "stream.wav")
+    stream = StreamingSynthesis(FakeXtts(), "テスト", None, None, stream_chunk_size=4)
+    received = []
+    with IncrementalWavWriter(path) as writer:
+        for chunk in stream:
+            writer.write(chunk)
+            received.append(chunk)
+            if len(received) == 1:
+                # 書き込み途中でも、ヘッダーとここまでの PCM は読める
+                assert os.path.getsize(path) == 44 + 4096 * 2
+    data, sr = sf.read(path, dtype="float32")
+    expected = np.concatenate(received)
+    assert sr == SR
+    assert len(data) == len(expected)
+    assert np.max(np.abs(data - expected)) < 1.0 / 16384
+
+
+def test_metrics():
+    stream = StreamingSynthesis(FakeXtts(), "テスト", None, None, stream_chunk_size=4)
+    metrics = stream_to_wav(stream, io.BytesIO())
+    assert metrics["chunks"] == 5
+    assert metrics["audio_seconds"] == pytest.approx(5 * 4096 / SR)
+    assert 0 < metrics["ttfa"] <= metrics["elapsed"]
+    assert metrics["rtf"] == pytest.approx(metrics["elapsed"] / metrics["audio_seconds"])
+    assert "TTFA" in stream.report()
+
+
+class _Unseekable(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+def test_unseekable_output_keeps_unknown_sizes():
+    out = _Unseekable()
+    with IncrementalWavWriter(out) as writer:
+        writer.write(np.zeros(100, dtype=np.float32))
+    data = out.getvalue()
+    assert data[4:8] == b"\xff\xff\xff\xff" and data[40:44] == b"\xff\xff\xff\xff"
+    assert len(data) == 44 + 200
+
+
+# モデルの読み込み・話者条件の計算中に標準出力へ書く擬似 TTS パッケージ
+FAKE_TTS = {
+    "TTS/__init__.py": "",
+    "TTS/api.py": textwrap.dedent("""
+        import os
+        import time
+        import numpy as np
+        import torch
+
+        class _Config:
+            gpt_cond_len = 30
+            gpt_cond_chunk_len = 4
+            max_ref_len = 30
+            sound_norm_refs = False
+
+        class _Model:
+            config = _Config()
+            device = "cpu"
+
+            def get_conditioning_latents(self, audio_path, **kwargs):
+                print("computing latents")
+                os.system("echo native-log")
+                return torch.zeros(1, 4, 8), torch.zeros(1, 8, 1)
+
+            def inference_stream(self, text, language, gpt_cond_latent, speaker_embedding, stream_chunk_size, **kw):
+                print("streaming")
+                for _ in range(3):
+                    yield torch.full((1000,), 0.25)
+
+        class TTS:
+            def __init__(self, checkpoint):
+                print(f" > tts_models loaded: {checkpoint}")
+                self.synthesizer = type("Synthesizer", (), {"tts_model": _Model()})()
+    """),
+}
+
+
+def _fake_tts(tmp_path):
+    for name, source in FAKE_TTS.items():
+        path = tmp_path / "fake" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+    ref = tmp_path / "ref.wav"
+    sf.write(ref, np.zeros(SR, dtype=np.float32), SR)
+    env = dict(os.environ, PYTHONPATH=str(tmp_path / "fake"))
+    return env, str(ref)
+
+
+def test_stdout_carries_only_audio(tmp_path):
+    env, ref = _fake_tts(tmp_path)
+    proc = subprocess.run([sys.executable, str(SRC_DIR / "stream-xtts-audio.py"), "テスト",
+                           "--speaker-wav", ref, "--output", "-"],
+                          cwd=tmp_path, env=env, capture_output=True, timeout=300)
+    assert proc.returncode == 0, proc.stderr.decode()
+    data, sr = sf.read(io.BytesIO(proc.stdout), dtype="float32")
+    assert sr == SR and len(data) == 3000
+    assert b"computing latents" in proc.stderr and b"native-log" in proc.stderr
+
+
+def test_default_output_follows_naming_convention(tmp_path):
+    env, ref = _fake_tts(tmp_path)
+    proc = subprocess.run([sys.executable, str(SRC_DIR / "stream-xtts-audio.py"), "テスト",
+                           "--speaker-wav", ref, "--id", "007"],
+                          cwd=tmp_path, env=env, capture_output=True, timeout=300)
+    assert proc.returncode == 0, proc.stderr.decode()
+    outputs = os.listdir(tmp_path / "tts_outputs")
+    assert len(outputs) == 1
+    assert load_script("transcribe-common-audio.py").text_id(outputs[0]) == "007"
@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from tools import load_script
+
+batch = load_script("synthesize-xtts-batch.py")
+
+
+def test_plan_batches_longest_first():
+    lengths = [5, 30, 12, 30, 1, 8, 20]
+    batches = batch.plan_batches(lengths, 3)
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+    flat = [lengths[i] for b in batches for i in b]
+    assert flat == sorted(lengths, reverse=True)
+
+
+class _FakeSynthesizer:
+    def __init__(self):
+        self.tts_model = _FakeModel()
+        self.saved = {}
+
+    def split_into_sentences(self, text):
+        return [part for part in text.split("。")]
+
+    def save_wav(self, wav, path):
+        self.saved[path] = wav
+
+
+class _FakeModel:
+    config = type("Config", (), dict(temperature=0.75, length_penalty=1.0, repetition_penalty=10.0,
+                                      top_k=50, top_p=0.85))()
+
+    class tokenizer:
+        @staticmethod
+        def encode(text, lang):
+            return list(text)
+
+
+def test_entries_without_sentences_are_skipped(monkeypatch):
+    synthesized = []
+
+    def fake_synthesize_batch(model, texts, *args, **kwargs):
+        synthesized.extend(texts)
+        return [np.full(len(text), 0.1, dtype=np.float32) for text in texts]
+
+    monkeypatch.setattr(batch, "synthesize_batch", fake_synthesize_batch)
+    tts = type("TTS", (), {"synthesizer": _FakeSynthesizer()})()
+    jobs = [("こんにちは。志ん生です。", "a.wav"), ("   ", "b.wav"), ("。", "c.wav"), ("どうも", "d.wav")]
+    count = batch.synthesize_to_files(tts, jobs, None, None, batch_size=2)
+
+    assert count == 3
+    assert all(text.strip() for text in synthesized)
+    assert sorted(tts.synthesizer.saved) == ["a.wav", "d.wav"]
+    assert len(tts.synthesizer.saved["a.wav"]) == len("こんにちは") + len("志ん生です") + 2 * batch.SENTENCE_GAP
+
+
+def _tiny_gpt():
+    # 小さな XTTS GPT (重みはランダム)。CI (SNSW_REQUIRE_TTS=1) では TTS が無ければ失敗させる
+    if os.environ.get("SNSW_REQUIRE_TTS"):
+        from TTS.tts.layers.xtts import gpt as gpt_module
+    else:
+        gpt_module = pytest.importorskip("TTS.tts.layers.xtts.gpt")
+    gpt = gpt_module.GPT(layers=2, model_dim=64, heads=4, max_text_tokens=60, max_mel_tokens=120,
+                         max_prompt_tokens=40, number_text_tokens=300, num_audio_tokens=64,
+                         start_audio_token=62, stop_audio_token=63)
+    gpt.init_gpt_for_inference(kv_cache=True)
+    gpt.max_gen_mel_tokens = 40
+    return gpt.eval()
+
+
+def test_batched_codes_match_single_generation():
+    torch.manual_seed(0)
+    gpt = _tiny_gpt()
+    cond_latents = torch.randn(1, 8, 64)
+    lengths = torch.randint(3, 40, (7,)).tolist()
+    text_tokens = [torch.randint(1, 250, (n,), dtype=torch.int32) for n in lengths]
+    settings = {"do_sample": False, "num_beams": 1, "repetition_penalty": 1.0}
+
+    with torch.inference_mode():
+        single = [gpt.generate(cond_latents, tokens.unsqueeze(0), **settings)[0] for tokens in text_tokens]
+    batched = [None] * len(text_tokens)
+    for group in batch.plan_batches(lengths, 4):
+        codes = batch.generate_codes(gpt, cond_latents, [text_tokens[i] for i in group], **settings)
+        for i, c in zip(group, codes):
+            batched[i] = c
+    for i, (a, b) in enumerate(zip(single, batched)):
+        assert torch.equal(a, b), f"sentence {i}: {a.tolist()} != {b.tolist()}"
@@ -0,0 +1,18 @@
+import pytest
+
+from tools import load_script
+
+text_id = load_script("transcribe-common-audio.py").text_id
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("xtts-audio-12-20250101-000000.wav", "12"),
+    ("fish-speech-audio-001-20250101-093015.wav", "001"),
+    ("gpt-sovits-audio-3-20241231-235959.wav", "3"),
+    ("tts_outputs/styletts2-audio-a7-20250101-000000.wav", "a7"),
+    # 命名規則に合わないファイル
+    ("xtts-audio-12.wav", None),
+    ("report_1_model_summary_20250101-000000.md", None),
+])
+def test_text_id(name, expected):
+    assert text_id(name) == expected
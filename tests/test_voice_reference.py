@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from tools.voice import reference_paths
+
+
+@pytest.fixture
+def refs(tmp_path):
+    for name in ("001.wav", "002.wav", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    return tmp_path
+
+
+def test_directory_glob_and_file_are_merged(refs):
+    expected = [str(refs / "001.wav"), str(refs / "002.wav")]
+    assert reference_paths(str(refs)) == expected
+    assert reference_paths([os.path.join(str(refs), "*.wav"), str(refs / "001.wav")]) == expected
+    assert reference_paths(str(refs / "002.wav")) == expected[1:]
+
+
+def test_missing_reference_raises(refs):
+    with pytest.raises(FileNotFoundError):
+        reference_paths([str(refs / "003.wav")])
+    with pytest.raises(FileNotFoundError):
+        reference_paths([os.path.join(str(refs), "*.flac")])